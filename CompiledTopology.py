@@ -0,0 +1,137 @@
+import heapq
+
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+except ImportError:
+    csr_matrix = None
+    dijkstra = None
+
+UNREACHABLE = -1
+
+
+class CompiledTopology:
+    """
+    Link state database compiled into an integer indexed CSR adjacency, node i
+    has the edges targets[offsets[i]:offsets[i + 1]] with the matching weights.
+    """
+    def __init__(self, link_state_db):
+        """
+        Constructor for CompiledTopology class.
+        :param link_state_db: Dictionary origin -> {neighbor: cost}.
+        """
+        # Intern every JID to a small integer
+        self.names = []
+        self.index = {}
+        for origin in link_state_db:
+            self._intern(origin)
+        for costs in link_state_db.values():
+            for neighbor in costs:
+                self._intern(neighbor)
+
+        count = len(self.names)
+        index = self.index
+        degrees = np.zeros(count + 1, dtype=np.int64)
+        # Origins were interned first, so their edge lists are already in node id order
+        degrees[1:len(link_state_db) + 1] = [len(costs) for costs in link_state_db.values()]
+        self.offsets = np.cumsum(degrees)
+        self.targets = np.array([index[neighbor] for costs in link_state_db.values() for neighbor in costs], dtype=np.int32)
+        self.weights = np.array([cost for costs in link_state_db.values() for cost in costs.values()], dtype=np.float64)
+        # Weights are floats for the solvers, distances go back as ints when every cost was one
+        self.integral = all(type(cost) is int for costs in link_state_db.values() for cost in costs.values())
+
+    def __len__(self):
+        return len(self.names)
+
+    def _intern(self, name):
+        if name not in self.index:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+
+    def shortest_paths(self, root):
+        """
+        Run SPF from a node.
+        :param root: JID of the source node.
+        :return: Tuple of arrays (distances, predecessors, first hops), indexed by node id.
+        """
+        source = self.index[root]
+        if dijkstra is not None:
+            return self._shortest_paths_scipy(source)
+        return self._shortest_paths_heap(source)
+
+    def _shortest_paths_scipy(self, source):
+        count = len(self.names)
+        graph = csr_matrix((self.weights, self.targets, self.offsets), shape=(count, count))
+        distances, predecessors = dijkstra(graph, indices=source, return_predecessors=True)
+        predecessors = predecessors.astype(np.int64)
+        predecessors[predecessors < 0] = UNREACHABLE
+        reachable = np.isfinite(distances)
+        reachable[source] = False
+
+        # Resolve first hops by pointer jumping towards the children of the source
+        first_hops = np.full(count, UNREACHABLE, dtype=np.int64)
+        direct = reachable & (predecessors == source)
+        first_hops[direct] = np.nonzero(direct)[0]
+        ancestors = predecessors.copy()
+        pending = np.nonzero(reachable & ~direct)[0]
+        while pending.size:
+            hops = first_hops[ancestors[pending]]
+            resolved = hops != UNREACHABLE
+            first_hops[pending[resolved]] = hops[resolved]
+            pending = pending[~resolved]
+            ancestors[pending] = ancestors[ancestors[pending]]
+        return distances, predecessors, first_hops
+
+    def _shortest_paths_heap(self, source):
+        count = len(self.names)
+        offsets = self.offsets.tolist()
+        targets = self.targets.tolist()
+        weights = self.weights.tolist()
+        distances = [float('inf')] * count
+        predecessors = [UNREACHABLE] * count
+        first_hops = [UNREACHABLE] * count
+        distances[source] = 0.0
+        pq = [(0.0, source)]
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_distance > distances[current_node]:
+                continue
+            current_hop = first_hops[current_node]
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    predecessors[neighbor] = current_node
+                    first_hops[neighbor] = neighbor if current_node == source else current_hop
+                    heapq.heappush(pq, (distance, neighbor))
+        return np.array(distances), np.array(predecessors), np.array(first_hops)
+
+
+class CompiledRoutingTable:
+    """
+    Read-only routing table over first hop and distance arrays, answering
+    lookups with the same (next hop, cost) tuples as the dictionary table.
+    Only benchmarks/CompiledSPF.py uses it, NetworkClient keeps the
+    dictionary table that incremental SPF updates.
+    """
+    def __init__(self, topology, distances, first_hops):
+        self.topology = topology
+        self.distances = distances
+        self.first_hops = first_hops
+
+    def get(self, destination, default=None):
+        node = self.topology.index.get(destination)
+        if node is None or self.first_hops[node] == UNREACHABLE:
+            return default
+        distance = self.distances[node].item()
+        return self.topology.names[self.first_hops[node]], int(distance) if self.topology.integral else distance
+
+    def __contains__(self, destination):
+        return self.get(destination) is not None
+
+    def __len__(self):
+        return int(np.count_nonzero(self.first_hops != UNREACHABLE))
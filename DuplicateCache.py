@@ -0,0 +1,80 @@
+import sys
+import time
+from collections import OrderedDict
+
+
+class DuplicateCache:
+    """
+    Bounded cache of recently seen message ids with time and size based eviction.
+    """
+    def __init__(self, max_entries=10000, ttl=120.0, clock=time.monotonic):
+        """
+        Constructor for DuplicateCache class.
+        :param max_entries: Maximum number of ids kept, the oldest is evicted first.
+        :param ttl: Seconds an id is remembered.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # Insertion order is also expiry order
+        self.entries = OrderedDict()
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, message_id):
+        seen_at = self.entries.get(message_id)
+        return seen_at is not None and self.clock() - seen_at < self.ttl
+
+    def check_and_add(self, message_id):
+        """
+        Record an id and tell whether it was already seen.
+        :param message_id: Id of the message.
+        :return: True if the id is a duplicate.
+        """
+        now = self.clock()
+        self._expire(now)
+        if message_id in self.entries:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        self.entries[message_id] = now
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def _expire(self, now):
+        entries = self.entries
+        while entries:
+            message_id, seen_at = next(iter(entries.items()))
+            if now - seen_at < self.ttl:
+                break
+            del entries[message_id]
+            self.expired += 1
+
+    def memory_footprint(self):
+        """
+        Approximate bytes used by the cache, container plus keys.
+        """
+        return sys.getsizeof(self.entries) + sum(sys.getsizeof(key) for key in self.entries)
+
+    def metrics(self):
+        """
+        Snapshot of the cache counters.
+        """
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "bytes": self.memory_footprint(),
+        }
@@ -0,0 +1,123 @@
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+# Levels used by NetworkClient.log, IMPORTANT sits between INFO and WARNING
+LEVELS = {"DEBUG": 10, "INFO": 20, "IMPORTANT": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+# Level forwarded to the standard logger for each of them
+LOGGER_LEVELS = {"IMPORTANT": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR,
+                 "CRITICAL": logging.CRITICAL}
+
+
+class LogEntry:
+    """
+    One event of the log.
+    """
+    __slots__ = ("cursor", "time", "level", "message", "fields")
+
+    def __init__(self, cursor, time, level, message, fields):
+        self.cursor = cursor
+        self.time = time
+        self.level = level
+        self.message = message
+        self.fields = fields
+
+    def to_dict(self):
+        entry = {"cursor": self.cursor, "time": self.time, "level": self.level, "message": self.message}
+        if self.fields:
+            entry.update(self.fields)
+        return entry
+
+
+class EventLog:
+    """
+    Structured event log kept in a bounded ring buffer. Every entry gets a
+    monotonically increasing cursor so consumers only fetch what is new, and
+    messages are formatted only when their level is enabled.
+    """
+    def __init__(self, name, level="IMPORTANT", capacity=10000, logger=None):
+        """
+        Constructor for EventLog class.
+        :param name: Name of the node, added to every JSONL line.
+        :param level: Minimum level recorded.
+        :param capacity: Number of entries kept, the oldest are dropped first.
+        :param logger: Standard logger that also receives IMPORTANT and higher entries.
+        """
+        self.name = name
+        self.threshold = LEVELS[level]
+        self.entries = deque(maxlen=capacity)
+        self.next_cursor = 0
+        self.logger = logger
+        self.writer = None
+
+    def enabled(self, level):
+        return LEVELS.get(level, 0) >= self.threshold
+
+    def log(self, level, message, *args, **fields):
+        """
+        Record an event.
+        :param level: One of LEVELS.
+        :param message: Message, %-style template when args are given.
+        :param args: Template arguments, only formatted if the level is enabled.
+        :param fields: Structured values stored with the entry.
+        """
+        if LEVELS.get(level, 0) < self.threshold:
+            return
+        if args:
+            message = message % args
+        self.entries.append(LogEntry(self.next_cursor, time.time(), level, message, fields))
+        self.next_cursor += 1
+        if self.logger is not None and level in LOGGER_LEVELS:
+            self.logger.log(LOGGER_LEVELS[level], message)
+
+    def read(self, cursor=0, limit=None):
+        """
+        Entries recorded since a cursor.
+        :param cursor: Cursor returned by the previous read, 0 to start from the oldest entry kept.
+        :param limit: Maximum number of entries returned.
+        :return: Tuple (entries, next cursor). Entries dropped from the buffer before being read are skipped.
+        """
+        first = self.next_cursor - len(self.entries)
+        start = max(cursor, first)
+        end = self.next_cursor if limit is None else min(self.next_cursor, start + limit)
+        if start >= end:
+            return [], max(cursor, end)
+        # Walk from whichever end of the deque is closer to the new entries
+        if end - start <= len(self.entries) // 2:
+            entries = [self.entries[index - first] for index in range(start, end)]
+        else:
+            entries = list(self.entries)[start - first:end - first]
+        return entries, end
+
+    def messages(self):
+        return [entry.message for entry in self.entries]
+
+    def start_writer(self, path, interval=1.0):
+        """
+        Append every new entry to a JSONL file from a background task.
+        :param path: File to append to.
+        :param interval: Seconds between writes.
+        """
+        if self.writer is None:
+            self.writer = asyncio.create_task(self._write(path, interval))
+        return self.writer
+
+    async def _write(self, path, interval):
+        loop = asyncio.get_running_loop()
+        cursor = self.next_cursor - len(self.entries)
+        with open(path, 'a') as file:
+            while True:
+                await asyncio.sleep(interval)
+                entries, cursor = self.read(cursor)
+                if entries:
+                    lines = "".join(json.dumps(dict(entry.to_dict(), node=self.name), default=str) + "\n"
+                                    for entry in entries)
+                    # File I/O happens off the event loop
+                    await loop.run_in_executor(None, self._append, file, lines)
+
+    @staticmethod
+    def _append(file, lines):
+        file.write(lines)
+        file.flush()
@@ -1,6 +1,5 @@
-import yaml
 import asyncio
-from NetworkClient import NetworkClient
+from NetworkClient import NetworkClient, options_from_config
 import sys
 import logging
 import aioconsole
@@ -9,11 +8,13 @@ class InteractiveClient:
     def __init__(self):
         self.client = None
         self.config = None
+        self.last_log = 0
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger("InteractiveClient")
 
     def load_config(self, config_file=None):
         if config_file:
+            import yaml
             with open(config_file, 'r') as file:
                 self.config = yaml.safe_load(file)
         else:
@@ -38,7 +39,8 @@ class InteractiveClient:
             neighbors=self.config["neighbors"],
             costs=self.config["costs"],
             mode=self.config["mode"],
-            verbose=self.config["verbose"]
+            verbose=self.config["verbose"],
+            **options_from_config(self.config)
         )
 
     async def run_client(self):
@@ -51,11 +53,19 @@ class InteractiveClient:
         except Exception as e:
             self.logger.error(f"Error in client processing: {str(e)}")
 
+    def show_logs(self):
+        logs, self.last_log = self.client.read_log(self.last_log)
+        for log in logs:
+            print(log)
+
     async def interactive_send(self):
         while True:
-            to_jid = await aioconsole.ainput("Enter recipient's JID (or 'quit' to exit): ")
+            to_jid = await aioconsole.ainput("Enter recipient's JID ('log' to show new log entries, 'quit' to exit): ")
             if to_jid.lower() == 'quit':
                 break
+            if to_jid.lower() == 'log':
+                self.show_logs()
+                continue
 
             message_type = await aioconsole.ainput("Enter message type (default: message): ") or "message"
             payload = await aioconsole.ainput("Enter message payload: ")
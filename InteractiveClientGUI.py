@@ -1,15 +1,14 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import asyncio
-import yaml
-from NetworkClient import NetworkClient
+from NetworkClient import NetworkClient, options_from_config
 import sys
 
 class InteractiveClientGUI:
     def __init__(self, master):
         self.master = master
         master.title("Interactive XMPP Client")
-        master.geometry("600x600")
+        master.geometry("600x680")
 
         self.client = None
         self.config = None
@@ -25,6 +24,13 @@ class InteractiveClientGUI:
         self.log_area = scrolledtext.ScrolledText(master, wrap=tk.WORD, width=70, height=20)
         self.log_area.pack(padx=10, pady=10)
 
+        # Metrics of the running node
+        self.metrics_label = tk.Label(master, text="", wraplength=560, justify=tk.LEFT)
+        self.metrics_label.pack()
+        self.profiling = False
+        self.profile_button = tk.Button(master, text="Start Profiler", command=self.toggle_profiler)
+        self.profile_button.pack()
+
         # Message sending area
         tk.Label(master, text="Recipient JID:").pack()
         self.recipient_jid = tk.Entry(master, width=50)
@@ -42,17 +48,18 @@ class InteractiveClientGUI:
 
     async def get_logs(self):
         while True:
+            await asyncio.sleep(2)
             if self.client:
-                await asyncio.sleep(2)
-                logs = self.client.send_log()
-                for index, log in enumerate(logs):
-                    if index >= self.last_log:
-                        self.log(log)
-                        self.last_log += 1
+                # Only the entries added since the last read
+                logs, self.last_log = self.client.read_log(self.last_log)
+                for log in logs:
+                    self.log(log)
+                self.metrics_label.config(text=self.client.metrics_summary())
 
     async def load_config(self):
         config_file = self.config_path.get()
         try:
+            import yaml
             with open(config_file, 'r') as file:
                 self.config = yaml.safe_load(file)
             self.initialize_client()
@@ -73,7 +80,8 @@ class InteractiveClientGUI:
             password=self.config["password"],
             neighbors=self.config["neighbors"],
             costs=self.config["costs"],
-            mode=self.config["mode"]
+            mode=self.config["mode"],
+            **options_from_config(self.config)
         )
 
     async def run_client(self):
@@ -100,6 +108,17 @@ class InteractiveClientGUI:
         }))
         self.log(f"Message sent to {to_jid}")
 
+    def toggle_profiler(self):
+        if not self.client:
+            messagebox.showerror("Error", "Client not initialized. Please load configuration first.")
+            return
+
+        self.profiling = not self.profiling
+        top = self.client.set_profiling(self.profiling)
+        self.profile_button.config(text="Stop Profiler" if self.profiling else "Start Profiler")
+        for function, on_stack, on_top in top:
+            self.log(f"{on_stack:6.1%} {on_top:6.1%}  {function}")
+
     def log(self, message):
         self.log_area.insert(tk.END, message + "\n")
         self.log_area.see(tk.END)
@@ -0,0 +1,134 @@
+import sys
+import json
+import time
+import hashlib
+
+import WireCodec
+
+
+class LinkStateEntry:
+    """
+    Link state advertisement stored for one origin.
+    """
+    __slots__ = ("sequence", "digest", "costs", "received_at")
+
+    def __init__(self, sequence, digest, costs, received_at):
+        self.sequence = sequence
+        self.digest = digest
+        self.costs = costs
+        self.received_at = received_at
+
+
+class LinkStateDatabase:
+    """
+    Link state database keyed by origin that keeps the sequence number, age and
+    content hash of every advertisement, so stale and repeated ones are dropped
+    before their payload is decoded.
+    """
+    # Results of install
+    STALE = "stale"
+    DUPLICATE = "duplicate"
+    REFRESH = "refresh"
+    CHANGED = "changed"
+    # Nodes of this version number advertisements from the clock, so a restart never goes back. Sequences below
+    # this come from implementations that count from 1 on every start
+    COUNTER_SEQUENCES = 10 ** 9
+
+    def __init__(self, own_jid, own_costs):
+        """
+        Constructor for LinkStateDatabase class.
+        :param own_jid: JID of the local node.
+        :param own_costs: Cost map of the local node.
+        """
+        self.entries = {}
+        # Plain origin -> {neighbor: cost} view used by routing
+        self.costs = {own_jid: own_costs}
+
+    @staticmethod
+    def sequence_from_id(origin, message_id):
+        """
+        Extract the sequence number from an id built as ls_<origin>_<n>.
+        :return: The sequence number, or None for ids in another format.
+        """
+        prefix = f"ls_{origin}_"
+        if isinstance(message_id, str) and message_id.startswith(prefix):
+            try:
+                return int(message_id[len(prefix):])
+            except ValueError:
+                return None
+        return None
+
+    @staticmethod
+    def digest(payload):
+        """
+        Content hash of a payload as received on the wire.
+        """
+        if not isinstance(payload, str):
+            payload = json.dumps(payload, sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+    def age(self, origin):
+        """
+        Seconds since the last advertisement of the origin was accepted.
+        """
+        entry = self.entries.get(origin)
+        return None if entry is None else time.time() - entry.received_at
+
+    def aged(self, max_age):
+        """
+        Origins whose last advertisement is older than max_age seconds.
+        """
+        deadline = time.time() - max_age
+        return [origin for origin, entry in self.entries.items() if entry.received_at < deadline]
+
+    def purge(self, origin):
+        """
+        Forget an origin.
+        :return: Its last cost map.
+        """
+        self.entries.pop(origin, None)
+        return self.costs.pop(origin, {})
+
+    def install(self, origin, sequence, payload, received_at=None):
+        """
+        Install an advertisement if it is newer than the stored one.
+        :param origin: JID of the node that originated the advertisement.
+        :param sequence: Sequence number, or None when the sender does not provide one.
+        :param payload: Cost map, JSON encoded or already decoded.
+        :param received_at: Time the advertisement was received, defaults to now.
+        :return: Tuple (result, old costs, new costs), costs are only set when the result is CHANGED.
+        Raises WireCodec.DecodeError, leaving the database unchanged, if the payload is not a cost map.
+        """
+        entry = self.entries.get(origin)
+        numbered = entry is not None and sequence is not None and entry.sequence is not None
+        # A counting node goes back to 1 when it restarts, only clock based numbers can be stale
+        if numbered and self.COUNTER_SEQUENCES <= sequence < entry.sequence:
+            return self.STALE, None, None
+        digest = self.digest(payload)
+        # The same number with other content was reused by the origin, the content wins like a checksum tiebreak
+        if numbered and sequence == entry.sequence and digest == entry.digest:
+            return self.DUPLICATE, None, None
+
+        now = time.time() if received_at is None else received_at
+        if entry is not None and entry.digest == digest:
+            entry.sequence = sequence
+            entry.received_at = now
+            return self.REFRESH, None, None
+
+        costs = WireCodec.decode_costs(payload)
+        if entry is None:
+            # Every cost map mentioning the origin then shares this one string
+            origin = sys.intern(origin)
+            old_costs = self.costs.get(origin, {})
+            self.entries[origin] = LinkStateEntry(sequence, digest, costs, now)
+            self.costs[origin] = costs
+            return self.CHANGED, old_costs, costs
+
+        old_costs = self.costs[origin]
+        entry.sequence = sequence
+        entry.digest = digest
+        entry.received_at = now
+        if costs == old_costs:
+            return self.REFRESH, None, None
+        entry.costs = self.costs[origin] = costs
+        return self.CHANGED, old_costs, costs
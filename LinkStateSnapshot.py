@@ -0,0 +1,126 @@
+import os
+import mmap
+import time
+import struct
+
+MAGIC = b"LSDB"
+VERSION = 1
+
+# magic, version, own sequence, saved at, strings, entries
+HEADER = struct.Struct("<4sB3xqdII")
+STRING_LENGTH = struct.Struct("<H")
+# origin, sequence (-1 when unknown), received at, number of costs
+ENTRY = struct.Struct("<IqdI")
+COST = struct.Struct("<Id")
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a snapshot file is truncated or was not written by this module.
+    """
+
+
+class Snapshot:
+    """
+    Link state database and own sequence number of a node, as read from disk.
+    """
+    def __init__(self, sequence, saved_at, entries):
+        """
+        Constructor for Snapshot class.
+        :param sequence: Last sequence number the node advertised.
+        :param saved_at: Time the snapshot was written.
+        :param entries: Dictionary origin -> (sequence, received at, costs).
+        """
+        self.sequence = sequence
+        self.saved_at = saved_at
+        self.entries = entries
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def dump(sequence, entries):
+    """
+    Serialize a snapshot to the fixed width little endian layout read by load.
+    :param sequence: Last sequence number the node advertised.
+    :param entries: Dictionary origin -> (sequence or None, received at, costs).
+    """
+    strings = {}
+
+    def index(jid):
+        if jid not in strings:
+            strings[jid] = len(strings)
+        return strings[jid]
+
+    body = bytearray()
+    for origin, (entry_sequence, received_at, costs) in entries.items():
+        body += ENTRY.pack(index(origin), -1 if entry_sequence is None else entry_sequence, received_at, len(costs))
+        for neighbor, cost in costs.items():
+            body += COST.pack(index(neighbor), cost)
+
+    table = bytearray()
+    for jid in strings:
+        encoded = jid.encode()
+        table += STRING_LENGTH.pack(len(encoded)) + encoded
+    return HEADER.pack(MAGIC, VERSION, sequence, time.time(), len(strings), len(entries)) + table + body
+
+
+def write(path, sequence, entries):
+    """
+    Write a snapshot atomically, readers see either the previous file or the new one.
+    """
+    data = dump(sequence, entries)
+    with open(path + ".tmp", 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+    return len(data)
+
+
+def parse(data):
+    """
+    Read a snapshot from a buffer such as a memory map.
+    """
+    try:
+        magic, version, sequence, saved_at, string_count, entry_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError("Not a link state snapshot")
+        position = HEADER.size
+        strings = []
+        for _ in range(string_count):
+            (length,) = STRING_LENGTH.unpack_from(data, position)
+            position += STRING_LENGTH.size
+            strings.append(bytes(data[position:position + length]).decode())
+            position += length
+
+        entries = {}
+        for _ in range(entry_count):
+            origin, entry_sequence, received_at, cost_count = ENTRY.unpack_from(data, position)
+            position += ENTRY.size
+            costs = {}
+            for _ in range(cost_count):
+                neighbor, cost = COST.unpack_from(data, position)
+                position += COST.size
+                costs[strings[neighbor]] = _number(cost)
+            entries[strings[origin]] = (None if entry_sequence < 0 else entry_sequence, received_at, costs)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Invalid snapshot: {e}") from None
+    return Snapshot(sequence, saved_at, entries)
+
+
+def load(path):
+    """
+    Memory map a snapshot file and parse it.
+    :return: The Snapshot, or None if the file does not exist.
+    """
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise SnapshotError("Empty snapshot")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse(data)
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from collections import defaultdict, Counter
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """
+    Fixed bucket histogram, same model as a Prometheus histogram.
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # Last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q quantile.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99)}
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples the stack of the
+    profiled thread at a fixed interval and counts the functions seen.
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        """
+        Constructor for SamplingProfiler class.
+        :param interval: Seconds between samples.
+        :param thread_id: Thread to sample, defaults to the one creating the profiler.
+        """
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = 0
+        self.inclusive = Counter()
+        self.exclusive = Counter()
+        self.running = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.running.set()
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.running.clear()
+            self.thread.join()
+            self.thread = None
+
+    def _sample(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples += 1
+                code = frame.f_code
+                self.exclusive[f"{code.co_filename}:{code.co_name}"] += 1
+                seen = set()
+                while frame is not None:
+                    code = frame.f_code
+                    key = f"{code.co_filename}:{code.co_name}"
+                    if key not in seen:
+                        seen.add(key)
+                        self.inclusive[key] += 1
+                    frame = frame.f_back
+            time.sleep(self.interval)
+
+    def top(self, limit=20):
+        """
+        Functions with the most samples, as (function, share of samples on stack, share of samples on top).
+        """
+        if not self.samples:
+            return []
+        return [(key, count / self.samples, self.exclusive[key] / self.samples)
+                for key, count in self.inclusive.most_common(limit)]
+
+
+class Metrics:
+    """
+    Counters and latency histograms of a node, exported as Prometheus text or a JSON snapshot.
+    """
+    def __init__(self, node):
+        """
+        Constructor for Metrics class.
+        :param node: Name of the node, added as a label.
+        """
+        self.node = node
+        # (name, packet type) -> count
+        self.counters = defaultdict(int)
+        # handler -> Histogram
+        self.histograms = defaultdict(Histogram)
+        self.loop_lag = Histogram()
+        # Time packets spend in the outbound queues before they are sent
+        self.queue_wait = Histogram()
+        # Callables returning extra {name: value} gauges
+        self.gauges = []
+        self.profiler = None
+        self.tasks = []
+        self.server = None
+
+    def count(self, name, packet_type, value=1):
+        self.counters[(name, packet_type)] += value
+
+    def observe(self, handler, seconds):
+        self.histograms[handler].observe(seconds)
+
+    def set_profiling(self, enabled, interval=0.005):
+        """
+        Start or stop the sampling profiler at runtime.
+        :return: The top functions of the run when stopping.
+        """
+        if enabled:
+            if self.profiler is None:
+                self.profiler = SamplingProfiler(interval)
+                self.profiler.start()
+            return []
+        if self.profiler is None:
+            return []
+        self.profiler.stop()
+        top = self.profiler.top()
+        self.profiler = None
+        return top
+
+    def start_lag_sampler(self, interval=0.5):
+        """
+        Measure how late the event loop wakes up a sleeping task.
+        """
+        async def sample():
+            loop = asyncio.get_running_loop()
+            while True:
+                start = loop.time()
+                await asyncio.sleep(interval)
+                self.loop_lag.observe(max(loop.time() - start - interval, 0.0))
+        self.tasks.append(asyncio.create_task(sample()))
+
+    def snapshot(self):
+        counters = defaultdict(dict)
+        for (name, packet_type), value in self.counters.items():
+            counters[name][packet_type] = value
+        snapshot = {
+            "node": self.node,
+            "time": time.time(),
+            "counters": counters,
+            "handlers": {handler: histogram.to_dict() for handler, histogram in self.histograms.items()},
+            "event_loop_lag": self.loop_lag.to_dict(),
+            "queue_wait": self.queue_wait.to_dict(),
+        }
+        for gauge in self.gauges:
+            snapshot.update(gauge())
+        return snapshot
+
+    def render(self):
+        """
+        Metrics in the Prometheus text exposition format.
+        """
+        node = self.node.replace('"', '\\"')
+        lines = []
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE routing_{name}_total counter")
+            for (counter, packet_type), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f'routing_{name}_total{{node="{node}",type="{packet_type}"}} {value}')
+
+        histograms = [(f'handler="{handler}"', "routing_handler_seconds", histogram)
+                      for handler, histogram in sorted(self.histograms.items())]
+        histograms.append(("", "routing_event_loop_lag_seconds", self.loop_lag))
+        histograms.append(("", "routing_queue_wait_seconds", self.queue_wait))
+        declared = set()
+        for labels, metric, histogram in histograms:
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            labels = f'node="{node}"' + (f",{labels}" if labels else "")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        for gauge in self.gauges:
+            for name, value in gauge().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE routing_{name} gauge")
+                    lines.append(f'routing_{name}{{node="{node}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port, host="127.0.0.1"):
+        """
+        Serve render() over HTTP on a local port, until close().
+        """
+        async def handle(reader, writer):
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                pass
+            body = self.render().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+            writer.close()
+
+        self.server = await asyncio.start_server(handle, host, port)
+        return self.server
+
+    def close(self):
+        """
+        Stop the exporter, the background tasks and the profiler, freeing the port.
+        """
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        self.set_profiling(False)
+
+    def start_snapshots(self, path, interval=10.0):
+        """
+        Rewrite a JSON snapshot file periodically.
+        """
+        async def write():
+            loop = asyncio.get_running_loop()
+            while True:
+                await asyncio.sleep(interval)
+                data = json.dumps(self.snapshot(), default=str)
+                await loop.run_in_executor(None, self._write_file, path, data)
+        self.tasks.append(asyncio.create_task(write()))
+
+    @staticmethod
+    def _write_file(path, data):
+        # Readers never see a half written file
+        with open(path + ".tmp", 'w') as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
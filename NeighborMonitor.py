@@ -0,0 +1,151 @@
+import time
+
+
+class NeighborState:
+    """
+    What probing has learned about one neighbor.
+    """
+    __slots__ = ("rtt", "loss", "samples", "cost", "changed_at", "probes", "alive", "last_heard")
+
+    def __init__(self, cost):
+        """
+        Constructor for NeighborState class.
+        :param cost: Cost currently advertised for the link.
+        """
+        self.rtt = None
+        self.loss = 0.0
+        self.samples = 0
+        self.cost = cost
+        # The configured cost can be replaced as soon as there are enough samples
+        self.changed_at = None
+        # Probe id -> time it was sent
+        self.probes = {}
+        # Adjacency, only tracked once the neighbor was heard from or expected
+        self.alive = False
+        self.last_heard = None
+
+
+class NeighborMonitor:
+    """
+    Link quality of every neighbor measured with echo probes: an EWMA of the
+    round trip time and of the loss rate, turned into link costs that only
+    move when they cross a hysteresis threshold, so routes follow latency
+    without flapping. Also tracks whether each neighbor is alive from the
+    last time anything was heard from it.
+    """
+    def __init__(self, costs, alpha=0.2, cost_unit=0.01, hysteresis=0.25, hold_time=5.0, probe_timeout=2.0,
+                 min_samples=3, dead_interval=4.0, clock=time.monotonic):
+        """
+        Constructor for NeighborMonitor class.
+        :param costs: Dictionary neighbor -> configured cost, the starting point.
+        :param alpha: Weight of a new sample in the averages.
+        :param cost_unit: Seconds of round trip time worth one unit of cost.
+        :param hysteresis: Relative change the measured cost needs before it replaces the advertised one.
+        :param hold_time: Minimum seconds between two cost changes of the same link.
+        :param probe_timeout: Seconds after which an unanswered probe counts as lost.
+        :param min_samples: Replies needed before the configured cost is replaced.
+        :param dead_interval: Seconds of silence after which a neighbor is declared dead.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.alpha = alpha
+        self.cost_unit = cost_unit
+        self.hysteresis = hysteresis
+        self.hold_time = hold_time
+        self.probe_timeout = probe_timeout
+        self.min_samples = min_samples
+        self.dead_interval = dead_interval
+        self.clock = clock
+        self.neighbors = {neighbor: NeighborState(cost) for neighbor, cost in costs.items()}
+
+    def state(self, neighbor):
+        state = self.neighbors.get(neighbor)
+        if state is None:
+            state = self.neighbors[neighbor] = NeighborState(1)
+        return state
+
+    def heard(self, neighbor):
+        """
+        Record that a packet arrived from a neighbor.
+        :return: True if the neighbor was not alive before.
+        """
+        state = self.neighbors.get(neighbor)
+        if state is None:
+            return False
+        state.last_heard = self.clock()
+        if state.alive:
+            return False
+        state.alive = True
+        return True
+
+    def expect(self, neighbors):
+        """
+        Start the dead timer of neighbors never heard from, as if they just spoke.
+        """
+        now = self.clock()
+        for neighbor in neighbors:
+            state = self.state(neighbor)
+            if not state.alive and state.last_heard is None:
+                state.alive = True
+                state.last_heard = now
+
+    def dead(self):
+        """
+        Neighbors silent for longer than the dead interval, each reported once until heard from again.
+        """
+        deadline = self.clock() - self.dead_interval
+        dead = [neighbor for neighbor, state in self.neighbors.items() if state.alive and state.last_heard < deadline]
+        for neighbor in dead:
+            self.neighbors[neighbor].alive = False
+        return dead
+
+    def probe_sent(self, neighbor, probe_id):
+        self.state(neighbor).probes[probe_id] = self.clock()
+
+    def reply(self, neighbor, probe_id):
+        """
+        Record the reply to a probe.
+        :return: Round trip time in seconds, or None if the probe is unknown or already counted as lost.
+        """
+        state = self.neighbors.get(neighbor)
+        sent_at = None if state is None else state.probes.pop(probe_id, None)
+        if sent_at is None:
+            return None
+        rtt = self.clock() - sent_at
+        state.rtt = rtt if state.rtt is None else (1 - self.alpha) * state.rtt + self.alpha * rtt
+        state.loss *= 1 - self.alpha
+        state.samples += 1
+        return rtt
+
+    def expire(self):
+        """
+        Count the probes unanswered for longer than the timeout as lost.
+        """
+        deadline = self.clock() - self.probe_timeout
+        for state in self.neighbors.values():
+            lost = [probe_id for probe_id, sent_at in state.probes.items() if sent_at < deadline]
+            for probe_id in lost:
+                del state.probes[probe_id]
+                state.loss = (1 - self.alpha) * state.loss + self.alpha
+
+    def measured_cost(self, state):
+        # Lost probes make a link look proportionally slower
+        return max(1, round(state.rtt / self.cost_unit / max(1 - state.loss, 0.1)))
+
+    def changed_costs(self):
+        """
+        Costs that moved past the hysteresis threshold since they were last advertised.
+        :return: Dictionary neighbor -> new cost, the new costs are taken as advertised.
+        """
+        now = self.clock()
+        changes = {}
+        for neighbor, state in self.neighbors.items():
+            if state.samples < self.min_samples:
+                continue
+            if state.changed_at is not None and now - state.changed_at < self.hold_time:
+                continue
+            cost = self.measured_cost(state)
+            if abs(cost - state.cost) >= max(1, self.hysteresis * state.cost):
+                state.cost = cost
+                state.changed_at = now
+                changes[neighbor] = cost
+        return changes
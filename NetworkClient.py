@@ -1,105 +1,387 @@
 import sys
+import ssl
 import asyncio
+import inspect
 import slixmpp
 import json
-import heapq
 import logging
 import time
 import uuid
+import zlib
+from SPFEngine import SPFEngine
+from LinkStateDatabase import LinkStateDatabase
+from DuplicateCache import DuplicateCache
+from SPFScheduler import SPFScheduler
+import WireCodec
+import LinkStateSnapshot
+from Transport import XMPPTransport
+from EventLog import EventLog
+from Metrics import Metrics
+from OutboundQueue import OutboundQueues
+from NeighborMonitor import NeighborMonitor
+from ReliableDelivery import ReliableSender
+
+# Optional constructor arguments that can be set from a node YAML config
+CONFIG_OPTIONS = ("dedup_size", "dedup_ttl", "spf_initial_delay", "spf_hold_time", "spf_max_delay", "wire_codec",
+                  "flood_hop_limit", "flood_rpf", "queue_capacity", "queue_workers", "queue_policy",
+                  "batch_window", "batch_bytes", "multipath",
+                  "adaptive_costs", "probe_interval", "cost_unit", "cost_hysteresis", "cost_hold_time",
+                  "hello_interval", "dead_interval", "lsa_max_age", "lsa_refresh_interval",
+                  "snapshot_file", "snapshot_interval", "provisional_ttl", "reliable_window", "reliable_attempts", "reliable_min_rto",
+                  "log_capacity", "log_file", "metrics_port", "metrics_file", "metrics_interval")
+
+
+def options_from_config(config):
+    return {key: config[key] for key in CONFIG_OPTIONS if key in config}
+
+
+_ssl_context = []
+# Older slixmpp releases build their own context and take none from the constructor
+SSL_CONTEXT_ARGUMENT = "ssl_context" in inspect.signature(slixmpp.xmlstream.XMLStream.__init__).parameters
+
+
+def shared_ssl_context():
+    """
+    TLS context shared by every client of the process. slixmpp otherwise builds
+    one per client and loads the system CA store each time, which dominates
+    the startup of large simulations.
+    """
+    if not _ssl_context:
+        context = ssl.create_default_context()
+        context.check_hostname = True
+        context.verify_mode = ssl.CERT_REQUIRED
+        _ssl_context.append(context)
+    return _ssl_context[0]
+
 
 class NetworkClient(slixmpp.ClientXMPP):
-    def __init__(self, jid, password, neighbors, costs=None, mode="lsr", verbose=False):
-        super().__init__(jid, password)
+    def __init__(self, jid, password, neighbors, costs=None, mode="lsr", verbose=False,
+                 dedup_size=10000, dedup_ttl=120.0,
+                 spf_initial_delay=0.05, spf_hold_time=0.2, spf_max_delay=5.0,
+                 wire_codec=WireCodec.JSON, flood_hop_limit=0, flood_rpf=False, transport=None,
+                 queue_capacity=256, queue_workers=4, queue_policy="priority", batch_window=0.0, batch_bytes=16384,
+                 multipath=False, adaptive_costs=False, probe_interval=1.0, cost_unit=0.01, cost_hysteresis=0.25,
+                 cost_hold_time=5.0, hello_interval=0.0, dead_interval=None, lsa_max_age=0.0,
+                 lsa_refresh_interval=30.0, snapshot_file=None, snapshot_interval=30.0, provisional_ttl=60.0,
+                 reliable_window=32, reliable_attempts=5, reliable_min_rto=0.2,
+                 log_capacity=10000, log_file=None, metrics_port=None, metrics_file=None, metrics_interval=10.0):
+        if SSL_CONTEXT_ARGUMENT:
+            super().__init__(jid, password, ssl_context=shared_ssl_context())
+        else:
+            super().__init__(jid, password)
         self.use_starttls = False
         self.register_plugin('feature_starttls', module='slixmpp.features.feature_starttls')
         self.neighbors = neighbors
         self.costs = costs or {}
-        self.routing_table = {}
-        self.link_state_db = {self.boundjid.full: self.costs}
-        self.received_messages = {}
-        self.message_log = []
+        self.lsdb = LinkStateDatabase(self.boundjid.full, self.costs)
+        self.link_state_db = self.lsdb.costs
+        self.spf = SPFEngine(self.boundjid.full)
+        self.routing_table = self.spf.load(self.link_state_db)
+        # Origin -> costs before the first change not yet applied to the routing table
+        self.pending_lsas = {}
+        self.spf_scheduler = SPFScheduler(self.run_pending_spf, spf_initial_delay, spf_hold_time, spf_max_delay)
+        self.received_messages = DuplicateCache(dedup_size, dedup_ttl)
         self.mode = mode
-        self.sequence_number = 0
+        # Binary packets are only sent to neighbors that announced they understand them
+        self.wire_codec = wire_codec
+        self.peer_codecs = {}
+        # Neighbors that announced they unpack batches
+        self.peer_batching = set()
+        # Flooding limits, a hop limit of 0 means unlimited
+        self.flood_hop_limit = flood_hop_limit
+        self.flood_rpf = flood_rpf
+        # Origin -> distances from it, cached until the topology changes
+        self.remote_distances = {}
+        # Equal-cost hops and loop-free alternates to a destination, also cleared on topology changes
+        self.multipath = multipath
+        self.next_hops = {}
+        # Neighbor -> distances from it, computed with the routing table when multipath is on
+        self.neighbor_distances = {}
+        self.down_neighbors = set()
+        # RTT and loss of the neighbors from echo probes, turned into link costs in adaptive mode
+        self.monitor = NeighborMonitor(self.costs, cost_unit=cost_unit, hysteresis=cost_hysteresis,
+                                       hold_time=cost_hold_time, probe_timeout=2 * probe_interval,
+                                       dead_interval=dead_interval or 4 * hello_interval)
+        self.adaptive_costs = adaptive_costs
+        self.probe_interval = probe_interval
+        # Hellos are echoes too, 0 disables liveness tracking
+        self.hello_interval = hello_interval
+        # Link states not refreshed for this long are purged, 0 keeps them forever
+        self.lsa_max_age = lsa_max_age
+        self.lsa_refresh_interval = lsa_refresh_interval
+        # Start from the clock so a restarted node is not taken as stale
+        self.sequence_number = int(time.time())
         self.verbose = verbose
 
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(self.boundjid.full)
+        self.event_log = EventLog(self.boundjid.full, "INFO" if verbose else "IMPORTANT", log_capacity, self.logger)
+        self.log_file = log_file
+
+        self.metrics = Metrics(self.boundjid.full)
+        self.metrics.gauges.append(self.metric_gauges)
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+
+        # Everything routing sends or receives goes through the transport
+        self.packet_transport = transport or XMPPTransport()
+        self.packet_transport.bind(self)
+        # Packets leave through bounded per-neighbor queues, never straight from a handler
+        self.outbound = OutboundQueues(self.packet_transport.send, queue_capacity, queue_workers, queue_policy,
+                                       getattr(self.packet_transport, "drain", None), batch_window, batch_bytes,
+                                       WireCodec.encode_batch)
+        self.metrics.queue_wait = self.outbound.wait_time
+        # Acknowledged data messages, retransmitted until the destination confirms them
+        self.reliable = ReliableSender(self.route_message, reliable_window, reliable_attempts, reliable_min_rto)
+        # Reliable messages already delivered here, and attempts already acknowledged
+        self.delivered_messages = DuplicateCache(dedup_size, dedup_ttl)
+
+        # Origins only known from the snapshot, until they advertise again
+        self.provisional = set()
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+        self.provisional_ttl = provisional_ttl
+        if snapshot_file:
+            self.load_snapshot()
+
+        # Set once neighbors were probed and the first link state went out
+        self.ready = asyncio.Event()
 
         self.add_event_handler("session_start", self.start)
         self.add_event_handler("message", self.message)
+        self.add_event_handler("disconnected", self.stop_tasks)
+        if hello_interval:
+            # Presence changes are a faster signal than missed hellos, only used when failure detection is on
+            self.add_event_handler("presence_unavailable", lambda presence: self.adjacency_down(presence['from'].full))
+            self.add_event_handler("presence_available", lambda presence: self.adjacency_up(presence['from'].full))
 
-    def log(self, level, message):
-        if self.verbose or level in ['IMPORTANT', 'CRITICAL', 'ERROR']:
-            if level.lower() == 'important':
-                level = 'INFO'
-                getattr(self.logger, level.lower())(message)
-                
-            self.message_log.append(message)
+    def log(self, level, message, *args, **fields):
+        # Arguments are only formatted when the level is enabled
+        self.event_log.log(level, message, *args, **fields)
 
     def send_log(self):
-        return self.message_log
+        return self.event_log.messages()
+
+    def read_log(self, cursor=0):
+        entries, cursor = self.event_log.read(cursor)
+        return [entry.message for entry in entries], cursor
+
+    def metric_gauges(self):
+        cache = self.received_messages.metrics()
+        return {
+            "routes": len(self.routing_table),
+            "lsdb_origins": len(self.link_state_db),
+            "spf_runs": self.spf_scheduler.runs,
+            "spf_avoided": self.spf_scheduler.avoided,
+            "spf_cpu_seconds": self.spf_scheduler.run_time,
+            "dedup_entries": cache["entries"],
+            "dedup_evicted": cache["evicted"] + cache["expired"],
+            "queue_depth": len(self.outbound),
+            "queue_max_depth": self.outbound.max_depth,
+            "queue_dropped": sum(self.outbound.dropped.values()),
+            "queue_depths": self.outbound.depths(),
+            "batches_sent": self.outbound.batches,
+            "batched_packets": self.outbound.batched,
+            "provisional_origins": len(self.provisional),
+            "neighbor_rtt": {neighbor: state.rtt for neighbor, state in self.monitor.neighbors.items()},
+            "reliable": self.reliable.metrics(),
+        }
+
+    def metrics_summary(self):
+        totals = {}
+        for (name, _), value in self.metrics.counters.items():
+            totals[name] = totals.get(name, 0) + value
+        handler = self.metrics.histograms["message"]
+        return (f"Received: {totals.get('packets_received', 0)}  Forwarded: {totals.get('packets_forwarded', 0)}  "
+                f"Dropped: {totals.get('packets_dropped', 0)}  Duplicates: {totals.get('packets_duplicate', 0)}  "
+                f"Handler p95: {handler.quantile(0.95) * 1000:.2f} ms  "
+                f"Loop lag p95: {self.metrics.loop_lag.quantile(0.95) * 1000:.2f} ms  "
+                f"SPF runs: {self.spf_scheduler.runs}  "
+                f"Queued: {len(self.outbound)}  Queue drops: {sum(self.outbound.dropped.values())}")
+
+    def set_profiling(self, enabled):
+        """
+        Turn the sampling profiler on or off while the node runs.
+        :return: The functions seen most often, when turning it off.
+        """
+        self.log('IMPORTANT', "Profiler %s", "started" if enabled else "stopped")
+        return self.metrics.set_profiling(enabled)
+
+    def get_ssl_context(self):
+        # slixmpp applies ciphers and certificates to the context itself, those belong to this client only
+        if self.ssl_context is shared_ssl_context() and (self.ciphers or self.keyfile or self.ca_certs):
+            self.ssl_context = ssl.create_default_context()
+        return super().get_ssl_context()
+
+    def stop_tasks(self, event=None):
+        # Background work of the node ends with its connection, a reconnect starts it again
+        self.outbound.stop()
+        self.metrics.close()
+
+    async def start_metrics(self):
+        self.metrics.start_lag_sampler()
+        if self.metrics_port:
+            await self.metrics.serve(self.metrics_port)
+        if self.metrics_file:
+            self.metrics.start_snapshots(self.metrics_file, self.metrics_interval)
 
     async def start(self, event):
-        self.log('INFO', f"Session started (Mode: {self.mode})")
         self.send_presence()
-        await self.get_roster()
-        await asyncio.sleep(1)
+        # Routing does not depend on the roster, no need to wait for it
+        await asyncio.gather(self.get_roster(), self.start_routing())
+
+    async def start_routing(self):
+        self.log('INFO', "Session started (Mode: %s)", self.mode)
         await self.discover_neighbors()
         if self.mode == "lsr":
             await self.share_link_state()
+            if self.adaptive_costs or self.hello_interval:
+                asyncio.create_task(self.monitor_neighbors())
+            if self.lsa_max_age:
+                self.schedule_periodic_tasks()
+            if self.provisional and self.provisional_ttl:
+                asyncio.create_task(self.expire_provisional())
+        self.ready.set()
 
     async def send_message_to(self, to_jid, message, msg_type='chat'):
+        """
+        Send or flood a packet from this node. Nothing is awaited, the packet is in the outbound queues on
+        return, the coroutine is kept for the callers of the original API. Synchronous code calls route_message.
+        :param to_jid: JID of the destination, or of the neighbor for echo and info packets.
+        :param message: Packet dictionary or its JSON text.
+        """
+        self.route_message(to_jid, message, msg_type)
+
+    def send_reliable(self, to_jid, payload, message_id=None):
+        """
+        Send a data message that the destination acknowledges, retransmitting it until it does.
+        :param to_jid: JID of the destination.
+        :param payload: Message text.
+        :param message_id: Id of the message, a random one by default.
+        :return: Future resolved with a DeliveryReport (latency, hops, attempts), or failed with DeliveryError.
+        """
+        return self.reliable.submit(to_jid, {
+            "type": "message",
+            "from": self.boundjid.full,
+            "to": to_jid,
+            "hops": 0,
+            "headers": [],
+            "payload": payload,
+            "id": message_id or str(uuid.uuid4()),
+            "reliable": True
+        })
+
+    def route_message(self, to_jid, message, msg_type='chat'):
         if isinstance(message, str):
             message = json.loads(message)
 
         if 'id' not in message:
             message['id'] = str(uuid.uuid4())
 
+        relayed = message.get('from') != self.boundjid.full
         if message['type'] in ['echo', 'info']:
-            self.send_message(mto=to_jid, mbody=json.dumps(message), mtype=msg_type)
-            self.log('INFO', f"Sent a {message['type']} message to {to_jid}")
+            # Echoes carry the capability announcement and a send time, they never wait for a batch
+            self.outbound.put(to_jid, self.encode_for(to_jid, message), msg_type, message['type'],
+                              message['type'] == 'info' and self.batches_to(to_jid))
+            self.metrics.count("packets_forwarded" if relayed else "packets_sent", message['type'])
+            self.log('INFO', "Sent a %s message to %s", message['type'], to_jid)
         else:
             if self.mode == "lsr":
-                next_hop = self.get_next_hop(to_jid)
+                next_hop = self.select_next_hop(to_jid, message)
                 if next_hop:
                     message['hops'] += 1
                     message['headers'].append({"via": self.boundjid.full})
-                    self.send_message(mto=next_hop, mbody=json.dumps(message), mtype=msg_type)
-                    self.log('IMPORTANT', f"Forwarded message to {to_jid} via {next_hop}")
+                    self.outbound.put(next_hop, self.encode_for(next_hop, message), msg_type, message['type'],
+                                      self.batches_to(next_hop))
+                    self.metrics.count("packets_forwarded" if relayed else "packets_sent", message['type'])
+                    self.log('IMPORTANT', "Forwarded message to %s via %s", to_jid, next_hop)
                 else:
-                    self.log('ERROR', f"No route to {to_jid}")
+                    self.metrics.count("packets_dropped", message['type'])
+                    self.log('ERROR', "No route to %s", to_jid)
             elif self.mode == "flooding":
-                self.log('IMPORTANT', f"Initiating flood for message: {message.get('id', 'unknown')}")
-                await self.flood_message(message, self.boundjid.full)
+                self.log('IMPORTANT', "Initiating flood for message: %s", message.get('id', 'unknown'))
+                self.forward_flood(message, self.boundjid.full)
 
     def message(self, msg):
         if msg['type'] in ('chat', 'normal'):
-            try:
-                message_body = json.loads(msg['body'])
-                if isinstance(message_body, dict):
-                    if message_body.get("type") == "info":
-                        asyncio.create_task(self.flood_message(message_body, msg['from'].full))
-                        self.link_state_db[message_body["from"]] = json.loads(message_body["payload"])
-                        self.compute_routing_table()
-                    elif message_body.get("type") == "echo":
-                        self.handle_echo(message_body)
+            self.receive(msg['body'], msg['from'].full)
+
+    def receive(self, body, sender):
+        packed = WireCodec.split_batch(body)
+        if packed is not None:
+            # Only neighbors that announced batching send batches, anything else is not a valid body
+            if sender not in self.peer_batching:
+                self.metrics.count("packets_dropped", "invalid")
+                self.log('ERROR', "Dropped a batch from %s, which never announced batching", sender)
+                return
+            self.metrics.count("packets_received", WireCodec.BATCH)
+            for part in packed:
+                self.receive(part, sender)
+            return
+
+        if self.hello_interval and self.monitor.heard(sender) and sender in self.down_neighbors:
+            self.adjacency_up(sender)
+
+        start = time.perf_counter()
+        try:
+            message_body, codec = WireCodec.decode(body)
+            if codec == WireCodec.BINARY:
+                self.peer_codecs[sender] = WireCodec.BINARY
+            if isinstance(message_body, dict):
+                self.metrics.count("packets_received", message_body.get("type", "unknown"))
+                if message_body.get("type") == "info":
+                    self.handle_link_state(message_body, sender)
+                elif message_body.get("type") == "echo":
+                    codecs = message_body.get("codecs", ())
+                    if WireCodec.BINARY in codecs:
+                        self.peer_codecs[sender] = WireCodec.BINARY
+                    if WireCodec.BATCH in codecs:
+                        self.peer_batching.add(sender)
+                    self.handle_echo(message_body)
+                else:
+                    self.log('IMPORTANT', "Received a message from %s: %s", sender, message_body.get('id', 'unknown'))
+                    if message_body['to'] == self.boundjid.full:
+                        if message_body.get('type') == 'ack':
+                            self.handle_ack(message_body)
+                        elif self.accept_reliable(message_body):
+                            self.log('IMPORTANT', "Message reached its destination: %s", message_body.get('payload', 'unknown'))
+                            self.log('IMPORTANT', "Path taken: %s", ' -> '.join([h['via'] for h in message_body['headers']]))
+                            self.log('IMPORTANT', "Number of hops: %s", message_body['hops'])
+                            self.event("routed_message", message_body)
                     else:
-                        self.log('IMPORTANT', f"Received a message from {msg['from']}: {message_body.get('id', 'unknown')}")
-                        if message_body['to'] == self.boundjid.full:
-                            self.log('IMPORTANT', f"Message reached its destination: {message_body.get('payload', 'unknown')}")
-                            self.log('IMPORTANT', f"Path taken: {' -> '.join([h['via'] for h in message_body['headers']])}")
-                            self.log('IMPORTANT', f"Number of hops: {message_body['hops']}")
+                        if self.mode == "flooding":
+                            self.forward_flood(message_body, sender)
                         else:
-                            if self.mode == "flooding":
-                                asyncio.create_task(self.flood_message(message_body, msg['from'].full))
-                            else:
-                                asyncio.create_task(self.send_message_to(message_body['to'], message_body))
-            except json.JSONDecodeError:
-                self.log('INFO', f"Received a non-JSON message from {msg['from']}: {msg['body']}")
+                            self.route_message(message_body['to'], message_body)
+        except WireCodec.DecodeError as e:
+            self.metrics.count("packets_dropped", "invalid")
+            self.log('INFO', "Dropped an invalid message from %s: %s", sender, e)
+        finally:
+            self.metrics.observe("message", time.perf_counter() - start)
+
+    def handle_link_state(self, message, sender):
+        origin = message["from"]
+        if origin == self.boundjid.full:
+            return
+
+        sequence = LinkStateDatabase.sequence_from_id(origin, message.get("id"))
+        result, old_costs, new_costs = self.lsdb.install(origin, sequence, message["payload"])
+        if self.provisional and result != LinkStateDatabase.STALE and origin in self.provisional:
+            self.provisional.discard(origin)
+            if not self.provisional:
+                self.log('IMPORTANT', "Every origin of the snapshot advertised again")
+        if result in (LinkStateDatabase.STALE, LinkStateDatabase.DUPLICATE):
+            self.metrics.count("packets_duplicate", "info")
+            self.log('INFO', "Dropped %s link state from %s", result, origin)
+            return
+
+        self.forward_flood(message, sender)
+        if result == LinkStateDatabase.CHANGED:
+            self.update_routing_table(origin, old_costs, new_costs)
 
     async def discover_neighbors(self):
-        for neighbor in self.neighbors:
-            await self.send_echo(neighbor)
+        await asyncio.gather(*(self.send_echo(neighbor) for neighbor in self.neighbors))
 
     async def send_echo(self, to_jid):
         message = {
@@ -111,31 +393,208 @@ class NetworkClient(slixmpp.ClientXMPP):
             "payload": str(time.time()),
             "id": str(uuid.uuid4())
         }
+        # Announce the binary format and batching, echoes themselves always travel as single JSON bodies
+        codecs = [codec for codec, enabled in ((WireCodec.BINARY, self.wire_codec == WireCodec.BINARY),
+                                               (WireCodec.BATCH, self.outbound.batch_window > 0)) if enabled]
+        if codecs:
+            message["codecs"] = codecs
+        # Origins of the snapshot are only confirmed by advertisements, ask the neighbor for its stored ones
+        if self.provisional:
+            message["sync"] = True
+        self.monitor.probe_sent(to_jid, message["id"])
         await self.send_message_to(to_jid, json.dumps(message))
 
 
+    def codec_for(self, jid):
+        if self.wire_codec == WireCodec.BINARY and self.peer_codecs.get(jid) == WireCodec.BINARY:
+            return WireCodec.BINARY
+        return WireCodec.JSON
+
+    def batches_to(self, jid):
+        return self.outbound.batch_window > 0 and jid in self.peer_batching
+
+    def encode_for(self, jid, message):
+        return WireCodec.encode(message, self.codec_for(jid))
+
     def get_next_hop(self, destination):
         return self.routing_table.get(destination, (None, None))[0]
 
+    def multipath_hops(self, destination):
+        hops = self.next_hops.get(destination)
+        if hops is None:
+            if not self.neighbor_distances:
+                self.compute_neighbor_distances()
+            hops = self.next_hops[destination] = self.spf.next_hops(destination, self.neighbor_distances)
+        return hops
+
+    def compute_neighbor_distances(self):
+        # One SPF per neighbor, run with the routing table so the first packet after a change does not pay for it
+        start = time.perf_counter()
+        self.neighbor_distances = {neighbor: self.distances_from(neighbor) for neighbor in self.costs}
+        self.metrics.observe("compute_neighbor_distances", time.perf_counter() - start)
+
+    def neighbor_available(self, jid):
+        return jid not in self.down_neighbors and not self.outbound.full(jid)
+
+    def select_next_hop(self, destination, message):
+        """
+        Next hop of a packet: one of the equal-cost hops chosen by a hash of
+        the flow, so a flow keeps its order, or a loop-free alternate when
+        none of them can take it.
+        """
+        if not self.multipath:
+            return self.get_next_hop(destination)
+        equal, alternates = self.multipath_hops(destination)
+        if equal:
+            first = zlib.crc32(f"{message.get('from')}>{destination}".encode()) % len(equal)
+            for hop in equal[first:] + equal[:first]:
+                if self.neighbor_available(hop):
+                    if hop != equal[first]:
+                        self.metrics.count("packets_rerouted", message['type'])
+                    return hop
+        for hop in alternates:
+            if self.neighbor_available(hop):
+                self.metrics.count("packets_rerouted", message['type'])
+                return hop
+        return self.get_next_hop(destination)
+
+    def neighbor_down(self, jid):
+        if jid in self.costs and jid not in self.down_neighbors:
+            self.down_neighbors.add(jid)
+            self.log('IMPORTANT', "Neighbor %s is down, forwarding through alternates", jid)
+
+    def neighbor_up(self, jid):
+        if jid in self.down_neighbors:
+            self.down_neighbors.discard(jid)
+            self.log('IMPORTANT', "Neighbor %s is back", jid)
+
+    def adjacency_down(self, jid):
+        """
+        A neighbor stopped answering: withdraw the link and advertise it right away.
+        """
+        if jid not in self.neighbors:
+            return
+        self.neighbor_down(jid)
+        if jid in self.costs:
+            old_costs = dict(self.costs)
+            del self.costs[jid]
+            self.update_routing_table(self.boundjid.full, old_costs, self.costs)
+            self.advertise_link_state()
+
+    def adjacency_up(self, jid):
+        """
+        A neighbor is reachable again: restore the link and bring its link state database up to date.
+        """
+        if jid not in self.neighbors:
+            return
+        self.neighbor_up(jid)
+        if jid not in self.costs:
+            old_costs = dict(self.costs)
+            self.costs[jid] = self.monitor.state(jid).cost
+            self.update_routing_table(self.boundjid.full, old_costs, self.costs)
+            self.advertise_link_state()
+        self.sync_link_state(jid)
+
+    def sync_link_state(self, jid):
+        # Our own advertisement and every stored one as it was received, the neighbor drops those it already has
+        self.route_message(jid, self.own_link_state())
+        for origin, entry in self.lsdb.entries.items():
+            if entry.sequence is not None:
+                self.route_message(jid, {
+                    "type": "info",
+                    "from": origin,
+                    "to": "all",
+                    "hops": 0,
+                    "headers": [],
+                    "payload": json.dumps(entry.costs),
+                    "id": f"ls_{origin}_{entry.sequence}"
+                })
+
     async def flood_message(self, message, sender):
-        if message['id'] not in self.received_messages:
-            self.received_messages[message['id']] = time.time()
-            self.log('INFO', f"Received flood message: {message.get('id', 'unknown')}")
-
-            if self.boundjid.full not in [header['via'] for header in message['headers']]:
-                message['hops'] += 1
-                message['headers'].append({"via": self.boundjid.full})
-
-                for neighbor in self.neighbors:
-                    if neighbor != sender and neighbor not in [header['via'] for header in message['headers']]:
-                        self.send_message(mto=neighbor, mbody=json.dumps(message), mtype='chat')
-                        self.log('INFO', f"Forwarded flood message to {neighbor}")
-            else:
-                self.log('IMPORTANT', f"Stopping flood: node {self.boundjid.full} already in path")
+        self.forward_flood(message, sender)
+
+    def forward_flood(self, message, sender):
+        start = time.perf_counter()
+        try:
+            self.flood(message, sender)
+        finally:
+            self.metrics.observe("flood_message", time.perf_counter() - start)
+
+    def flood(self, message, sender):
+        # Link state must reach every node whatever its distance, the limit only bounds data floods
+        if self.flood_hop_limit and message['type'] != 'info' and message['hops'] >= self.flood_hop_limit:
+            self.metrics.count("packets_dropped", message['type'])
+            self.log('INFO', "Stopping flood: hop limit reached for %s", message.get('id', 'unknown'))
+            return
+        if self.flood_rpf and not self.is_reverse_path(message, sender):
+            # Not recorded as seen, the copy from the reverse path neighbor is still expected
+            self.metrics.count("packets_dropped", message['type'])
+            self.log('INFO', "Dropped flood message %s from %s: not on reverse path", message.get('id', 'unknown'), sender)
+            return
+        # Retransmissions of a reliable message keep its id but must flood again
+        key = f"{message['id']}#{message['attempt']}" if message.get('attempt') else message['id']
+        if self.received_messages.check_and_add(key):
+            self.metrics.count("packets_duplicate", message['type'])
+            return
+
+        self.log('INFO', "Received flood message: %s", message.get('id', 'unknown'))
+        visited = {header['via'] for header in message['headers']}
+        if self.boundjid.full in visited:
+            self.metrics.count("packets_dropped", message['type'])
+            self.log('IMPORTANT', "Stopping flood: node %s already in path", self.boundjid.full)
+            return
+
+        message['hops'] += 1
+        message['headers'].append({"via": self.boundjid.full})
+        # Serialize once per wire format and reuse the body for every neighbor
+        bodies = {}
+        counter = "packets_sent" if sender == self.boundjid.full else "packets_forwarded"
+        for neighbor in self.flood_targets(message, sender, visited):
+            codec = self.codec_for(neighbor)
+            body = bodies.get(codec)
+            if body is None:
+                body = bodies[codec] = WireCodec.encode(message, codec)
+            self.outbound.put(neighbor, body, 'chat', message['type'], self.batches_to(neighbor))
+            self.metrics.count(counter, message['type'])
+            self.log('INFO', "Forwarded flood message to %s", neighbor)
+
+    def distances_from(self, origin):
+        # Distances from another node, such as the origin of a flood or a neighbor
+        distances = self.remote_distances.get(origin)
+        if distances is None and origin in self.link_state_db:
+            engine = SPFEngine(origin)
+            engine.load(self.link_state_db)
+            distances = self.remote_distances[origin] = engine.distances
+        return distances
+
+    def is_reverse_path(self, message, sender):
+        # Accept a copy only if the sender is on a shortest path from the origin to this node
+        if sender == self.boundjid.full or message['type'] == 'info':
+            return True
+        distances = self.distances_from(message['from'])
+        if not distances or sender not in distances or self.boundjid.full not in distances:
+            return True
+        cost = self.link_state_db.get(sender, {}).get(self.boundjid.full)
+        return cost is not None and distances[sender] + cost == distances[self.boundjid.full]
+
+    def flood_targets(self, message, sender, visited):
+        targets = [neighbor for neighbor in self.neighbors
+                   if neighbor != sender and neighbor not in visited and neighbor not in self.down_neighbors]
+        if not self.flood_rpf or message['type'] == 'info':
+            return targets
+        distances = self.distances_from(message['from'])
+        if not distances or self.boundjid.full not in distances:
+            return targets
+        # Only neighbors that will take this node as their reverse path
+        own_distance = distances[self.boundjid.full]
+        return [neighbor for neighbor in targets
+                if neighbor in self.costs and own_distance + self.costs[neighbor] == distances.get(neighbor)]
 
     async def share_link_state(self):
-        self.sequence_number += 1
-        message = {
+        self.advertise_link_state()
+
+    def own_link_state(self):
+        return {
             "type": "info",
             "from": self.boundjid.full,
             "to": "all",
@@ -144,67 +603,217 @@ class NetworkClient(slixmpp.ClientXMPP):
             "payload": json.dumps(self.costs),
             "id": f"ls_{self.boundjid.full}_{self.sequence_number}"
         }
+
+    def advertise_link_state(self):
+        self.sequence_number += 1
+        message = self.own_link_state()
         for neighbor in self.neighbors:
-            await self.send_message_to(neighbor, message)
+            if neighbor not in self.down_neighbors:
+                self.route_message(neighbor, message)
         self.log('INFO', "Shared link state")
 
+    def purge_aged_link_states(self):
+        for origin in self.lsdb.aged(self.lsa_max_age):
+            old_costs = self.lsdb.purge(origin)
+            self.log('IMPORTANT', "Purged link state of %s, not refreshed for %s seconds", origin, self.lsa_max_age)
+            self.update_routing_table(origin, old_costs, {})
+
     def compute_routing_table(self):
         self.log('INFO', "Computing routing table")
-        self.routing_table = {}
-        pq = [(0, self.boundjid.full)]
-        distances = {self.boundjid.full: 0}
-        previous_nodes = {}
-
-        while pq:
-            current_distance, current_node = heapq.heappop(pq)
-            if current_distance > distances.get(current_node, float('inf')):
-                continue
-            for neighbor, cost in self.link_state_db.get(current_node, {}).items():
-                distance = current_distance + cost
-                if distance < distances.get(neighbor, float('inf')):
-                    distances[neighbor] = distance
-                    heapq.heappush(pq, (distance, neighbor))
-                    previous_nodes[neighbor] = current_node
-
-        for node in distances:
-            if node == self.boundjid.full:
-                continue
-            path = []
-            current = node
-            while current != self.boundjid.full:
-                path.insert(0, current)
-                current = previous_nodes.get(current)
-                if current is None:
-                    break
-            if path:
-                self.routing_table[node] = (path[0], distances[node])
-
-        self.log("INFO", f"Link State Database: {self.link_state_db}")
-        self.log("INFO", f"Computed Routing Table: {self.routing_table}")
+        start = time.perf_counter()
+        self.routing_table = self.spf.load(self.link_state_db)
+        self.metrics.observe("compute_routing_table", time.perf_counter() - start)
+        self.remote_distances = {}
+        self.next_hops = {}
+        self.neighbor_distances = {}
+        if self.multipath:
+            self.compute_neighbor_distances()
+
+        self.log("INFO", "Link State Database: %s", self.link_state_db)
+        self.log("INFO", "Computed Routing Table: %s", self.routing_table)
+
+    def update_routing_table(self, origin, old_costs, new_costs):
+        # The table is recomputed once per hold-down window, forwarding keeps the current one meanwhile
+        self.pending_lsas.setdefault(origin, old_costs)
+        self.spf_scheduler.schedule()
+
+    def run_pending_spf(self):
+        pending, self.pending_lsas = self.pending_lsas, {}
+        self.remote_distances = {}
+        self.next_hops = {}
+        start = time.perf_counter()
+        changes = {}
+        for origin, old_costs in pending.items():
+            changes.update(self.spf.update(origin, old_costs, self.link_state_db.get(origin, {})))
+        self.metrics.observe("compute_routing_table", time.perf_counter() - start)
+
+        for node, route in changes.items():
+            if route is None:
+                self.routing_table.pop(node, None)
+            else:
+                self.routing_table[node] = route
+        self.neighbor_distances = {}
+        if self.multipath:
+            self.compute_neighbor_distances()
+
+        if changes:
+            self.log("INFO", "Routing table changes after updates from %s: %s", list(pending), changes)
+        self.log("INFO", "SPF runs: %s, avoided: %s", self.spf_scheduler.runs, self.spf_scheduler.avoided)
 
     def handle_echo(self, message):
-        if message['to'] == self.boundjid.full:
-            rtt = time.time() - float(message['payload'])
-            self.log('INFO', f"ECHO reply from {message['from']}, RTT: {rtt:.3f} seconds")
+        if message['to'] != self.boundjid.full:
+            self.route_message(message['to'], message)
+        elif message.get('reply'):
+            rtt = self.monitor.reply(message['from'], message.get('id'))
+            if rtt is not None:
+                self.log('INFO', "ECHO reply from %s, RTT: %.3f seconds", message['from'], rtt)
         else:
-            asyncio.create_task(self.send_message_to(message['to'], message))
+            self.log('INFO', "ECHO from %s, one way delay: %.3f seconds", message['from'],
+                     time.time() - float(message['payload']))
+            # Sent straight back with the same id and payload so the prober can time it
+            self.route_message(message['from'], {
+                "type": "echo",
+                "from": self.boundjid.full,
+                "to": message['from'],
+                "hops": 0,
+                "headers": [],
+                "payload": message['payload'],
+                "id": message.get('id'),
+                "reply": True
+            })
+            if message.get('sync') and message['from'] in self.neighbors:
+                self.sync_link_state(message['from'])
+
+    def accept_reliable(self, message):
+        """
+        Acknowledge a reliable message that reached this node.
+        :return: False if it was already delivered, as a retransmission or another flooded copy.
+        """
+        if not message.get('reliable'):
+            return True
+        first = not self.delivered_messages.check_and_add(message['id'])
+        # Each attempt is acknowledged once, a retransmission means the previous ack may be lost
+        if not self.delivered_messages.check_and_add(f"{message['id']}#{message.get('attempt', 1)}"):
+            self.route_message(message['from'], {
+                "type": "ack",
+                "from": self.boundjid.full,
+                "to": message['from'],
+                "hops": 0,
+                "headers": [],
+                "payload": json.dumps({"id": message['id'], "hops": message['hops']}),
+                "id": str(uuid.uuid4())
+            })
+        if not first:
+            self.metrics.count("packets_duplicate", message['type'])
+        return first
+
+    def handle_ack(self, message):
+        try:
+            acked = json.loads(message['payload'])
+            message_id, hops = acked['id'], acked['hops']
+        except (TypeError, ValueError, KeyError):
+            self.metrics.count("packets_dropped", "invalid")
+            return
+        if self.reliable.acknowledge(message['from'], message_id, hops):
+            self.log('INFO', "Delivery of %s to %s acknowledged after %s hops", message_id, message['from'], hops)
+        else:
+            self.metrics.count("packets_duplicate", message['type'])
+
+    async def monitor_neighbors(self):
+        # The same echoes serve as hellos and as RTT probes
+        interval = min(value for value in (self.hello_interval, self.adaptive_costs and self.probe_interval) if value)
+        if self.hello_interval:
+            self.monitor.expect(self.neighbors)
+        while True:
+            await asyncio.sleep(interval)
+            self.monitor.expire()
+            if self.hello_interval:
+                for neighbor in self.monitor.dead():
+                    self.log('IMPORTANT', "Neighbor %s silent for %s seconds", neighbor, self.monitor.dead_interval)
+                    self.adjacency_down(neighbor)
+            if self.adaptive_costs:
+                # Links that are down keep their new cost for when they come back
+                changes = {neighbor: cost for neighbor, cost in self.monitor.changed_costs().items()
+                           if neighbor not in self.down_neighbors}
+                if changes:
+                    await self.apply_costs(changes)
+            for neighbor in self.neighbors:
+                await self.send_echo(neighbor)
+
+    async def apply_costs(self, changes):
+        """
+        Install measured link costs and advertise them right away.
+        :param changes: Dictionary neighbor -> new cost.
+        """
+        old_costs = dict(self.costs)
+        self.costs.update(changes)
+        self.log('IMPORTANT', "Link costs changed: %s", changes)
+        self.update_routing_table(self.boundjid.full, old_costs, self.costs)
+        await self.share_link_state()
 
     def schedule_periodic_tasks(self):
         asyncio.create_task(self.periodic_share_link_state())
 
     async def periodic_share_link_state(self):
         while True:
-            await asyncio.sleep(30)  # Share link state every 30 seconds
+            await asyncio.sleep(self.lsa_refresh_interval)
             if self.mode == "lsr":
+                if self.lsa_max_age:
+                    self.purge_aged_link_states()
                 await self.share_link_state()
 
-    async def connect_and_process(self):
-        self.log('INFO', f"Important: Connecting to {self.boundjid.host}...")
-        self.connect((self.boundjid.host, 7070), disable_starttls=True)
-
+    def load_snapshot(self):
+        """
+        Take the link state database saved by a previous run as provisional state and compute routes from it,
+        fresh advertisements replace it as they arrive.
+        """
         try:
-            self.log('INFO', "Important: Connection successful")
-            await self.process(forever=False)
-        except Exception as e:
-            pass
-            # self.log('ERROR', f"An error occurred: {str(e)}")
+            snapshot = LinkStateSnapshot.load(self.snapshot_file)
+        except LinkStateSnapshot.SnapshotError as e:
+            self.log('WARNING', "Ignoring snapshot %s: %s", self.snapshot_file, e)
+            return
+        if snapshot is None:
+            return
+
+        # Never reuse a sequence number the network may still hold
+        self.sequence_number = max(self.sequence_number, snapshot.sequence)
+        for origin, (sequence, received_at, costs) in snapshot.entries.items():
+            if origin != self.boundjid.full:
+                self.lsdb.install(origin, sequence, costs, received_at)
+                self.provisional.add(origin)
+        # Own costs may differ from the saved run, a full SPF is the only tree that is sure to be shortest
+        self.compute_routing_table()
+        self.log('IMPORTANT', "Loaded %s link states and %s routes from %s", len(self.provisional),
+                 len(self.routing_table), self.snapshot_file)
+
+    def snapshot_state(self):
+        entries = {origin: (entry.sequence, entry.received_at, entry.costs)
+                   for origin, entry in self.lsdb.entries.items()}
+        return self.sequence_number, entries
+
+    def save_snapshot(self):
+        return LinkStateSnapshot.write(self.snapshot_file, *self.snapshot_state())
+
+    async def expire_provisional(self):
+        await asyncio.sleep(self.provisional_ttl)
+        # Origins nobody advertised since the restart left the network while the node was down
+        for origin in sorted(self.provisional):
+            self.log('IMPORTANT', "Purged link state of %s, not advertised again within %s seconds", origin,
+                     self.provisional_ttl)
+            self.update_routing_table(origin, self.lsdb.purge(origin), {})
+        self.provisional.clear()
+
+    async def periodic_snapshot(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            # The copy is taken on the loop, encoding and disk I/O happen off it
+            await loop.run_in_executor(None, LinkStateSnapshot.write, self.snapshot_file, *self.snapshot_state())
+
+    async def connect_and_process(self):
+        if self.log_file:
+            self.event_log.start_writer(self.log_file)
+        if self.snapshot_file:
+            asyncio.create_task(self.periodic_snapshot())
+        await self.start_metrics()
+        await self.packet_transport.run()
@@ -3,24 +3,39 @@ import asyncio
 import sys
 import json
 import time
+import random
 import logging
 
 # Import NetworkClient class from NetworkClient.py
-from NetworkClient import NetworkClient as Client
+from NetworkClient import NetworkClient as Client, options_from_config
+from Transport import LoopbackNetwork
+from Workload import Workload, load_spec
 
 
 class NetworkManager:
     """
     Class in charge of managing multiple clients and simulating a network.
     """
-    def __init__(self, clients_params):
+    def __init__(self, clients_params, network=None, max_connecting=None, stagger=None, ready_timeout=30.0):
         """
         Constructor for NetworkManager class.
         :param clients_params: List of users, passwords, neighbors and costs.
+        :param network: LoopbackNetwork to run every client in process, None to use the XMPP server.
+        :param max_connecting: Clients connecting and discovering their neighbors at the same time, by default 32 with the XMPP server and all of them in process.
+        :param stagger: Seconds over which client launches are randomly spread, by default 1 with the XMPP server and 0 in process.
+        :param ready_timeout: Seconds to wait for a client to be ready before launching the next one anyway.
         """
         self.clients_params = clients_params
+        # In process network, if any
+        self.network = network
         # List of clients
         self.clients = []
+        # Launcher settings, an in process network has no server to protect from a burst of logins
+        self.max_connecting = (len(clients_params) or 1 if network else 32) if max_connecting is None else max_connecting
+        self.stagger = (0.0 if network else 1.0) if stagger is None else stagger
+        self.ready_timeout = ready_timeout
+        # Connection tasks, they keep processing the XMPP streams after the clients are ready
+        self.connections = []
         # Initialize login basic configuration
         logging.basicConfig(level=logging.INFO)
         # Create logger
@@ -37,23 +52,59 @@ class NetworkManager:
                 password=params["password"],
                 neighbors=params["neighbors"],
                 costs=params.get("costs", {}),
-                mode=params.get("mode", "lsr")
+                mode=params.get("mode", "lsr"),
+                transport=self.network.transport() if self.network else None,
+                **options_from_config(params)
             )
             self.clients.append(client)
 
     async def connect_clients(self):
         """
-        Connect all clients and start processing messages.
+        Connect all clients and start processing messages. At most max_connecting
+        clients are between launch and readiness at a time.
+        :return: Seconds until every client was ready, None if some never were.
         """
-        connect_tasks = []
+        start = time.perf_counter()
+        slots = asyncio.Semaphore(self.max_connecting)
+        rng = random.Random(0)
         # Connect all clients
-        for client in self.clients:
-            # Create a task for each client
-            connect_tasks.append(asyncio.create_task(client.connect_and_process()))
-        # Wait for all clients to connect
-        await asyncio.gather(*connect_tasks)
+        ready = await asyncio.gather(*(self.launch(client, slots, rng.uniform(0, self.stagger))
+                                       for client in self.clients))
+        elapsed = time.perf_counter() - start
+        if all(ready):
+            self.logger.info("%s clients ready in %.2f seconds", len(self.clients), elapsed)
+            return elapsed
+        self.logger.warning("%s of %s clients not ready after %.2f seconds", ready.count(False), len(self.clients),
+                            elapsed)
+        return None
 
-    def send_message(self, from_client, to_client_jid, message_type="message", payload="Hello"):
+    async def launch(self, client, slots, delay):
+        """
+        Start one client and wait until it is ready, or its connection ends, or ready_timeout passes.
+        :return: Whether the client is ready.
+        """
+        await asyncio.sleep(delay)
+        async with slots:
+            connection = asyncio.create_task(client.connect_and_process())
+            self.connections.append(connection)
+            ready = asyncio.create_task(client.ready.wait())
+            await asyncio.wait((connection, ready), timeout=self.ready_timeout, return_when=asyncio.FIRST_COMPLETED)
+            ready.cancel()
+        return client.ready.is_set()
+
+    async def wait_routes(self, timeout=20.0):
+        """
+        Wait until every client has a route to every other client.
+        :return: Whether that happened within the timeout.
+        """
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(len(client.routing_table) >= len(self.clients) - 1 for client in self.clients):
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def send_message(self, from_client, to_client_jid, message_type="message", payload="Hello"):
         """
         Method use to send a message from one client to another.
         :param from_client: Client sending the message.
@@ -71,7 +122,7 @@ class NetworkManager:
             "payload": payload
         }
         # Send message
-        from_client.send_message_to(to_client_jid, json.dumps(message))
+        await from_client.send_message_to(to_client_jid, json.dumps(message))
 
     async def simulate_network(self):
         """
@@ -79,26 +130,47 @@ class NetworkManager:
         """
         # Announce start of simulation
         self.logger.info("Starting network simulation...")
-        # Wait for clients to stabilize
-        await asyncio.sleep(20)  # Increased delay to allow more time for LSR to stabilize
+        # Wait for clients to stabilize, flooding nodes have no routing table to wait for
+        if all(client.mode == "lsr" for client in self.clients) and not await self.wait_routes(20):
+            self.logger.warning("Routing tables still incomplete, sending anyway")
 
         # Test LSR mode
         self.logger.info("Testing LSR mode...")
         # Send message from A to D
         self.logger.info("Sending message from A to D (should go through I)")
         # Send message from A to D
-        self.send_message(self.clients[0], "dj4tcha21881@alumchat.lol/algorithms", "message", "Test message from A to D")
+        await self.send_message(self.clients[0], "dj4tcha21881@alumchat.lol/algorithms", "message", "Test message from A to D")
         # Wait for message to be delivered
         self.logger.info("Network simulation completed.")
 
-    async def run_async(self):
+    async def run_workload(self, spec):
+        """
+        Inject the traffic described by a workload spec from the connected clients.
+        :param spec: Workload dictionary, or the path of a YAML or JSON file with one.
+        :return: Delivery ratio, latency and hops of each phase and of the whole run.
+        """
+        if isinstance(spec, str):
+            spec = load_spec(spec)
+        workload = Workload(self.clients, spec)
+        self.logger.info("Running workload with %s phases...", len(workload.phases))
+        summary = await workload.run()
+        for name, stats in summary.items():
+            self.logger.info("Workload %s: %s/%s delivered, latency p95 %s s, %s hops on average", name,
+                             stats["delivered"], stats["sent"], stats["latency_p95"], stats["hops_mean"])
+        return summary
+
+    async def run_async(self, workload=None):
         """
         Run the simulation asynchronously.
+        :param workload: Workload spec to run instead of the sample message, see run_workload.
         """
         # Initialize clients
         self.initialize_clients()
         # Connect clients to server
         await self.connect_clients()
+        if workload:
+            print(json.dumps(await self.run_workload(workload), indent=2))
+            return
         # Simulate network in server
         await self.simulate_network()
         # Keep running while waiting for messages
@@ -106,9 +178,10 @@ class NetworkManager:
             # Wait for 1 second
             await asyncio.sleep(1)
 
-    def run(self):
+    def run(self, workload=None):
         """
         Start simulation.
+        :param workload: Workload spec to run instead of the sample message, see run_workload.
         """
         # Add condition to run on Windows
         if sys.platform == 'win32':
@@ -116,7 +189,7 @@ class NetworkManager:
 
         try:
             # Run the simulation
-            asyncio.run(self.run_async())
+            asyncio.run(self.run_async(workload))
         except KeyboardInterrupt:
             self.logger.info("Simulation terminated manually.")
 
@@ -136,7 +209,9 @@ if __name__ == "__main__":
         {"jid": "ij4tcha21881@alumchat.lol/algorithms", "password": "password", "neighbors": ["aj4tcha21881@alumchat.lol/algorithms", "dj4tcha21881@alumchat.lol/algorithms"], "costs": {"aj4tcha21881@alumchat.lol/algorithms": 1, "dj4tcha21881@alumchat.lol/algorithms": 6}, "mode": mode},
     ]
 
+    # Run in process instead of through the XMPP server when asked to
+    network = LoopbackNetwork(latency=0.01) if "--loopback" in sys.argv else None
     # Create NetworkManager object
-    manager = NetworkManager(clients_params)
-    # Run simulation
-    manager.run()
+    manager = NetworkManager(clients_params, network)
+    # Run simulation, or the workload spec given after --workload
+    manager.run(sys.argv[sys.argv.index("--workload") + 1] if "--workload" in sys.argv else None)
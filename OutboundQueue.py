@@ -0,0 +1,222 @@
+import time
+import asyncio
+from collections import deque, defaultdict
+
+from Metrics import Histogram
+
+TAIL = "tail"
+OLDEST = "oldest"
+PRIORITY = "priority"
+POLICIES = (TAIL, OLDEST, PRIORITY)
+
+
+class OutboundPacket:
+    """
+    Body waiting in a neighbor queue.
+    """
+    __slots__ = ("body", "msg_type", "packet_type", "queued_at", "batchable")
+
+    def __init__(self, body, msg_type, packet_type, queued_at, batchable=False):
+        self.body = body
+        self.msg_type = msg_type
+        self.packet_type = packet_type
+        self.queued_at = queued_at
+        self.batchable = batchable
+
+
+class OutboundQueues:
+    """
+    One bounded queue per neighbor, drained by a fixed pool of sender
+    workers. A neighbor is served by at most one worker at a time, so its
+    packets leave in order, and a worker waits for the transport to drain
+    before each send, so a slow link fills its own queue instead of memory.
+    Batchable packets may wait for a short window so the ones queued for the
+    same neighbor leave together in one body.
+    """
+    def __init__(self, send, capacity=256, workers=4, policy=PRIORITY, drain=None, batch_window=0.0,
+                 batch_bytes=16384, combine=None):
+        """
+        Constructor for OutboundQueues class.
+        :param send: Callable (to_jid, body, msg_type) handing a body to the transport.
+        :param capacity: Maximum number of packets queued per neighbor.
+        :param workers: Number of sender workers.
+        :param policy: What to drop when a queue is full: TAIL drops the new packet, OLDEST the oldest queued one,
+            PRIORITY never drops "info" packets, data makes room for them.
+        :param drain: Optional coroutine function (to_jid) returning once the transport can take more for to_jid.
+        :param batch_window: Seconds a batchable packet waits for others to the same neighbor, 0 disables batching.
+        :param batch_bytes: Size of the queued batchable bodies that sends them without waiting for the window.
+        :param combine: Callable packing a list of bodies into one.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.send = send
+        self.capacity = capacity
+        self.workers = workers
+        self.policy = policy
+        self.drain = drain
+        self.batch_window = batch_window
+        self.batch_bytes = batch_bytes
+        self.combine = combine
+        self.queues = defaultdict(deque)
+        # Neighbor -> bytes of the bodies in its queue
+        self.queued_bytes = defaultdict(int)
+        # Neighbor -> timer ending its batch window
+        self.windows = {}
+        # Neighbors with packets and no worker on them, each at most once
+        self.ready = None
+        self.scheduled = set()
+        self.tasks = []
+        # Metrics
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = defaultdict(int)
+        self.max_depth = 0
+        self.batches = 0
+        self.batched = 0
+        self.wait_time = Histogram()
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def depths(self):
+        return {neighbor: len(queue) for neighbor, queue in self.queues.items() if queue}
+
+    def full(self, to_jid):
+        queue = self.queues.get(to_jid)
+        return queue is not None and len(queue) >= self.capacity
+
+    def put(self, to_jid, body, msg_type='chat', packet_type=None, batchable=False):
+        """
+        Queue a body for a neighbor.
+        :param batchable: Whether the neighbor accepts this body packed with others.
+        :return: False if the body was dropped right away.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside of an event loop there are no workers, send right away
+            self.send(to_jid, body, msg_type)
+            self.sent += 1
+            return True
+
+        queue = self.queues[to_jid]
+        packet = OutboundPacket(body, msg_type, packet_type, time.monotonic(), batchable and self.batch_window > 0)
+        if len(queue) >= self.capacity and not self._make_room(to_jid, queue, packet):
+            self.dropped[packet_type] += 1
+            return False
+
+        queue.append(packet)
+        self.queued_bytes[to_jid] += len(body)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(queue))
+        if self.ready is None:
+            self.start()
+        if to_jid in self.scheduled:
+            return True
+        if packet.batchable and self.queued_bytes[to_jid] < self.batch_bytes:
+            if to_jid not in self.windows:
+                self.windows[to_jid] = asyncio.get_running_loop().call_later(self.batch_window, self._schedule, to_jid)
+            return True
+        self._schedule(to_jid)
+        return True
+
+    def _schedule(self, to_jid):
+        window = self.windows.pop(to_jid, None)
+        if window is not None:
+            window.cancel()
+        if to_jid not in self.scheduled and self.queues.get(to_jid):
+            self.scheduled.add(to_jid)
+            self.ready.put_nowait(to_jid)
+
+    def _make_room(self, to_jid, queue, packet):
+        if self.policy == OLDEST:
+            self._drop(to_jid, queue.popleft())
+            return True
+        if self.policy == PRIORITY and packet.packet_type == "info":
+            # Oldest data packet first. Nothing repairs a lost advertisement, a queue holding only info packets goes
+            # past its capacity, bounded by the size of the network
+            for index, queued in enumerate(queue):
+                if queued.packet_type != "info":
+                    self._drop(to_jid, queued)
+                    del queue[index]
+                    break
+            return True
+        return False
+
+    def _drop(self, to_jid, packet):
+        self.dropped[packet.packet_type] += 1
+        self.queued_bytes[to_jid] -= len(packet.body)
+
+    def start(self):
+        self.ready = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        # Packets left over from before a stop
+        for to_jid in list(self.queues):
+            self._schedule(to_jid)
+
+    def stop(self):
+        for window in self.windows.values():
+            window.cancel()
+        self.windows = {}
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        # Queued packets stay, the next put starts the workers again
+        self.ready = None
+        self.scheduled = set()
+
+    async def _work(self):
+        while True:
+            to_jid = await self.ready.get()
+            queue = self.queues[to_jid]
+            if self.drain is not None:
+                await self.drain(to_jid)
+            if queue:
+                packets = self._take(queue)
+                self.queued_bytes[to_jid] -= sum(len(packet.body) for packet in packets)
+                now = time.monotonic()
+                for packet in packets:
+                    self.wait_time.observe(now - packet.queued_at)
+                body = packets[0].body if len(packets) == 1 else self.combine([packet.body for packet in packets])
+                try:
+                    self.send(to_jid, body, packets[0].msg_type)
+                    self.sent += len(packets)
+                    if len(packets) > 1:
+                        self.batches += 1
+                        self.batched += len(packets)
+                except Exception:
+                    for packet in packets:
+                        self.dropped[packet.packet_type] += 1
+            if queue:
+                # Back of the line, other neighbors get a turn
+                self.ready.put_nowait(to_jid)
+            else:
+                self.scheduled.discard(to_jid)
+                del self.queues[to_jid]
+                self.queued_bytes.pop(to_jid, None)
+
+    def _take(self, queue):
+        # The next packet, with the batchable ones right behind it if it is batchable too
+        packets = [queue.popleft()]
+        if not packets[0].batchable:
+            return packets
+        size = len(packets[0].body)
+        while queue and queue[0].batchable and size + len(queue[0].body) <= self.batch_bytes:
+            size += len(queue[0].body)
+            packets.append(queue.popleft())
+        return packets
+
+    def metrics(self):
+        """
+        Snapshot of the queue counters.
+        """
+        return {
+            "depth": len(self),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": dict(self.dropped),
+            "batches": self.batches,
+            "batched": self.batched,
+            "wait_p95": self.wait_time.quantile(0.95),
+        }
@@ -0,0 +1,197 @@
+import time
+import asyncio
+from collections import defaultdict, deque
+
+
+class DeliveryError(Exception):
+    """
+    Raised through the future of a message that was never acknowledged.
+    """
+
+
+class DeliveryReport:
+    """
+    Outcome of an acknowledged message.
+    """
+    __slots__ = ("message_id", "destination", "latency", "hops", "attempts")
+
+    def __init__(self, message_id, destination, latency, hops, attempts):
+        self.message_id = message_id
+        self.destination = destination
+        # Seconds from the first transmission to the acknowledgement
+        self.latency = latency
+        self.hops = hops
+        self.attempts = attempts
+
+    def __repr__(self):
+        return (f"DeliveryReport({self.message_id!r}, {self.destination!r}, latency={self.latency:.4f}, "
+                f"hops={self.hops}, attempts={self.attempts})")
+
+
+class RetransmissionTimer:
+    """
+    Retransmission timeout of one destination, computed from the smoothed
+    round trip time and its variation like TCP (RFC 6298).
+    """
+    def __init__(self, initial=1.0, min_rto=0.2, max_rto=60.0):
+        """
+        Constructor for RetransmissionTimer class.
+        :param initial: Timeout in seconds before the first sample.
+        :param min_rto: Lower bound of the timeout.
+        :param max_rto: Upper bound of the timeout, backoff included.
+        """
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(max(self.srtt + 4 * self.rttvar, self.min_rto), self.max_rto)
+
+    def timeout(self, attempt):
+        # Exponential backoff per message, so one lossy burst does not slow down the whole window
+        return min(self.rto * 2 ** (attempt - 1), self.max_rto)
+
+
+class PendingMessage:
+    """
+    Message sent and not acknowledged yet.
+    """
+    __slots__ = ("message", "future", "first_sent", "sent_at", "attempts", "handle")
+
+    def __init__(self, message, future):
+        self.message = message
+        self.future = future
+        self.first_sent = None
+        self.sent_at = None
+        self.attempts = 0
+        self.handle = None
+
+
+class ReliableSender:
+    """
+    End to end acknowledgements for data messages. Up to a window of
+    messages per destination are in flight at once, the rest wait their
+    turn, and every one is retransmitted until acknowledged or out of
+    attempts.
+    """
+    def __init__(self, send, window=32, max_attempts=5, min_rto=0.2, initial_rto=1.0, clock=time.monotonic):
+        """
+        Constructor for ReliableSender class.
+        :param send: Callable (destination, message) routing a copy of a message.
+        :param window: Messages in flight per destination.
+        :param max_attempts: Transmissions of a message before its future fails.
+        :param min_rto: Lower bound of the retransmission timeout in seconds.
+        :param initial_rto: Retransmission timeout before the first round trip is measured.
+        :param clock: Callable returning the current time in seconds, for round trips and latencies.
+        """
+        self.send = send
+        self.window = window
+        self.max_attempts = max_attempts
+        self.min_rto = min_rto
+        self.initial_rto = initial_rto
+        self.clock = clock
+        self.timers = {}
+        # Destination -> {message id: PendingMessage}, in transmission order
+        self.in_flight = defaultdict(dict)
+        self.waiting = defaultdict(deque)
+        # Metrics
+        self.sent = 0
+        self.retransmitted = 0
+        self.acknowledged = 0
+        self.failed = 0
+
+    def timer(self, destination):
+        timer = self.timers.get(destination)
+        if timer is None:
+            timer = self.timers[destination] = RetransmissionTimer(self.initial_rto, self.min_rto)
+        return timer
+
+    def submit(self, destination, message):
+        """
+        Send a message reliably.
+        :param destination: JID of the destination.
+        :param message: Packet with a unique id.
+        :return: Future resolved with a DeliveryReport, or failed with DeliveryError.
+        """
+        pending = PendingMessage(message, asyncio.get_running_loop().create_future())
+        if len(self.in_flight[destination]) < self.window:
+            self._transmit(destination, pending)
+        else:
+            self.waiting[destination].append(pending)
+        return pending.future
+
+    def _transmit(self, destination, pending):
+        loop = asyncio.get_running_loop()
+        now = self.clock()
+        if pending.first_sent is None:
+            pending.first_sent = now
+            self.sent += 1
+        pending.sent_at = now
+        pending.attempts += 1
+        message_id = pending.message["id"]
+        self.in_flight[destination][message_id] = pending
+        # Forwarding fills in hops and headers, every attempt starts from a clean copy
+        self.send(destination, dict(pending.message, hops=0, headers=[], attempt=pending.attempts))
+        pending.handle = loop.call_later(self.timer(destination).timeout(pending.attempts), self._expire, destination,
+                                         message_id)
+
+    def _expire(self, destination, message_id):
+        pending = self.in_flight[destination].get(message_id)
+        if pending is None:
+            return
+        if pending.attempts >= self.max_attempts:
+            del self.in_flight[destination][message_id]
+            self.failed += 1
+            if not pending.future.done():
+                pending.future.set_exception(DeliveryError(
+                    f"No acknowledgement from {destination} for {message_id} after {pending.attempts} attempts"))
+            self._fill(destination)
+            return
+        self.retransmitted += 1
+        self._transmit(destination, pending)
+
+    def acknowledge(self, destination, message_id, hops):
+        """
+        Handle the acknowledgement of a message.
+        :return: False if the message was not waiting for one, such as a duplicate acknowledgement.
+        """
+        pending = self.in_flight[destination].pop(message_id, None)
+        if pending is None:
+            return False
+        pending.handle.cancel()
+        now = self.clock()
+        # Karn's rule: a retransmitted message gives no usable round trip sample
+        if pending.attempts == 1:
+            self.timer(destination).sample(now - pending.sent_at)
+        self.acknowledged += 1
+        if not pending.future.done():
+            pending.future.set_result(DeliveryReport(message_id, destination, now - pending.first_sent, hops,
+                                                     pending.attempts))
+        self._fill(destination)
+        return True
+
+    def _fill(self, destination):
+        waiting = self.waiting[destination]
+        while waiting and len(self.in_flight[destination]) < self.window:
+            self._transmit(destination, waiting.popleft())
+
+    def metrics(self):
+        """
+        Snapshot of the delivery counters.
+        """
+        return {
+            "in_flight": sum(len(messages) for messages in self.in_flight.values()),
+            "waiting": sum(len(messages) for messages in self.waiting.values()),
+            "sent": self.sent,
+            "retransmitted": self.retransmitted,
+            "acknowledged": self.acknowledged,
+            "failed": self.failed,
+        }
@@ -0,0 +1,267 @@
+import heapq
+
+INFINITY = float('inf')
+
+# NumPy is only imported by the first network large enough to use it, most nodes never pay for it
+_compiled_topology = []
+
+
+def compiled_topology():
+    """
+    The CompiledTopology class, or None if NumPy is not installed.
+    """
+    if not _compiled_topology:
+        try:
+            from CompiledTopology import CompiledTopology
+        except ImportError:
+            CompiledTopology = None
+        _compiled_topology.append(CompiledTopology)
+    return _compiled_topology[0]
+
+
+class SPFEngine:
+    """
+    Shortest path first engine that keeps the shortest-path tree of a node
+    and repairs only the affected part of it when a link state changes.
+    """
+    def __init__(self, root, full_threshold=0.25, compiled_threshold=1000):
+        """
+        Constructor for SPFEngine class.
+        :param root: JID of the node computing the routes.
+        :param full_threshold: Fraction of known nodes that, once affected by a change, triggers a full run instead.
+        :param compiled_threshold: Number of origins from which full runs use the compiled array topology, if NumPy is installed.
+        """
+        self.root = root
+        self.full_threshold = full_threshold
+        self.compiled_threshold = compiled_threshold
+        # Forward and reverse adjacency, origin -> {neighbor: cost}
+        self.out_edges = {}
+        self.in_edges = {}
+        # Shortest-path tree
+        self.distances = {root: 0}
+        self.parents = {}
+        # Parent -> children in the tree, leaves have no entry
+        self.children = {}
+        self.first_hops = {}
+        # Counters
+        self.full_runs = 0
+        self.incremental_runs = 0
+        self._before = {}
+
+    @property
+    def routing_table(self):
+        """
+        Routing table in the format used by NetworkClient, destination -> (next hop, cost).
+        """
+        return {node: (self.first_hops[node], self.distances[node]) for node in self.first_hops}
+
+    def load(self, link_state_db):
+        """
+        Replace the whole topology and run a full SPF.
+        :param link_state_db: Dictionary origin -> {neighbor: cost}.
+        """
+        self.out_edges = {}
+        self.in_edges = {}
+        for origin, costs in link_state_db.items():
+            self._set_edges(origin, costs)
+        return self.full()
+
+    def full(self):
+        """
+        Run Dijkstra from scratch over the current topology and return the routing table.
+        """
+        self.full_runs += 1
+        if len(self.out_edges) >= self.compiled_threshold and compiled_topology() is not None:
+            return self._full_compiled()
+
+        self.distances = {self.root: 0}
+        self.parents = {}
+        self.first_hops = {}
+        pq = [(0, self.root)]
+        visited = set()
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_node in visited:
+                continue
+            visited.add(current_node)
+            current_hop = self.first_hops.get(current_node)
+            for neighbor, cost in self.out_edges.get(current_node, {}).items():
+                distance = current_distance + cost
+                if distance < self.distances.get(neighbor, INFINITY):
+                    self.distances[neighbor] = distance
+                    self.parents[neighbor] = current_node
+                    self.first_hops[neighbor] = neighbor if current_node == self.root else current_hop
+                    heapq.heappush(pq, (distance, neighbor))
+
+        self._build_children()
+        return self.routing_table
+
+    def _full_compiled(self):
+        topology = compiled_topology()(self.out_edges)
+        distances, predecessors, first_hops = topology.shortest_paths(self.root)
+        names = topology.names
+        reachable = (first_hops >= 0).nonzero()[0].tolist()
+        distances = distances.tolist()
+        # Same cost type as the dictionary SPF, whatever the size of the network
+        cast = int if topology.integral else float
+        predecessors = predecessors.tolist()
+        first_hops = first_hops.tolist()
+
+        self.distances = {self.root: 0}
+        self.distances.update((names[node], cast(distances[node])) for node in reachable)
+        self.parents = {names[node]: names[predecessors[node]] for node in reachable}
+        self.first_hops = {names[node]: names[first_hops[node]] for node in reachable}
+        self._build_children()
+        return self.routing_table
+
+    def _build_children(self):
+        self.children = {}
+        for node, parent in self.parents.items():
+            self.children.setdefault(parent, []).append(node)
+
+    def next_hops(self, destination, neighbor_distances):
+        """
+        Equal-cost first hops and loop-free alternates (RFC 5286) towards a destination.
+        :param destination: JID of the destination.
+        :param neighbor_distances: Dictionary neighbor -> distances computed by an SPF rooted at that neighbor.
+        :return: Tuple (equal-cost hops, alternates), alternates ordered by the cost through them.
+        """
+        total = self.distances.get(destination)
+        if total is None or destination == self.root:
+            return [], []
+        equal = []
+        alternates = []
+        for neighbor, cost in self.out_edges.get(self.root, {}).items():
+            distances = neighbor_distances.get(neighbor)
+            if not distances or destination not in distances:
+                continue
+            through = cost + distances[destination]
+            if through == total:
+                equal.append(neighbor)
+            # The neighbor's own shortest path to the destination does not come back through the root
+            elif distances[destination] < distances.get(self.root, INFINITY) + total:
+                alternates.append((through, neighbor))
+        return sorted(equal), [neighbor for _, neighbor in sorted(alternates)]
+
+    def update(self, origin, old_costs, new_costs):
+        """
+        Apply a changed link state advertisement and repair the shortest-path tree.
+        :param origin: JID of the node that originated the advertisement.
+        :param old_costs: Previous cost map of the origin.
+        :param new_costs: New cost map of the origin.
+        :return: Dictionary destination -> (next hop, cost), or None when the destination became unreachable.
+        """
+        old_costs = old_costs or {}
+        new_costs = new_costs or {}
+        increased = []
+        decreased = []
+        for neighbor in set(old_costs) | set(new_costs):
+            old_cost = old_costs.get(neighbor, INFINITY)
+            new_cost = new_costs.get(neighbor, INFINITY)
+            if new_cost > old_cost:
+                increased.append(neighbor)
+            elif new_cost < old_cost:
+                decreased.append(neighbor)
+
+        self._set_edges(origin, new_costs)
+        if not increased and not decreased:
+            return {}
+
+        # Nodes whose tree path used an edge that got worse lose their distance
+        affected = set()
+        for neighbor in increased:
+            if self.parents.get(neighbor) == origin and neighbor not in affected:
+                affected.update(self._subtree(neighbor))
+
+        if len(affected) > self.full_threshold * max(len(self.distances), 1):
+            before = self.routing_table
+            self.full()
+            return self._diff(before)
+
+        self.incremental_runs += 1
+        # Previous route of every node touched by the repair
+        self._before = {}
+        for node in affected:
+            self._touch(node)
+            self._detach(node)
+            self.children.pop(node, None)
+            del self.distances[node]
+            self.first_hops.pop(node, None)
+
+        pq = []
+        # Re-attach every affected node to the best unaffected predecessor
+        for node in affected:
+            for predecessor, cost in self.in_edges.get(node, {}).items():
+                if predecessor in affected or predecessor not in self.distances:
+                    continue
+                self._relax(predecessor, node, cost, pq)
+        # Edges that got cheaper may improve any node
+        if origin in self.distances:
+            for neighbor in decreased:
+                self._relax(origin, neighbor, new_costs[neighbor], pq)
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_distance > self.distances.get(current_node, INFINITY):
+                continue
+            for neighbor, cost in self.out_edges.get(current_node, {}).items():
+                self._relax(current_node, neighbor, cost, pq)
+
+        changes = {}
+        for node, route in self._before.items():
+            if node not in self.distances:
+                if route is not None:
+                    changes[node] = None
+            elif route != (self.first_hops[node], self.distances[node]):
+                changes[node] = (self.first_hops[node], self.distances[node])
+        self._before = {}
+        return changes
+
+    def _set_edges(self, origin, costs):
+        for neighbor in self.out_edges.get(origin, {}):
+            self.in_edges.get(neighbor, {}).pop(origin, None)
+        # Received cost maps are replaced, never changed in place, only the own one needs a copy
+        self.out_edges[origin] = dict(costs) if origin == self.root else costs
+        for neighbor, cost in costs.items():
+            self.in_edges.setdefault(neighbor, {})[origin] = cost
+
+    def _relax(self, node, neighbor, cost, pq):
+        distance = self.distances[node] + cost
+        if distance < self.distances.get(neighbor, INFINITY):
+            self._touch(neighbor)
+            self._detach(neighbor)
+            self.distances[neighbor] = distance
+            self.parents[neighbor] = node
+            self.children.setdefault(node, []).append(neighbor)
+            self.first_hops[neighbor] = neighbor if node == self.root else self.first_hops[node]
+            heapq.heappush(pq, (distance, neighbor))
+
+    def _touch(self, node):
+        if node not in self._before:
+            self._before[node] = (self.first_hops[node], self.distances[node]) if node in self.first_hops else None
+
+    def _detach(self, node):
+        parent = self.parents.pop(node, None)
+        # The parent may be an affected node whose children were already dropped
+        siblings = self.children.get(parent)
+        if siblings is not None:
+            siblings.remove(node)
+            if not siblings:
+                del self.children[parent]
+
+    def _subtree(self, node):
+        nodes = [node]
+        index = 0
+        while index < len(nodes):
+            nodes.extend(self.children.get(nodes[index], ()))
+            index += 1
+        return nodes
+
+    def _diff(self, before):
+        after = self.routing_table
+        changes = {node: route for node, route in after.items() if before.get(node) != route}
+        for node in before:
+            if node not in after:
+                changes[node] = None
+        return changes
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+
+class SPFScheduler:
+    """
+    Coalesce routing recomputations: a request marks the table dirty and a
+    single run happens once the hold-down window expires. The window backs
+    off exponentially while requests keep arriving, like SPF throttling in
+    routers, and goes back to the initial delay after a quiet period.
+    """
+    def __init__(self, run, initial_delay=0.05, hold_time=0.2, max_delay=5.0, clock=time.monotonic):
+        """
+        Constructor for SPFScheduler class.
+        :param run: Callable doing the recomputation.
+        :param initial_delay: Seconds to wait after the first request following a quiet period.
+        :param hold_time: Seconds to wait between consecutive runs, doubled after each one.
+        :param max_delay: Upper bound of the hold time, also the quiet period that resets it.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.run = run
+        self.initial_delay = initial_delay
+        self.hold_time = hold_time
+        self.max_delay = max_delay
+        self.clock = clock
+        self.current_hold = hold_time
+        self.last_run = None
+        self.handle = None
+        # Metrics
+        self.requests = 0
+        self.runs = 0
+        self.avoided = 0
+        self.run_time = 0.0
+
+    @property
+    def dirty(self):
+        return self.handle is not None
+
+    def schedule(self):
+        """
+        Request a recomputation, coalesced with any already pending one.
+        """
+        self.requests += 1
+        if self.handle is not None:
+            self.avoided += 1
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside of an event loop there is nothing to coalesce with
+            self._fire()
+            return
+
+        now = self.clock()
+        if self.last_run is None or now - self.last_run > self.max_delay:
+            self.current_hold = self.hold_time
+            delay = self.initial_delay
+        else:
+            # Wait out the rest of the hold time since the previous run
+            delay = max(self.initial_delay, self.last_run + self.current_hold - now)
+            self.current_hold = min(self.current_hold * 2, self.max_delay)
+        self.handle = loop.call_later(delay, self._fire)
+
+    def flush(self):
+        """
+        Run a pending recomputation right away.
+        """
+        if self.handle is not None:
+            self.handle.cancel()
+            self._fire()
+
+    def _fire(self):
+        self.handle = None
+        self.last_run = self.clock()
+        self.runs += 1
+        start = time.process_time()
+        self.run()
+        self.run_time += time.process_time() - start
@@ -0,0 +1,294 @@
+# Import needed libraries
+import sys
+import time
+import queue
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import deque, defaultdict
+
+from SPFEngine import SPFEngine
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+
+
+class ShardNetwork(LoopbackNetwork):
+    """
+    Loopback network of one worker process. Clients of the shard talk to each
+    other directly, packets for clients of other shards are batched and put
+    in the inbox queue of the owning worker.
+    """
+    def __init__(self, shard, inboxes, owners, latency=0.0, loss=0.0, bandwidth=None, seed=None):
+        """
+        Constructor for ShardNetwork class.
+        :param shard: Index of this shard.
+        :param inboxes: Inbox queue of every shard.
+        :param owners: Dictionary JID -> shard index.
+        """
+        super().__init__(latency, loss, bandwidth, seed)
+        self.shard = shard
+        self.inboxes = inboxes
+        self.owners = owners
+        self.outgoing = defaultdict(list)
+        self.flush_scheduled = False
+        # Metrics
+        self.remote_sent = 0
+        self.remote_received = 0
+
+    def deliver(self, from_jid, to_jid, body):
+        if to_jid in self.clients:
+            super().deliver(from_jid, to_jid, body)
+            return
+
+        self.sent += 1
+        self.bytes += len(body)
+        shard = self.owners.get(to_jid)
+        delay = None if shard is None else self.link_delay(from_jid, to_jid, body)
+        if delay is None:
+            self.dropped += 1
+            return
+        # Link latency is spent on the sending side, the receiver delivers right away
+        self.schedule(delay, self._enqueue, shard, (from_jid, to_jid, body))
+
+    def _enqueue(self, shard, packet):
+        self.outgoing[shard].append(packet)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self.flush_scheduled = False
+        outgoing, self.outgoing = self.outgoing, defaultdict(list)
+        for shard, batch in outgoing.items():
+            self.remote_sent += len(batch)
+            self.inboxes[shard].put(batch)
+
+    def arrive_batch(self, batch):
+        self.remote_received += len(batch)
+        for from_jid, to_jid, body in batch:
+            client = self.clients.get(to_jid)
+            if client is None:
+                self.dropped += 1
+                continue
+            self.delivered += 1
+            client.receive(body, from_jid)
+
+    def listen(self, loop):
+        """
+        Read the inbox from a thread and hand every batch to the event loop.
+        """
+        def read():
+            inbox = self.inboxes[self.shard]
+            while True:
+                batch = inbox.get()
+                if batch is None:
+                    return
+                loop.call_soon_threadsafe(self.arrive_batch, batch)
+
+        thread = threading.Thread(target=read, daemon=True)
+        thread.start()
+        return thread
+
+
+def run_shard(shard, params, owners, inboxes, expected, options, barrier, stop, results):
+    """
+    Entry point of a worker process: run the clients of one shard until the coordinator stops it.
+    """
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    logging.basicConfig(level=options["log_level"])
+    asyncio.run(_run_shard(shard, params, owners, inboxes, expected, options, barrier, stop, results))
+
+
+async def _run_shard(shard, params, owners, inboxes, expected, options, barrier, stop, results):
+    network = ShardNetwork(shard, inboxes, owners, options["latency"], options["loss"], options["bandwidth"],
+                           None if options["seed"] is None else options["seed"] + shard)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    reader = network.listen(asyncio.get_running_loop())
+
+    # Every shard starts routing at the same time
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    start = time.time()
+    startup = asyncio.create_task(manager.connect_clients())
+    converged_at = None
+    cpu_start = time.process_time()
+    while not stop.is_set():
+        await asyncio.sleep(options["poll"])
+        if converged_at is None and startup.done() and all(
+            {node: cost for node, (_, cost) in client.routing_table.items()} == expected[client.boundjid.full]
+            for client in manager.clients
+        ):
+            converged_at = time.time()
+            results.put(("converged", shard, converged_at - start))
+    cpu_time = time.process_time() - cpu_start
+
+    inboxes[shard].put(None)
+    reader.join(timeout=1)
+    results.put(("result", shard, {
+        "clients": len(manager.clients),
+        "converged_seconds": None if converged_at is None else converged_at - start,
+        "cpu_seconds": cpu_time,
+        "sent": network.sent,
+        "delivered": network.delivered,
+        "dropped": network.dropped,
+        "bytes": network.bytes,
+        "remote_sent": network.remote_sent,
+        "remote_received": network.remote_received,
+        "spf_runs": sum(client.spf_scheduler.runs for client in manager.clients),
+        "logs": {client.boundjid.full: client.send_log() for client in manager.clients},
+    }))
+
+
+class ShardedNetworkManager:
+    """
+    Class in charge of simulating a network split across worker processes,
+    each one running its share of the clients in its own event loop.
+    """
+    def __init__(self, clients_params, workers=None, latency=0.0, loss=0.0, bandwidth=None, seed=None,
+                 log_level=logging.WARNING):
+        """
+        Constructor for ShardedNetworkManager class.
+        :param clients_params: List of users, passwords, neighbors and costs.
+        :param workers: Number of worker processes, defaults to the number of CPUs.
+        :param latency: Link latency in seconds.
+        :param loss: Link loss probability.
+        :param bandwidth: Link bandwidth in bytes per second, None for unlimited.
+        :param seed: Seed of the loss generators.
+        :param log_level: Logging level inside the workers, their logs are also returned in the results.
+        """
+        self.clients_params = clients_params
+        self.workers = workers or multiprocessing.cpu_count()
+        self.options = {
+            "latency": latency, "loss": loss, "bandwidth": bandwidth, "seed": seed,
+            "log_level": log_level, "poll": 0.02,
+        }
+        self.logger = logging.getLogger("ShardedNetworkManager")
+
+    def partition(self):
+        """
+        Split the clients into contiguous chunks of a breadth first order, so
+        most neighbors end up in the same shard.
+        """
+        by_jid = {params["jid"]: params for params in self.clients_params}
+        order = []
+        seen = set()
+        for params in self.clients_params:
+            if params["jid"] in seen:
+                continue
+            seen.add(params["jid"])
+            pending = deque([params["jid"]])
+            while pending:
+                jid = pending.popleft()
+                order.append(by_jid[jid])
+                for neighbor in by_jid[jid]["neighbors"]:
+                    if neighbor in by_jid and neighbor not in seen:
+                        seen.add(neighbor)
+                        pending.append(neighbor)
+
+        workers = min(self.workers, len(order))
+        size, extra = divmod(len(order), workers)
+        shards = []
+        start = 0
+        for shard in range(workers):
+            end = start + size + (1 if shard < extra else 0)
+            shards.append(order[start:end])
+            start = end
+        return shards
+
+    def expected_distances(self):
+        """
+        Global shortest path distances from every node, the target of convergence.
+        """
+        link_state_db = {params["jid"]: params.get("costs", {}) for params in self.clients_params}
+        expected = {}
+        for params in self.clients_params:
+            engine = SPFEngine(params["jid"])
+            engine.load(link_state_db)
+            expected[params["jid"]] = {node: cost for node, (_, cost) in engine.routing_table.items()}
+        return expected
+
+    def next_result(self, results, processes, deadline):
+        """
+        Next report of a shard, checking on the workers while waiting.
+        :return: Tuple (kind, shard, value), or None once the deadline passed.
+        """
+        while time.time() < deadline:
+            try:
+                return results.get(timeout=min(max(deadline - time.time(), 0.01), 1.0))
+            except queue.Empty:
+                pass
+            # A worker only exits by itself after putting its result, a failure would otherwise wait out the deadline
+            dead = [shard for shard, process in enumerate(processes) if not process.is_alive() and process.exitcode]
+            if dead:
+                self.terminate(processes)
+                raise RuntimeError(f"Shard worker {dead[0]} exited with code {processes[dead[0]].exitcode}")
+        return None
+
+    def terminate(self, processes):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    def run(self, timeout=60.0, linger=0.0):
+        """
+        Run the simulation until every shard converged or the timeout expires, raises RuntimeError if a
+        worker process dies.
+        :param timeout: Seconds to wait for convergence.
+        :param linger: Seconds to keep running after convergence.
+        :return: Dictionary with the convergence time and the metrics and logs of every shard.
+        """
+        shards = self.partition()
+        owners = {params["jid"]: shard for shard, chunk in enumerate(shards) for params in chunk}
+        expected = self.expected_distances()
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in shards]
+        results = context.Queue()
+        barrier = context.Barrier(len(shards) + 1)
+        stop = context.Event()
+
+        processes = []
+        for shard, chunk in enumerate(shards):
+            process = context.Process(target=run_shard, args=(
+                shard, chunk, owners, inboxes, {params["jid"]: expected[params["jid"]] for params in chunk},
+                self.options, barrier, stop, results,
+            ))
+            process.start()
+            processes.append(process)
+
+        # Raises BrokenBarrierError if a worker dies while building its clients
+        barrier.wait(timeout)
+        self.logger.info(f"Started {len(shards)} shards")
+        deadline = time.time() + timeout
+        converged = {}
+        while len(converged) < len(shards):
+            item = self.next_result(results, processes, deadline)
+            if item is None:
+                break
+            kind, shard, value = item
+            if kind == "converged":
+                converged[shard] = value
+        time.sleep(linger)
+        stop.set()
+
+        # Shards get the same timeout again to stop and report
+        deadline = time.time() + timeout
+        shard_results = {}
+        while len(shard_results) < len(shards):
+            item = self.next_result(results, processes, deadline)
+            if item is None:
+                self.terminate(processes)
+                raise TimeoutError(f"Only {len(shard_results)} of {len(shards)} shards reported their results")
+            kind, shard, value = item
+            if kind == "result":
+                shard_results[shard] = value
+        for process in processes:
+            process.join()
+
+        return {
+            "workers": len(shards),
+            "converged_seconds": max(converged.values()) if len(converged) == len(shards) else None,
+            "shards": [shard_results[shard] for shard in range(len(shards))],
+        }
@@ -0,0 +1,209 @@
+import asyncio
+import random
+
+
+class XMPPTransport:
+    """
+    Transport over the client's own XMPP stream, the default.
+    """
+    def __init__(self, host=None, port=7070):
+        """
+        Constructor for XMPPTransport class.
+        :param host: XMPP server, defaults to the domain of the client JID.
+        :param port: XMPP server port.
+        """
+        self.host = host
+        self.port = port
+        self.client = None
+
+    def bind(self, client):
+        self.client = client
+
+    def send(self, to_jid, body, msg_type='chat'):
+        self.client.send_message(mto=to_jid, mbody=body, mtype=msg_type)
+
+    async def drain(self, to_jid, high_water=65536):
+        """
+        Wait while the socket has more than high_water bytes not yet written.
+        """
+        # slixmpp keeps the asyncio transport of the stream in client.transport
+        socket = self.client.transport
+        while socket is not None and socket.get_write_buffer_size() > high_water:
+            await asyncio.sleep(0.01)
+            socket = self.client.transport
+
+    async def run(self):
+        """
+        Connect to the server, routing starts from the session_start event.
+        """
+        client = self.client
+        host = self.host or client.boundjid.host
+        client.log('INFO', "Important: Connecting to %s...", host)
+        client.connect((host, self.port), disable_starttls=True)
+
+        try:
+            client.log('INFO', "Important: Connection successful")
+            await client.process(forever=False)
+        except Exception as e:
+            pass
+            # client.log('ERROR', f"An error occurred: {str(e)}")
+
+
+class LinkProfile:
+    """
+    Delivery characteristics of a simulated link.
+    """
+    __slots__ = ("latency", "loss", "bandwidth", "free_at")
+
+    def __init__(self, latency=0.0, loss=0.0, bandwidth=None):
+        """
+        Constructor for LinkProfile class.
+        :param latency: One way delay in seconds.
+        :param loss: Probability of dropping a packet.
+        :param bandwidth: Bytes per second, None for unlimited.
+        """
+        self.latency = latency
+        self.loss = loss
+        self.bandwidth = bandwidth
+        # Time the link finishes sending what is already queued on it
+        self.free_at = 0.0
+
+
+class LoopbackNetwork:
+    """
+    In-memory network delivering bodies between clients of the same process
+    through the asyncio loop, with configurable per-link latency, loss and
+    bandwidth.
+    """
+    def __init__(self, latency=0.0, loss=0.0, bandwidth=None, seed=None):
+        """
+        Constructor for LoopbackNetwork class.
+        :param latency: Default one way delay in seconds.
+        :param loss: Default probability of dropping a packet.
+        :param bandwidth: Default bytes per second, None for unlimited.
+        :param seed: Seed of the loss generator, for repeatable runs.
+        """
+        self.default = (latency, loss, bandwidth)
+        self.links = {}
+        self.clients = {}
+        self.random = random.Random(seed)
+        # Metrics
+        self.in_flight = 0
+        self.sent = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.bytes = 0
+
+    def transport(self):
+        """
+        Create a transport for a client of this network.
+        """
+        return LoopbackTransport(self)
+
+    def set_link(self, a, b, latency=None, loss=None, bandwidth=None, symmetric=True):
+        """
+        Configure the link between two JIDs, unset values keep the network default.
+        """
+        default_latency, default_loss, default_bandwidth = self.default
+        for key in ((a, b), (b, a)) if symmetric else ((a, b),):
+            self.links[key] = LinkProfile(
+                default_latency if latency is None else latency,
+                default_loss if loss is None else loss,
+                default_bandwidth if bandwidth is None else bandwidth,
+            )
+
+    def link(self, from_jid, to_jid):
+        profile = self.links.get((from_jid, to_jid))
+        if profile is None:
+            profile = self.links[(from_jid, to_jid)] = LinkProfile(*self.default)
+        return profile
+
+    def deliver(self, from_jid, to_jid, body):
+        self.sent += 1
+        self.bytes += len(body)
+        client = self.clients.get(to_jid)
+        delay = None if client is None else self.link_delay(from_jid, to_jid, body)
+        if delay is None:
+            self.dropped += 1
+            return
+
+        self.in_flight += 1
+        self.schedule(delay, self._arrive, client, body, from_jid)
+
+    def link_delay(self, from_jid, to_jid, body):
+        """
+        Time until a body sent now reaches the other end of the link.
+        :return: Delay in seconds, or None if the link loses it.
+        """
+        profile = self.link(from_jid, to_jid)
+        if profile.loss and self.random.random() < profile.loss:
+            return None
+        if not profile.bandwidth:
+            return profile.latency
+        # Packets queue behind each other on the link
+        now = asyncio.get_running_loop().time()
+        departure = max(now, profile.free_at) + len(body) / profile.bandwidth
+        profile.free_at = departure
+        return departure - now + profile.latency
+
+    @staticmethod
+    def schedule(delay, callback, *args):
+        loop = asyncio.get_running_loop()
+        if delay > 0:
+            loop.call_later(delay, callback, *args)
+        else:
+            loop.call_soon(callback, *args)
+
+    def _arrive(self, client, body, from_jid):
+        self.in_flight -= 1
+        self.delivered += 1
+        client.receive(body, from_jid)
+
+    async def wait_idle(self, settle=0.01):
+        """
+        Wait until no packet is in flight and none was sent during the settle time.
+        """
+        while True:
+            sent = self.sent
+            while self.in_flight or self.queued():
+                await asyncio.sleep(settle / 10)
+            await asyncio.sleep(settle)
+            if not self.in_flight and not self.queued() and sent == self.sent:
+                return
+
+    def queued(self):
+        """
+        Packets still waiting in the outbound queues of the clients.
+        """
+        return sum(len(client.outbound) for client in self.clients.values())
+
+
+class LoopbackTransport:
+    """
+    Transport of one client on a LoopbackNetwork.
+    """
+    def __init__(self, network):
+        self.network = network
+        self.client = None
+
+    def bind(self, client):
+        self.client = client
+        self.network.clients[client.boundjid.full] = client
+
+    def send(self, to_jid, body, msg_type='chat'):
+        self.network.deliver(self.client.boundjid.full, to_jid, body)
+
+    async def drain(self, to_jid):
+        """
+        Wait until the link has sent what is already on it, like a full socket buffer.
+        """
+        profile = self.network.link(self.client.boundjid.full, to_jid)
+        loop = asyncio.get_running_loop()
+        while profile.bandwidth and profile.free_at > loop.time():
+            await asyncio.sleep(profile.free_at - loop.time())
+
+    async def run(self):
+        """
+        There is no session to open, routing starts right away.
+        """
+        await self.client.start_routing()
@@ -0,0 +1,266 @@
+import sys
+import json
+import base64
+
+# Formats a node can speak, JSON is understood by every implementation
+JSON = "json"
+BINARY = "binary"
+
+# Binary bodies start with a character JSON never starts with
+BINARY_PREFIX = "~"
+# Batches of several bodies, announced like a codec and only sent to neighbors that understand them
+BATCH = "batch"
+BATCH_PREFIX = "*"
+VERSION = 1
+
+TYPE_CODES = {"echo": 0, "info": 1, "message": 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+OTHER_TYPE = 255
+
+# Payload kinds
+PAYLOAD_STRING = 0
+PAYLOAD_INT_COSTS = 1
+
+FIELDS = {"type", "from", "to", "hops", "headers", "payload", "id"}
+REQUIRED_FIELDS = {"type", "from", "to"}
+
+
+class DecodeError(ValueError):
+    """
+    Raised when a message body is neither JSON nor a valid binary packet.
+    """
+
+
+def encode(message, codec=JSON):
+    """
+    Serialize a routing packet for the XMPP body.
+    :param message: Packet dictionary, an info payload may be the decoded cost map.
+    :param codec: JSON or BINARY, packets the binary format can't carry are sent as JSON.
+    """
+    if codec == BINARY and _fits_binary(message):
+        return BINARY_PREFIX + base64.b64encode(_encode_binary(message)).decode("ascii")
+    if message.get("type") == "info" and isinstance(message.get("payload"), dict):
+        message = dict(message, payload=json.dumps(message["payload"]))
+    return json.dumps(message)
+
+
+def decode(body):
+    """
+    Parse a message body in whichever format it was sent.
+    :return: Tuple (packet, codec).
+    """
+    if body.startswith(BINARY_PREFIX):
+        try:
+            return _decode_binary(base64.b64decode(body[len(BINARY_PREFIX):], validate=True)), BINARY
+        except (ValueError, IndexError, KeyError, UnicodeDecodeError) as e:
+            raise DecodeError(f"Invalid binary packet: {e}") from None
+    try:
+        return json.loads(body), JSON
+    except json.JSONDecodeError as e:
+        raise DecodeError(str(e)) from None
+
+
+def decode_costs(payload):
+    """
+    Cost map of a link state payload, JSON text or already decoded.
+    :return: Dictionary interned neighbor JID -> non negative cost.
+    """
+    try:
+        costs = json.loads(payload) if isinstance(payload, str) else payload
+    except (ValueError, TypeError) as e:
+        raise DecodeError(f"Invalid link state payload: {e}") from None
+    if not isinstance(costs, dict) or not all(
+        isinstance(neighbor, str) and isinstance(cost, (int, float)) and not isinstance(cost, bool) and cost >= 0
+        for neighbor, cost in costs.items()
+    ):
+        raise DecodeError(f"Link state payload is not a cost map: {payload!r}")
+    # Each advertisement decodes its own copy of a JID, interned they are one string per node in the process
+    return {sys.intern(neighbor): cost for neighbor, cost in costs.items()}
+
+
+def encode_batch(bodies):
+    """
+    Pack encoded bodies into one, neither JSON nor binary bodies contain a newline.
+    """
+    return BATCH_PREFIX + "\n".join(bodies)
+
+
+def split_batch(body):
+    """
+    Bodies packed by encode_batch, or None if the body is not a batch.
+    """
+    if not body.startswith(BATCH_PREFIX):
+        return None
+    return body[len(BATCH_PREFIX):].split("\n")
+
+
+def _fits_binary(message):
+    if not isinstance(message, dict) or not FIELDS.issuperset(message) or not REQUIRED_FIELDS.issubset(message):
+        return False
+    if not all(isinstance(message[key], str) for key in REQUIRED_FIELDS):
+        return False
+    if not isinstance(message.get("hops", 0), int) or message.get("hops", 0) < 0:
+        return False
+    payload = message.get("payload", "")
+    if not isinstance(payload, str) and not (message["type"] == "info" and isinstance(payload, dict)):
+        return False
+    headers = message.get("headers", [])
+    return isinstance(headers, list) and all(
+        isinstance(header, dict) and len(header) == 1 and isinstance(header.get("via"), str) for header in headers
+    )
+
+
+def _write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _write_string(buffer, text):
+    raw = text.encode()
+    _write_varint(buffer, len(raw))
+    buffer += raw
+
+
+def _read_string(data, position):
+    length, position = _read_varint(data, position)
+    end = position + length
+    if end > len(data):
+        raise ValueError("truncated string")
+    return data[position:end].decode(), end
+
+
+def _encode_binary(message):
+    # Every JID is written once in a per-packet table and then referenced by index
+    table = {}
+
+    def intern(jid):
+        if jid not in table:
+            table[jid] = len(table)
+        return table[jid]
+
+    message_type = message.get("type")
+    payload = message.get("payload", "")
+    if message_type == "info" and isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError:
+            pass
+
+    from_index = intern(message.get("from", ""))
+    to_index = intern(message.get("to", ""))
+    path = [intern(header["via"]) for header in message.get("headers", [])]
+    costs = None
+    if isinstance(payload, dict) and all(
+        isinstance(cost, int) and not isinstance(cost, bool) and cost >= 0 for cost in payload.values()
+    ):
+        costs = [(intern(neighbor), cost) for neighbor, cost in payload.items()]
+    elif not isinstance(payload, str):
+        payload = json.dumps(payload)
+
+    # JIDs mostly share the @domain/resource part, it is written once too
+    domains = {}
+    entries = []
+    for jid in table:
+        local, at, domain = jid.partition("@")
+        if at:
+            domain = domains.setdefault(domain, len(domains))
+            entries.append((local, domain + 1))
+        else:
+            entries.append((local, 0))
+
+    buffer = bytearray((VERSION, TYPE_CODES.get(message_type, OTHER_TYPE)))
+    if buffer[1] == OTHER_TYPE:
+        _write_string(buffer, str(message_type))
+    _write_varint(buffer, len(domains))
+    for domain in domains:
+        _write_string(buffer, domain)
+    _write_varint(buffer, len(entries))
+    for local, domain in entries:
+        _write_string(buffer, local)
+        _write_varint(buffer, domain)
+    _write_varint(buffer, from_index)
+    _write_varint(buffer, to_index)
+    _write_varint(buffer, message.get("hops", 0))
+    _write_varint(buffer, len(path))
+    for index in path:
+        _write_varint(buffer, index)
+    _write_string(buffer, str(message.get("id", "")))
+    if costs is not None:
+        buffer.append(PAYLOAD_INT_COSTS)
+        _write_varint(buffer, len(costs))
+        for index, cost in costs:
+            _write_varint(buffer, index)
+            _write_varint(buffer, cost)
+    else:
+        buffer.append(PAYLOAD_STRING)
+        _write_string(buffer, payload)
+    return bytes(buffer)
+
+
+def _decode_binary(data):
+    if not data or data[0] != VERSION:
+        raise ValueError("unsupported version")
+    position = 2
+    if data[1] == OTHER_TYPE:
+        message_type, position = _read_string(data, position)
+    else:
+        message_type = TYPE_NAMES[data[1]]
+
+    count, position = _read_varint(data, position)
+    domains = []
+    for _ in range(count):
+        domain, position = _read_string(data, position)
+        domains.append("@" + domain)
+    count, position = _read_varint(data, position)
+    table = []
+    for _ in range(count):
+        local, position = _read_string(data, position)
+        domain, position = _read_varint(data, position)
+        table.append(local + domains[domain - 1] if domain else local)
+    from_index, position = _read_varint(data, position)
+    to_index, position = _read_varint(data, position)
+    hops, position = _read_varint(data, position)
+    length, position = _read_varint(data, position)
+    headers = []
+    for _ in range(length):
+        index, position = _read_varint(data, position)
+        headers.append({"via": table[index]})
+    message_id, position = _read_string(data, position)
+
+    kind = data[position]
+    position += 1
+    if kind == PAYLOAD_INT_COSTS:
+        count, position = _read_varint(data, position)
+        payload = {}
+        for _ in range(count):
+            index, position = _read_varint(data, position)
+            cost, position = _read_varint(data, position)
+            payload[table[index]] = cost
+    else:
+        payload, position = _read_string(data, position)
+
+    message = {
+        "type": message_type,
+        "from": table[from_index],
+        "to": table[to_index],
+        "hops": hops,
+        "headers": headers,
+        "payload": payload,
+    }
+    if message_id:
+        message["id"] = message_id
+    return message
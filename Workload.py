@@ -0,0 +1,253 @@
+import json
+import time
+import random
+import asyncio
+import logging
+
+PATTERNS = ("all-to-all", "hotspot", "flows")
+ARRIVALS = ("poisson", "constant")
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "choice")
+
+# Settings of a phase, each phase of a spec inherits the top level ones
+DEFAULTS = {
+    "name": "workload",
+    "duration": 10.0,
+    "rate": 10.0,
+    "arrivals": "poisson",
+    "pattern": "all-to-all",
+    "senders": None,
+    "hotspots": None,
+    "hotspot_fraction": 0.8,
+    "flows": None,
+    "payload": {"distribution": "fixed", "size": 64},
+    "reliable": False,
+    "drain": 2.0,
+}
+
+
+def load_spec(path):
+    """
+    Read a workload spec from a JSON or YAML file.
+    """
+    with open(path, 'r') as file:
+        if path.endswith(".json"):
+            return json.load(file)
+        import yaml
+        return yaml.safe_load(file)
+
+
+def phases_of(spec):
+    """
+    Split a spec into its phases, with the defaults and the top level settings filled in.
+    """
+    common = dict(DEFAULTS, **{key: value for key, value in spec.items() if key not in ("phases", "seed", "warmup")})
+    phases = []
+    for index, overrides in enumerate(spec.get("phases", [{}])):
+        phase = dict(common, **overrides)
+        if "name" not in overrides and len(spec.get("phases", ())) > 1:
+            phase["name"] = f"{common['name']}_{index}"
+        # Results are reported by phase name
+        if any(previous["name"] == phase["name"] for previous in phases):
+            raise ValueError(f"Duplicate phase name {phase['name']!r}")
+        if phase["name"] == "total":
+            raise ValueError("The phase name 'total' is reserved for the summary of the whole run")
+        phases.append(phase)
+        if phase["pattern"] not in PATTERNS:
+            raise ValueError(f"Unknown traffic pattern {phase['pattern']!r}, expected one of {PATTERNS}")
+        if phase["arrivals"] not in ARRIVALS:
+            raise ValueError(f"Unknown arrival process {phase['arrivals']!r}, expected one of {ARRIVALS}")
+        if phase["payload"].get("distribution", "fixed") not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown payload distribution {phase['payload']['distribution']!r}, "
+                             f"expected one of {DISTRIBUTIONS}")
+        if phase["pattern"] == "flows" and not phase["flows"]:
+            raise ValueError("The flows pattern needs a list of [source, destination] flows")
+        if phase["senders"] is not None and not phase["senders"]:
+            raise ValueError("Senders must list at least one node, or be left out for every node")
+        if phase["rate"] <= 0 or phase["duration"] < 0:
+            raise ValueError("Rate must be positive and duration not negative")
+    return phases
+
+
+def payload_size(distribution, rng):
+    """
+    Draw a payload size in bytes.
+    :param distribution: Payload settings, such as {"distribution": "uniform", "min": 16, "max": 1024}.
+    """
+    kind = distribution.get("distribution", "fixed")
+    if kind == "uniform":
+        size = rng.randint(distribution.get("min", 0), distribution.get("max", 1024))
+    elif kind == "exponential":
+        size = rng.expovariate(1 / distribution.get("mean", 256))
+    elif kind == "choice":
+        size = rng.choices(distribution["sizes"], distribution.get("weights"))[0]
+    else:
+        size = distribution.get("size", 64)
+    return max(0, int(size))
+
+
+class MessageRecord:
+    """
+    Fate of one injected message.
+    """
+    __slots__ = ("message_id", "phase", "source", "destination", "size", "sent_at", "latency", "hops", "copies")
+
+    def __init__(self, message_id, phase, source, destination, size, sent_at):
+        self.message_id = message_id
+        self.phase = phase
+        self.source = source
+        self.destination = destination
+        self.size = size
+        self.sent_at = sent_at
+        # Filled in by the first copy that reaches the destination
+        self.latency = None
+        self.hops = None
+        self.copies = 0
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def summarize(records, elapsed):
+    """
+    Delivery ratio, latency and hop statistics of a list of MessageRecord.
+    :param elapsed: Seconds the messages were injected over.
+    """
+    delivered = [record for record in records if record.latency is not None]
+    latencies = sorted(record.latency for record in delivered)
+    hops = [record.hops for record in delivered]
+    return {
+        "sent": len(records),
+        "delivered": len(delivered),
+        "lost": len(records) - len(delivered),
+        "loss_ratio": (len(records) - len(delivered)) / len(records) if records else 0.0,
+        "duplicates": sum(max(0, record.copies - 1) for record in records),
+        "offered_rate": len(records) / elapsed if elapsed else 0.0,
+        "bytes": sum(record.size for record in records),
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_p99": _percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else None,
+        "hops_mean": sum(hops) / len(hops) if hops else None,
+        "hops_max": max(hops) if hops else None,
+    }
+
+
+class Workload:
+    """
+    Traffic generator for a set of running clients. Every sender injects data
+    messages from its own task at its share of the phase rate, destinations
+    follow the phase pattern, and the destinations report back the latency
+    and hops of every message that arrives.
+    """
+    def __init__(self, clients, spec):
+        """
+        Constructor for Workload class.
+        :param clients: NetworkClient instances, already routing.
+        :param spec: Dictionary as read by load_spec, a single phase or a list of "phases".
+        """
+        self.clients = {client.boundjid.full: client for client in clients}
+        if len(self.clients) < 2:
+            raise ValueError("A workload needs at least two clients")
+        self.jids = list(self.clients)
+        self.phases = phases_of(spec)
+        self.seed = spec.get("seed", 0)
+        self.warmup = spec.get("warmup", 0.0)
+        # Message id -> MessageRecord
+        self.records = {}
+        self.elapsed = {}
+        self.logger = logging.getLogger("Workload")
+
+    def on_delivery(self, message):
+        record = self.records.get(message.get("id"))
+        if record is None:
+            return
+        record.copies += 1
+        if record.latency is None:
+            record.latency = time.perf_counter() - record.sent_at
+            record.hops = message.get("hops")
+
+    async def run(self):
+        """
+        Run every phase in order.
+        :return: Summary of each phase and of the whole run.
+        """
+        for client in self.clients.values():
+            client.add_event_handler("routed_message", self.on_delivery)
+        try:
+            if self.warmup:
+                await asyncio.sleep(self.warmup)
+            for index, phase in enumerate(self.phases):
+                await self.run_phase(index, phase)
+        finally:
+            for client in self.clients.values():
+                client.del_event_handler("routed_message", self.on_delivery)
+        return self.summary()
+
+    async def run_phase(self, index, phase):
+        self.logger.info("Starting phase %s: %s at %s messages/s for %ss", phase["name"], phase["pattern"],
+                         phase["rate"], phase["duration"])
+        if phase["pattern"] == "flows":
+            senders = sorted({source for source, _ in phase["flows"]})
+            nodes = senders + [destination for _, destination in phase["flows"]]
+        else:
+            senders = phase["senders"] or self.jids
+            nodes = senders + (phase["hotspots"] or [])
+        missing = sorted({jid for jid in nodes if jid not in self.clients})
+        if missing:
+            raise ValueError(f"Unknown nodes in phase {phase['name']}: {missing}")
+        start = time.perf_counter()
+        await asyncio.gather(*(self.inject(index, phase, jid, phase["rate"] / len(senders),
+                                           random.Random(f"{self.seed}/{index}/{jid}"))
+                               for jid in senders))
+        self.elapsed[phase["name"]] = time.perf_counter() - start
+        # Messages still in flight get this long to arrive before they count as lost
+        await asyncio.sleep(phase["drain"])
+
+    def destination(self, phase, source, rng):
+        if phase["pattern"] == "flows":
+            return rng.choice([destination for flow_source, destination in phase["flows"] if flow_source == source])
+        if phase["pattern"] == "hotspot" and rng.random() < phase["hotspot_fraction"]:
+            hotspots = [jid for jid in phase["hotspots"] or self.jids[:1] if jid != source]
+            if hotspots:
+                return rng.choice(hotspots)
+        # Uniform among the other nodes, the source stands in for the last one
+        destination = self.jids[rng.randrange(len(self.jids) - 1)]
+        return self.jids[-1] if destination == source else destination
+
+    async def inject(self, index, phase, source, rate, rng):
+        client = self.clients[source]
+        loop = asyncio.get_running_loop()
+        end = loop.time() + phase["duration"]
+        # Arrival times are kept on an absolute schedule, a slow send is caught up rather than lowering the rate
+        next_send = loop.time() + (rng.expovariate(rate) if phase["arrivals"] == "poisson" else rng.random() / rate)
+        sequence = 0
+        while next_send < end:
+            await asyncio.sleep(max(0.0, next_send - loop.time()))
+            destination = self.destination(phase, source, rng)
+            size = payload_size(phase["payload"], rng)
+            message_id = f"{phase['name']}_{index}_{source}_{sequence}"
+            sequence += 1
+            record = self.records[message_id] = MessageRecord(message_id, phase["name"], source, destination, size,
+                                                              time.perf_counter())
+            if phase["reliable"]:
+                future = client.send_reliable(destination, "x" * size, message_id)
+                # Failures show up as lost messages, the future only needs its exception retrieved
+                future.add_done_callback(lambda done: done.exception())
+            else:
+                await client.send_message_to(destination, {
+                    "type": "message", "from": source, "to": destination, "hops": 0, "headers": [],
+                    "payload": "x" * size, "id": message_id})
+            next_send += rng.expovariate(rate) if phase["arrivals"] == "poisson" else 1 / rate
+        self.logger.debug("%s injected %s messages", source, sequence)
+
+    def summary(self):
+        """
+        Statistics of every phase, and of the whole run under "total".
+        """
+        by_phase = {}
+        for record in self.records.values():
+            by_phase.setdefault(record.phase, []).append(record)
+        result = {name: summarize(records, self.elapsed.get(name, 0.0)) for name, records in by_phase.items()}
+        result["total"] = summarize(list(self.records.values()), sum(self.elapsed.values()))
+        return result
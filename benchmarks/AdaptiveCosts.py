@@ -0,0 +1,83 @@
+"""
+Adaptive link costs on a simulated square A - B - D, A - C - D where the
+configured costs prefer the path through C but its links are much slower.
+Link latencies jitter during the run. For static costs, adaptive costs
+without hysteresis and adaptive costs with the default hysteresis it
+reports the path A ends up using to reach D, the latency of data sent
+over it, and how many link state advertisements and SPF runs the run took.
+
+Usage: python benchmarks/AdaptiveCosts.py [seconds]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING)
+
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B, C, D = (f"{name}@square.local/bench" for name in "abcd")
+COSTS = {A: {B: 5, C: 1}, B: {A: 5, D: 5}, C: {A: 1, D: 1}, D: {B: 5, C: 1}}
+# One way latency of every link
+LATENCY = {(A, B): 0.002, (B, D): 0.002, (A, C): 0.02, (C, D): 0.02}
+
+
+async def run(seconds, **options):
+    network = LoopbackNetwork()
+    rng = random.Random(1)
+    clients = {jid: NetworkClient(jid, "password", list(costs), dict(costs), transport=network.transport(),
+                                  probe_interval=0.1, cost_unit=0.002, **options)
+               for jid, costs in COSTS.items()}
+
+    def jitter():
+        for (a, b), latency in LATENCY.items():
+            network.set_link(a, b, latency=latency * rng.uniform(0.7, 1.3))
+
+    jitter()
+    initial = {jid: client.sequence_number for jid, client in clients.items()}
+    await asyncio.gather(*(client.start_routing() for client in clients.values()))
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        await asyncio.sleep(0.2)
+        jitter()
+
+    latencies = []
+    clients[D].add_event_handler("routed_message", lambda message: latencies.append(
+        time.perf_counter() - float(message["payload"])))
+    for index in range(50):
+        await clients[A].send_message_to(D, {"type": "message", "from": A, "to": D, "hops": 0, "headers": [],
+                                             "payload": str(time.perf_counter()), "id": f"data_{index}"})
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.2)
+
+    return {
+        "next_hop": clients[A].get_next_hop(D).split("@")[0],
+        "latency": statistics.median(latencies) if latencies else None,
+        "advertisements": sum(client.sequence_number - initial[jid] for jid, client in clients.items()),
+        "spf_runs": sum(client.spf_scheduler.runs for client in clients.values()),
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    configs = {
+        "static": {},
+        "no hysteresis": {"adaptive_costs": True, "cost_hysteresis": 0.0, "cost_hold_time": 0.0},
+        "hysteresis": {"adaptive_costs": True, "cost_hold_time": 1.0},
+    }
+    print(f"{seconds:g}s of jittering link latency")
+    for label, options in configs.items():
+        result = asyncio.run(run(seconds, **options))
+        print(f"  {label:<14} A reaches D via {result['next_hop']}, data latency p50 {result['latency'] * 1000:.1f} ms, "
+              f"{result['advertisements']} link state advertisements, {result['spf_runs']} SPF runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Stanza count and latency with outbound batching. For each batch window it
+brings up a random topology over the loopback network, counts the stanzas
+and bytes until the routing tables converge, then has every node send a
+burst of data messages at once and reports the stanzas and delivery latency
+of the burst.
+
+Usage: python benchmarks/BatchingBench.py [nodes] [messages per node] [windows in ms...]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+from RoutingBenchmark import expected_distances, converged, summarize
+
+
+async def run(params, burst, window):
+    params = [dict(param, batch_window=window) for param in params]
+    network = LoopbackNetwork(latency=0.002)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    clients = manager.clients
+    expected = expected_distances(params)
+
+    start = time.perf_counter()
+    startup = asyncio.create_task(manager.connect_clients())
+    while not (startup.done() and converged(clients, expected)):
+        await asyncio.sleep(0.005)
+    convergence = time.perf_counter() - start
+    await network.wait_idle(0.05)
+    control_stanzas, control_bytes = network.sent, network.bytes
+
+    sent_at = {}
+    latencies = []
+    for client in clients:
+        client.add_event_handler("routed_message", lambda message: latencies.append(
+            time.perf_counter() - sent_at[message["id"]]))
+    rng = random.Random(1)
+    for index in range(burst):
+        for client in clients:
+            destination = rng.choice([other for other in clients if other is not client]).boundjid.full
+            message_id = f"burst_{index}_{client.boundjid.full}"
+            sent_at[message_id] = time.perf_counter()
+            await client.send_message_to(destination, {
+                "type": "message", "from": client.boundjid.full, "to": destination,
+                "hops": 0, "headers": [], "payload": f"burst {index}", "id": message_id,
+            })
+    await network.wait_idle(0.05)
+
+    return {
+        "convergence": convergence,
+        "control_stanzas": control_stanzas,
+        "control_bytes": control_bytes,
+        "data_stanzas": network.sent - control_stanzas,
+        "delivered": len(latencies),
+        "latency": summarize(latencies),
+    }
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    burst = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    windows = [float(value) / 1000 for value in sys.argv[3:]] or [0.0, 0.005, 0.01, 0.02]
+    params = Topologies.build("random", nodes)
+    print(f"{nodes} nodes, burst of {burst} messages per node")
+    for window in windows:
+        result = asyncio.run(run(params, burst, window))
+        latency = result["latency"]
+        print(f"  window {window * 1000:>4.0f} ms  convergence {result['convergence']:>6.3f}s "
+              f"control {result['control_stanzas']:>6} stanzas {result['control_bytes'] / 1024:>8.1f} KiB  "
+              f"burst {result['data_stanzas']:>5} stanzas for {result['delivered']} delivered  "
+              f"latency p50 {latency['p50'] * 1000:>6.1f} ms p95 {latency['p95'] * 1000:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
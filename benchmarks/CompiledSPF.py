@@ -0,0 +1,62 @@
+"""
+Compare the original dictionary based SPF with the compiled CSR topology at
+several network sizes.
+
+Usage: python benchmarks/CompiledSPF.py [sizes...]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import CompiledTopology
+from CompiledTopology import CompiledTopology as Topology, CompiledRoutingTable
+from SPFChurn import full_routing_table, random_topology
+
+
+def measure(function, repeat=3):
+    """
+    Best wall time of a few runs, in milliseconds.
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    scipy_dijkstra = CompiledTopology.dijkstra
+    print(f"{'nodes':>8} {'original':>10} {'compile':>10} {'csr heap':>10} {'csr scipy':>10}  (ms)")
+
+    for size in sizes:
+        rng = random.Random(size)
+        link_state_db, _ = random_topology(size, 4, rng, integer_costs=True)
+        original_time, expected = measure(lambda: full_routing_table("n0", link_state_db))
+        compile_time, topology = measure(lambda: Topology(link_state_db))
+
+        CompiledTopology.dijkstra = None
+        heap_time, _ = measure(lambda: topology.shortest_paths("n0"))
+        if scipy_dijkstra is not None:
+            CompiledTopology.dijkstra = scipy_dijkstra
+            scipy_time, result = measure(lambda: topology.shortest_paths("n0"))
+            scipy_column = f"{scipy_time:>10.2f}"
+        else:
+            result = topology.shortest_paths("n0")
+            scipy_column = f"{'n/a':>10}"
+
+        distances, _, first_hops = result
+        table = CompiledRoutingTable(topology, distances, first_hops)
+        assert len(table) == len(expected)
+        assert all(table.get(node)[1] == cost for node, (_, cost) in expected.items())
+        print(f"{size:>8} {original_time:>10.2f} {compile_time:>10.2f} {heap_time:>10.2f} {scipy_column}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Soak test for DuplicateCache: feed millions of flooded ids, the way a node
+sees periodic LSAs and data floods, and report RSS and cache metrics along
+the way. RSS should stay flat once the cache reaches its bound.
+
+Usage: python benchmarks/DuplicateCacheSoak.py [ids] [max_entries]
+"""
+import os
+import sys
+import time
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DuplicateCache import DuplicateCache
+
+
+def current_rss():
+    """
+    Resident set size in KiB, from /proc when available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    max_entries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    # Simulated clock, 1000 ids per second
+    now = [0.0]
+    cache = DuplicateCache(max_entries=max_entries, ttl=30.0, clock=lambda: now[0])
+    step = total // 10
+    start = time.perf_counter()
+
+    for i in range(total):
+        now[0] = i / 1000
+        message_id = f"ls_node{i % 500}@alumchat.lol/algorithms_{i}"
+        cache.check_and_add(message_id)
+        # Every id arrives again from a second neighbor
+        cache.check_and_add(message_id)
+        if (i + 1) % step == 0:
+            metrics = cache.metrics()
+            print(f"{i + 1:>10} ids  rss={current_rss():>8} KiB  entries={metrics['entries']:>6}  "
+                  f"hits={metrics['hits']}  expired={metrics['expired']}  evicted={metrics['evicted']}  "
+                  f"cache={metrics['bytes'] // 1024} KiB")
+
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed * 1e9 / (2 * total):.0f} ns per check_and_add")
+
+
+if __name__ == "__main__":
+    main()
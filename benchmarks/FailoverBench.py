@@ -0,0 +1,96 @@
+"""
+Failover time on the loopback network. After the routing tables converge,
+a node on the path of a data stream goes silent. The run reports how long
+the surviving nodes take to agree on the routes without it and how many
+messages of the stream are lost, with and without hellos.
+
+Usage: python benchmarks/FailoverBench.py [topology] [size] [hello interval] [dead interval]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+from RoutingBenchmark import expected_distances, converged
+
+
+def without(params, victim):
+    return [dict(param, costs={node: cost for node, cost in param["costs"].items() if node != victim})
+            for param in params if param["jid"] != victim]
+
+
+async def run(params, hello_interval, dead_interval, timeout=3.0):
+    params = [dict(param, hello_interval=hello_interval, dead_interval=dead_interval) for param in params]
+    network = LoopbackNetwork(latency=0.002)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    clients = {client.boundjid.full: client for client in manager.clients}
+    await manager.connect_clients()
+    while not converged(clients.values(), expected_distances(params)):
+        await asyncio.sleep(0.01)
+
+    # A stream whose first hop is not its destination
+    source, destination, victim = next(
+        (source, destination, hop)
+        for source in clients.values() for destination in source.routing_table
+        for hop in [source.select_next_hop(destination, {"type": "message", "from": source.boundjid.full})]
+        if hop != destination
+    )
+    survivors = [client for jid, client in clients.items() if jid != victim]
+    expected = expected_distances(without(params, victim))
+
+    delivered = set()
+    clients[destination].add_event_handler("routed_message", lambda message: delivered.add(message["id"]))
+    sent = []
+
+    async def stream():
+        while True:
+            message_id = f"stream_{len(sent)}"
+            sent.append(message_id)
+            await source.send_message_to(destination, {
+                "type": "message", "from": source.boundjid.full, "to": destination,
+                "hops": 0, "headers": [], "payload": "stream", "id": message_id,
+            })
+            await asyncio.sleep(0.01)
+
+    streaming = asyncio.create_task(stream())
+    await asyncio.sleep(0.1)
+    for neighbor in clients[victim].neighbors:
+        network.set_link(victim, neighbor, loss=1.0)
+    failed_at = time.perf_counter()
+    recovered = None
+    while time.perf_counter() - failed_at < timeout:
+        await asyncio.sleep(0.005)
+        if converged(survivors, expected):
+            recovered = time.perf_counter() - failed_at
+            break
+    await asyncio.sleep(0.2)
+    streaming.cancel()
+    await network.wait_idle(0.02)
+    return recovered, len(sent) - len(delivered), len(sent)
+
+
+def main():
+    topology = sys.argv[1] if len(sys.argv) > 1 else "grid"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    hello_interval = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    dead_interval = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+    params = Topologies.build(topology, size)
+    print(f"{len(params)} nodes, a node on the path of a 100 messages/s stream fails")
+    for label, hello in (("no hellos", 0.0), (f"hello {hello_interval:g}s dead {dead_interval:g}s", hello_interval)):
+        recovered, lost, sent = asyncio.run(run(params, hello, dead_interval if hello else None))
+        recovery = "not within 3s" if recovered is None else f"{recovered * 1000:.0f} ms"
+        print(f"  {label:<24} routes converged: {recovery:<14} lost {lost}/{sent} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Flooding throughput on a simulated grid mesh: how many stanzas each flooded
+message costs and how many messages per second the forwarders push, with the
+plain, hop-limited and reverse-path-forwarding modes.
+
+Usage: python benchmarks/FloodMesh.py [side] [messages]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING)
+
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+
+def grid_params(side):
+    """
+    Client parameters for a side x side grid with unit costs.
+    """
+    def name(row, column):
+        return f"n{row}_{column}@mesh.local/bench"
+
+    params = []
+    for row in range(side):
+        for column in range(side):
+            neighbors = [name(r, c) for r, c in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1))
+                         if 0 <= r < side and 0 <= c < side]
+            params.append({"jid": name(row, column), "neighbors": neighbors, "costs": {n: 1 for n in neighbors}})
+    return params
+
+
+async def run(side, messages, **options):
+    params = grid_params(side)
+    network = LoopbackNetwork()
+    clients = {}
+    for param in params:
+        clients[param["jid"]] = NetworkClient(param["jid"], "password", param["neighbors"], param["costs"],
+                                              mode="flooding", transport=network.transport(), **options)
+    destination = params[(side // 2) * side + side // 2]["jid"]
+    arrivals = []
+    receive = clients[destination].receive
+    clients[destination].receive = lambda body, sender: (arrivals.append(sender), receive(body, sender))
+
+    # Reverse path forwarding needs routes back to the origin
+    for client in clients.values():
+        for param in params:
+            if param["jid"] != client.boundjid.full:
+                client.lsdb.install(param["jid"], None, param["costs"])
+        client.compute_routing_table()
+
+    source = clients[params[0]["jid"]]
+    start = time.perf_counter()
+    for index in range(messages):
+        await source.send_message_to(destination, {
+            "type": "message", "from": source.boundjid.full, "to": destination,
+            "hops": 0, "headers": [], "payload": f"bench {index}",
+        })
+        await network.wait_idle(settle=0)
+    elapsed = time.perf_counter() - start
+    return network.sent / messages, len(arrivals) / messages, messages / elapsed
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    modes = {
+        "plain": {},
+        "hop limit": {"flood_hop_limit": 2 * (side // 2)},
+        "rpf": {"flood_rpf": True},
+    }
+    print(f"{side}x{side} grid, {messages} messages from a corner to the center")
+    for label, options in modes.items():
+        per_message, copies, rate = asyncio.run(run(side, messages, **options))
+        print(f"  {label:<10} {per_message:>8.1f} stanzas per message {copies:>5.1f} copies delivered "
+              f"{rate:>10.1f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
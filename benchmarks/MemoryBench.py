@@ -0,0 +1,110 @@
+"""
+Memory of the routing state of one node that learned a large network. A
+node with a single neighbor receives, from that neighbor, the link state
+advertisement of every node of a random topology as JSON bodies off the
+wire, then runs SPF. The run reports the memory the routing state takes,
+split by structure, and the memory of one data packet while it is handled
+and while it waits in an outbound queue.
+
+Usage: python benchmarks/MemoryBench.py [nodes] [degree]
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+import WireCodec
+from NetworkClient import NetworkClient
+from OutboundQueue import OutboundPacket
+from Transport import LoopbackNetwork
+
+JID = "n{}@alumchat.lol/algorithms"
+
+
+def deep_size(obj, seen):
+    """
+    Bytes of an object and everything it references, counting shared objects once.
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def advertisements(count, degree):
+    params = Topologies.random_graph(count, degree)
+    rename = {param["jid"]: JID.format(index) for index, param in enumerate(params)}
+    for param in params:
+        jid = rename[param["jid"]]
+        costs = {rename[neighbor]: cost for neighbor, cost in param["costs"].items()}
+        yield jid, WireCodec.encode({"type": "info", "from": jid, "to": "all", "hops": 1, "headers": [{"via": jid}],
+                                     "payload": json.dumps(costs), "id": f"ls_{jid}_1"}, WireCodec.JSON)
+
+
+async def run(count, degree):
+    own, neighbor = JID.format("self"), JID.format(0)
+    client = NetworkClient(own, "password", [neighbor], {neighbor: 1}, transport=LoopbackNetwork().transport())
+    bodies = list(advertisements(count, degree))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _, body in bodies:
+        client.receive(body, neighbor)
+    client.run_pending_spf()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    seen = set()
+    parts = {
+        "lsdb": deep_size(client.lsdb, seen),
+        "spf": deep_size(client.spf, seen),
+        "routing_table": deep_size(client.routing_table, seen),
+        "dedup": deep_size(client.received_messages, seen),
+    }
+
+    destination = JID.format(count - 1)
+    body = WireCodec.encode({"type": "message", "from": neighbor, "to": destination, "hops": 1,
+                             "headers": [{"via": neighbor}], "payload": "x" * 64, "id": "data_1"}, WireCodec.JSON)
+    packet, _ = WireCodec.decode(body)
+    queued = OutboundPacket(WireCodec.encode(packet, WireCodec.JSON), "chat", "message", 0.0, False)
+    return {
+        "nodes": len(client.link_state_db),
+        "routes": len(client.routing_table),
+        "allocated": allocated,
+        "parts": parts,
+        "packet_handled": deep_size(packet, set()),
+        "packet_queued": deep_size(queued, set()),
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    degree = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    result = asyncio.run(run(count, degree))
+    print(f"{result['nodes']} origins in the link state database, {result['routes']} routes")
+    print(f"  routing state allocated: {result['allocated'] / 2 ** 20:.1f} MiB, "
+          f"{result['allocated'] / result['nodes']:.0f} bytes per origin")
+    for name, size in result["parts"].items():
+        print(f"    {name:<14} {size / 2 ** 20:7.1f} MiB")
+    print(f"  data packet: {result['packet_handled']} bytes while handled, {result['packet_queued']} bytes queued")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Equal-cost multipath and loop-free alternates on the loopback network.
+
+Prints how many destinations of every node have more than one equal-cost
+first hop or a loop-free alternate, then compares single-path and multipath
+forwarding on two runs: the time to push flows between every pair of nodes
+over bandwidth-limited links, and the messages delivered after the first
+hop of a flow goes down, before any new link state is flooded.
+
+Usage: python benchmarks/MultipathBench.py [topology] [size]
+       python benchmarks/MultipathBench.py "nodes/grupo*.yaml"
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+PAYLOAD = "x" * 500
+
+
+def build(params, network, multipath):
+    clients = {}
+    for param in params:
+        clients[param["jid"]] = NetworkClient(param["jid"], "password", param["neighbors"], param["costs"],
+                                              transport=network.transport(), multipath=multipath)
+    link_state_db = {param["jid"]: param["costs"] for param in params}
+    for client in clients.values():
+        client.link_state_db.update(link_state_db)
+        client.compute_routing_table()
+    return clients
+
+
+def coverage(params):
+    clients = build(params, LoopbackNetwork(), True)
+    destinations = multiple = protected = 0
+    for client in clients.values():
+        for destination in client.routing_table:
+            equal, alternates = client.multipath_hops(destination)
+            destinations += 1
+            multiple += len(equal) > 1
+            protected += len(equal) > 1 or bool(alternates)
+    return destinations, multiple, protected
+
+
+def message(source, destination, index):
+    return {"type": "message", "from": source, "to": destination, "hops": 0, "headers": [],
+            "payload": PAYLOAD, "id": f"{source}_{destination}_{index}"}
+
+
+async def throughput(params, multipath, per_pair):
+    network = LoopbackNetwork(latency=0.001, bandwidth=200_000)
+    clients = build(params, network, multipath)
+    delivered = []
+    for client in clients.values():
+        client.add_event_handler("routed_message", delivered.append)
+
+    start = time.perf_counter()
+    for index in range(per_pair):
+        for source in clients.values():
+            for destination in clients:
+                if destination != source.boundjid.full:
+                    await source.send_message_to(destination, message(source.boundjid.full, destination, index))
+    await network.wait_idle(0.02)
+    return len(delivered), time.perf_counter() - start
+
+
+async def failover(params, multipath, messages):
+    network = LoopbackNetwork(latency=0.001)
+    clients = build(params, network, multipath)
+    # A flow whose destination has an alternate to its current first hop
+    for source in clients.values():
+        for destination in source.routing_table:
+            equal, alternates = source.multipath_hops(destination)
+            if len(equal) > 1 or alternates:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+
+    delivered = []
+    clients[destination].add_event_handler("routed_message", delivered.append)
+    failed = source.select_next_hop(destination, message(source.boundjid.full, destination, 0))
+    # The link dies and presence reports it, the link state is not flooded yet
+    network.set_link(source.boundjid.full, failed, loss=1.0)
+    source.neighbor_down(failed)
+    for index in range(messages):
+        await source.send_message_to(destination, message(source.boundjid.full, destination, index))
+    await network.wait_idle(0.02)
+    return len(delivered)
+
+
+def main():
+    topology = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nodes", "grupo*.yaml")
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    params = Topologies.build(topology, size)
+    destinations, multiple, protected = coverage(params)
+    print(f"{len(params)} nodes: {multiple}/{destinations} routes with several equal-cost hops, "
+          f"{protected}/{destinations} with a backup hop")
+    for multipath in (False, True):
+        label = "multipath" if multipath else "single path"
+        delivered, elapsed = asyncio.run(throughput(params, multipath, 20))
+        kept = asyncio.run(failover(params, multipath, 100))
+        print(f"  {label:<12} {delivered} messages in {elapsed:.2f}s ({delivered / elapsed:.0f}/s), "
+              f"{kept}/100 delivered after the first hop failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Outbound queue stress test on a simulated chain A - B - C where the B - C
+link is the bottleneck. A offers data to C at a multiple of what that link
+can carry while also re-advertising its link state, and the run reports how
+deep B's queue gets, the bytes it holds, and the latency and delivery of
+data and link state for an unbounded queue and each drop policy.
+
+Usage: python benchmarks/QueueOverload.py [overload] [seconds]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING)
+
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B, C = "a@chain.local/bench", "b@chain.local/bench", "c@chain.local/bench"
+PAYLOAD = "x" * 1000
+# Packets per second the B - C link carries
+LINK_RATE = 200
+
+
+async def run(overload, seconds, **options):
+    network = LoopbackNetwork()
+    costs = {A: {B: 1}, B: {A: 1, C: 1}, C: {B: 1}}
+    clients = {jid: NetworkClient(jid, "password", list(costs[jid]), costs[jid], mode="lsr",
+                                  transport=network.transport(), **options)
+               for jid in costs}
+    for client in clients.values():
+        client.link_state_db.update(costs)
+        client.compute_routing_table()
+
+    source = clients[A]
+    body = {"type": "message", "from": A, "to": C, "hops": 0, "headers": [], "payload": PAYLOAD}
+    size = len(source.encode_for(B, dict(body, id="sizing", headers=[{"via": A}, {"via": B}])))
+    network.set_link(B, C, bandwidth=LINK_RATE * size)
+
+    latencies = []
+    clients[C].add_event_handler("routed_message", lambda message: latencies.append(
+        time.perf_counter() - float(message["id"].split("_")[1])))
+
+    peak_depth = peak_bytes = 0
+    queues = clients[B].outbound
+    rate = LINK_RATE * overload
+    tick = 0.01
+    sent = 0
+    advertised = 0.0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        due = int((time.perf_counter() - start) * rate)
+        for _ in range(due - sent):
+            await source.send_message_to(C, dict(body, headers=[], id=f"load_{time.perf_counter()}_{sent}"))
+            sent += 1
+        if time.perf_counter() - advertised >= 0.1:
+            advertised = time.perf_counter()
+            await source.share_link_state()
+        peak_depth = max(peak_depth, len(queues))
+        peak_bytes = max(peak_bytes, sum(len(packet.body) for queue in queues.queues.values() for packet in queue))
+        await asyncio.sleep(tick)
+    await network.wait_idle(settle=0.05)
+
+    entry = clients[C].lsdb.entries.get(A)
+    latencies.sort()
+    return {
+        "sent": sent,
+        "delivered": len(latencies),
+        "peak_depth": peak_depth,
+        "peak_kib": peak_bytes / 1024,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        "info_dropped": queues.dropped.get("info", 0),
+        "info_lag": source.sequence_number - entry.sequence if entry else None,
+    }
+
+
+def main():
+    overload = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    configs = {
+        "unbounded": {"queue_capacity": 10 ** 9},
+        "tail": {"queue_capacity": 64, "queue_policy": "tail"},
+        "oldest": {"queue_capacity": 64, "queue_policy": "oldest"},
+        "priority": {"queue_capacity": 64, "queue_policy": "priority"},
+    }
+    print(f"{overload}x overload of a {LINK_RATE} packets/s link for {seconds:g}s")
+    for label, options in configs.items():
+        result = asyncio.run(run(overload, seconds, **options))
+        print(f"  {label:<10} delivered {result['delivered']:>5}/{result['sent']:<5} "
+              f"peak queue {result['peak_depth']:>5} ({result['peak_kib']:>7.1f} KiB)  "
+              f"latency p50 {result['p50'] * 1000:>7.1f} ms p95 {result['p95'] * 1000:>7.1f} ms  "
+              f"info dropped {result['info_dropped']:>3}, versions behind {result['info_lag']}")
+
+
+if __name__ == "__main__":
+    main()
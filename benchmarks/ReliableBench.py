@@ -0,0 +1,85 @@
+"""
+Reliable delivery over lossy links. After the routing tables converge on
+clean links, every link starts dropping packets and one node sends a stream
+of messages to the farthest node, once as plain data messages and once
+through send_reliable. The run reports the delivery ratio, latency and hops
+of each, and the retransmissions reliable delivery needed.
+
+Usage: python benchmarks/ReliableBench.py [topology] [size] [loss] [messages]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+from ReliableDelivery import DeliveryError
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+from RoutingBenchmark import expected_distances, converged
+
+
+async def run(params, loss, messages, reliable):
+    network = LoopbackNetwork(latency=0.002, seed=1)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    clients = {client.boundjid.full: client for client in manager.clients}
+    await manager.connect_clients()
+    while not converged(clients.values(), expected_distances(params)):
+        await asyncio.sleep(0.01)
+    for client in clients.values():
+        for neighbor in client.neighbors:
+            network.set_link(client.boundjid.full, neighbor, loss=loss, symmetric=False)
+
+    source = manager.clients[0]
+    destination = max(source.routing_table, key=lambda node: source.routing_table[node][1])
+    latencies, hops = [], []
+    if reliable:
+        futures = []
+        for index in range(messages):
+            futures.append(source.send_reliable(destination, f"reliable {index}"))
+            await asyncio.sleep(0.002)
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if not isinstance(result, DeliveryError):
+                latencies.append(result.latency)
+                hops.append(result.hops)
+        retransmitted = source.reliable.retransmitted
+    else:
+        clients[destination].add_event_handler("routed_message", lambda message: (
+            latencies.append(time.perf_counter() - float(message["payload"])), hops.append(message["hops"])))
+        for index in range(messages):
+            await source.send_message_to(destination, {
+                "type": "message", "from": source.boundjid.full, "to": destination,
+                "hops": 0, "headers": [], "payload": str(time.perf_counter()), "id": f"plain_{index}",
+            })
+            await asyncio.sleep(0.002)
+        await network.wait_idle(0.05)
+        retransmitted = 0
+    return len(latencies), latencies, hops, retransmitted
+
+
+def main():
+    topology = sys.argv[1] if len(sys.argv) > 1 else "grid"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    loss = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    messages = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+    params = Topologies.build(topology, size)
+    print(f"{len(params)} nodes, {loss:.0%} loss on every link, {messages} messages to the farthest node")
+    for label, reliable in (("plain", False), ("reliable", True)):
+        delivered, latencies, hops, retransmitted = asyncio.run(run(params, loss, messages, reliable))
+        latency = (f"latency p50 {statistics.median(latencies) * 1000:.1f} ms "
+                   f"p95 {sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms") if latencies else ""
+        hop_count = f", {statistics.mean(hops):.1f} hops" if hops else ""
+        print(f"  {label:<9} delivered {delivered}/{messages}, {latency}{hop_count}, "
+              f"{retransmitted} retransmissions")
+
+
+if __name__ == "__main__":
+    main()
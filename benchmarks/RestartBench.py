@@ -0,0 +1,92 @@
+"""
+Warm restart from a link state snapshot. A converged network keeps running
+while one node is replaced by a fresh client with the same JID, which
+immediately starts sending to the farthest node. The run reports the time
+from the restart, client construction included, to the first delivery with
+and without a snapshot, and the snapshot size and load time.
+
+Usage: python benchmarks/RestartBench.py [topology] [size] [refresh interval]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Sends before the routes are known log "No route" errors on purpose
+logging.basicConfig(level=logging.CRITICAL)
+
+import Topologies
+import LinkStateSnapshot
+from NetworkClient import NetworkClient, options_from_config
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+from RoutingBenchmark import expected_distances, converged
+
+
+async def run(params, refresh, snapshot, timeout=30.0):
+    params = [dict(param, lsa_max_age=10 * refresh, lsa_refresh_interval=refresh) for param in params]
+    network = LoopbackNetwork(latency=0.002)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    clients = {client.boundjid.full: client for client in manager.clients}
+    await manager.connect_clients()
+    while not converged(clients.values(), expected_distances(params)):
+        await asyncio.sleep(0.01)
+
+    restarted = params[len(params) // 2]
+    old = clients[restarted["jid"]]
+    destination = max(old.routing_table, key=lambda node: old.routing_table[node][1])
+    path = None
+    size = load_time = 0
+    if snapshot:
+        path = os.path.join(tempfile.mkdtemp(), "node.lsdb")
+        old.snapshot_file = path
+        size = old.save_snapshot()
+        load_start = time.perf_counter()
+        LinkStateSnapshot.load(path)
+        load_time = time.perf_counter() - load_start
+
+    delivered = asyncio.Event()
+    clients[destination].add_event_handler("routed_message", lambda message: delivered.set())
+    # The old client goes away, its replacement takes over the JID on the network
+    start = time.perf_counter()
+    client = NetworkClient(restarted["jid"], restarted["password"], restarted["neighbors"], restarted["costs"],
+                           transport=network.transport(), snapshot_file=path, **options_from_config(restarted))
+    routing = asyncio.create_task(client.start_routing())
+    index = 0
+    while not delivered.is_set() and time.perf_counter() - start < timeout:
+        await client.send_message_to(destination, {
+            "type": "message", "from": client.boundjid.full, "to": destination,
+            "hops": 0, "headers": [], "payload": "after restart", "id": f"restart_{index}",
+        })
+        index += 1
+        try:
+            await asyncio.wait_for(delivered.wait(), 0.005)
+        except asyncio.TimeoutError:
+            pass
+    first_delivery = time.perf_counter() - start if delivered.is_set() else None
+    routing.cancel()
+    return first_delivery, size, load_time
+
+
+def main():
+    topology = sys.argv[1] if len(sys.argv) > 1 else "grid"
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    refresh = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    params = Topologies.build(topology, size)
+    print(f"{len(params)} nodes, link states refreshed every {refresh:g}s")
+    for snapshot in (False, True):
+        first_delivery, file_size, load_time = asyncio.run(run(params, refresh, snapshot))
+        label = "snapshot" if snapshot else "cold start"
+        delivery = "none within 30s" if first_delivery is None else f"{first_delivery * 1000:.1f} ms"
+        details = f", {file_size} byte snapshot loaded in {load_time * 1000:.2f} ms" if snapshot else ""
+        print(f"  {label:<10} restart to first delivery: {delivery}{details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Routing benchmark over the in-process loopback network.
+
+For each mode it starts every node of a topology, measures the time until all
+routing tables agree with the global shortest paths, counts control traffic,
+SPF runs and SPF CPU time per node, then sends data messages between random
+pairs and records delivery latency and hops. Results are printed as JSON so
+runs can be compared over time.
+
+Usage:
+    python benchmarks/RoutingBenchmark.py --topology grid --size 6
+    python benchmarks/RoutingBenchmark.py --topology "nodes/grupo*.yaml" --mode lsr flooding
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import statistics
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import WireCodec
+import Topologies
+from SPFEngine import SPFEngine
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+
+CONTROL_TYPES = ("echo", "info")
+
+
+class MeteredNetwork(LoopbackNetwork):
+    """
+    Loopback network that also counts packets and bytes per sender and packet type.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.per_node = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+
+    def deliver(self, from_jid, to_jid, body):
+        try:
+            packet_type = WireCodec.decode(body)[0].get("type", "unknown")
+        except WireCodec.DecodeError:
+            packet_type = "unknown"
+        counter = self.per_node[from_jid][packet_type]
+        counter[0] += 1
+        counter[1] += len(body)
+        super().deliver(from_jid, to_jid, body)
+
+
+def expected_distances(params):
+    """
+    Global shortest path distances from every node, the reference for convergence.
+    """
+    link_state_db = {param["jid"]: param["costs"] for param in params}
+    expected = {}
+    for param in params:
+        engine = SPFEngine(param["jid"])
+        engine.load(link_state_db)
+        expected[param["jid"]] = {node: cost for node, (_, cost) in engine.routing_table.items()}
+    return expected
+
+
+def converged(clients, expected):
+    return all(
+        {node: cost for node, (_, cost) in client.routing_table.items()} == expected[client.boundjid.full]
+        for client in clients
+    )
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "mean": statistics.fmean(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+async def run_mode(params, mode, args):
+    params = [dict(param, mode=mode) for param in params]
+    network = MeteredNetwork(latency=args.latency, loss=args.loss, seed=args.seed)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    clients = manager.clients
+    expected = expected_distances(params)
+
+    # Convergence
+    start = time.perf_counter()
+    startup = asyncio.create_task(manager.connect_clients())
+    convergence_time = None
+    while time.perf_counter() - start < args.timeout:
+        await asyncio.sleep(args.poll)
+        if mode == "lsr" and startup.done() and converged(clients, expected):
+            convergence_time = time.perf_counter() - start
+            break
+        if mode != "lsr" and startup.done():
+            break
+    await startup
+    await network.wait_idle()
+
+    # Data traffic
+    rng = random.Random(args.seed)
+    sent_at = {}
+    deliveries = {}
+
+    def on_delivery(message):
+        if message["id"] not in deliveries:
+            deliveries[message["id"]] = (time.perf_counter() - sent_at[message["id"]], message["hops"])
+
+    for client in clients:
+        client.add_event_handler("routed_message", on_delivery)
+    data_start = network.sent
+    for index in range(args.messages):
+        source, destination = rng.sample(clients, 2)
+        message_id = f"bench_{mode}_{index}"
+        sent_at[message_id] = time.perf_counter()
+        await source.send_message_to(destination.boundjid.full, {
+            "type": "message", "from": source.boundjid.full, "to": destination.boundjid.full,
+            "hops": 0, "headers": [], "payload": f"benchmark message {index}", "id": message_id,
+        })
+    await network.wait_idle()
+
+    control = {}
+    for client in clients:
+        counters = network.per_node[client.boundjid.full]
+        control[client.boundjid.full] = {
+            "control_messages": sum(counters[packet_type][0] for packet_type in CONTROL_TYPES),
+            "control_bytes": sum(counters[packet_type][1] for packet_type in CONTROL_TYPES),
+            "spf_runs": client.spf_scheduler.runs,
+            "spf_avoided": client.spf_scheduler.avoided,
+            "spf_cpu_seconds": client.spf_scheduler.run_time,
+        }
+
+    return {
+        "mode": mode,
+        "convergence_seconds": convergence_time,
+        "per_node": {
+            key: summarize([values[key] for values in control.values()])
+            for key in ("control_messages", "control_bytes", "spf_runs", "spf_avoided", "spf_cpu_seconds")
+        },
+        "nodes": control if args.per_node else None,
+        "data": {
+            "sent": args.messages,
+            "delivered": len(deliveries),
+            "stanzas": network.sent - data_start,
+            "latency_seconds": summarize([latency for latency, _ in deliveries.values()]),
+            "hops": summarize([hops for _, hops in deliveries.values()]),
+        },
+    }
+
+
+async def main_async(args):
+    params = Topologies.build(args.topology, args.size, seed=args.seed)
+    results = {
+        "topology": args.topology,
+        "size": args.size,
+        "nodes": len(params),
+        "links": sum(len(param["neighbors"]) for param in params) // 2,
+        "latency": args.latency,
+        "loss": args.loss,
+        "timestamp": time.time(),
+        "runs": [],
+    }
+    for mode in args.mode:
+        results["runs"].append(await run_mode(params, mode, args))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing convergence and overhead benchmark")
+    parser.add_argument("--topology", default="random", help="random, grid, scale-free or a glob of node YAML files")
+    parser.add_argument("--size", type=int, default=30, help="Number of nodes, or the side for grid")
+    parser.add_argument("--mode", nargs="+", default=["lsr", "flooding"], choices=["lsr", "flooding"])
+    parser.add_argument("--messages", type=int, default=100, help="Data messages sent after convergence")
+    parser.add_argument("--latency", type=float, default=0.002, help="Link latency in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="Link loss probability")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on convergence after this many seconds")
+    parser.add_argument("--poll", type=float, default=0.01, help="Seconds between convergence checks")
+    parser.add_argument("--per-node", action="store_true", help="Include every node in the output")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Check the incremental SPFEngine against a full Dijkstra recomputation under
+random topology churn and compare how long both take.
+
+Usage: python benchmarks/SPFChurn.py [nodes] [changes]
+"""
+import os
+import sys
+import heapq
+import random
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SPFEngine import SPFEngine
+
+
+def full_routing_table(root, link_state_db):
+    """
+    Reference implementation, same algorithm NetworkClient.compute_routing_table used originally.
+    """
+    routing_table = {}
+    pq = [(0, root)]
+    distances = {root: 0}
+    previous_nodes = {}
+
+    while pq:
+        current_distance, current_node = heapq.heappop(pq)
+        if current_distance > distances.get(current_node, float('inf')):
+            continue
+        for neighbor, cost in link_state_db.get(current_node, {}).items():
+            distance = current_distance + cost
+            if distance < distances.get(neighbor, float('inf')):
+                distances[neighbor] = distance
+                heapq.heappush(pq, (distance, neighbor))
+                previous_nodes[neighbor] = current_node
+
+    for node in distances:
+        if node == root:
+            continue
+        path = []
+        current = node
+        while current != root:
+            path.insert(0, current)
+            current = previous_nodes.get(current)
+            if current is None:
+                break
+        if path:
+            routing_table[node] = (path[0], distances[node])
+    return routing_table
+
+
+def random_topology(nodes, degree, rng, integer_costs):
+    """
+    Build a random connected undirected topology as a link state database.
+    :param nodes: Number of nodes.
+    :param degree: Average number of neighbors per node.
+    :param rng: Random generator.
+    :param integer_costs: Use small integer costs (many ties) instead of unique float costs.
+    """
+    cost = (lambda: rng.randint(1, 5)) if integer_costs else (lambda: rng.random())
+    link_state_db = {f"n{i}": {} for i in range(nodes)}
+    # Spanning chain keeps the graph connected
+    for i in range(1, nodes):
+        j = rng.randrange(i)
+        link_state_db[f"n{i}"][f"n{j}"] = link_state_db[f"n{j}"][f"n{i}"] = cost()
+    for _ in range(nodes * (degree - 2) // 2):
+        a, b = rng.sample(range(nodes), 2)
+        link_state_db[f"n{a}"][f"n{b}"] = link_state_db[f"n{b}"][f"n{a}"] = cost()
+    return link_state_db, cost
+
+
+def churn(link_state_db, rng, cost):
+    """
+    Produce a new cost map for one random origin: change, remove or add a link.
+    """
+    origin = rng.choice(list(link_state_db))
+    costs = dict(link_state_db[origin])
+    action = rng.random()
+    if costs and action < 0.5:
+        costs[rng.choice(list(costs))] = cost()
+    elif costs and action < 0.7:
+        del costs[rng.choice(list(costs))]
+    else:
+        costs[rng.choice(list(link_state_db))] = cost()
+    costs.pop(origin, None)
+    return origin, costs
+
+
+def run(nodes, changes, integer_costs, seed=1):
+    rng = random.Random(seed)
+    link_state_db, cost = random_topology(nodes, 4, rng, integer_costs)
+    engine = SPFEngine("n0")
+    engine.load(link_state_db)
+    routing_table = engine.routing_table
+    full_time = incremental_time = 0.0
+
+    for _ in range(changes):
+        origin, costs = churn(link_state_db, rng, cost)
+        old_costs = link_state_db[origin]
+        link_state_db[origin] = costs
+
+        start = time.perf_counter()
+        expected = full_routing_table("n0", link_state_db)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        diff = engine.update(origin, old_costs, costs)
+        incremental_time += time.perf_counter() - start
+
+        for node, route in diff.items():
+            if route is None:
+                routing_table.pop(node, None)
+            else:
+                routing_table[node] = route
+
+        if integer_costs:
+            # Ties make next hops ambiguous, only distances must match
+            assert {n: d for n, (_, d) in routing_table.items()} == {n: d for n, (_, d) in expected.items()}
+        else:
+            assert routing_table == expected, f"Mismatch after change on {origin}"
+        assert routing_table == engine.routing_table
+
+    return full_time, incremental_time, engine
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    changes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    for integer_costs in (False, True):
+        full_time, incremental_time, engine = run(nodes, changes, integer_costs)
+        label = "integer costs" if integer_costs else "unique costs"
+        print(f"{label}: {nodes} nodes, {changes} changes, outputs match")
+        print(f"  full recomputation: {full_time * 1000 / changes:.3f} ms per change")
+        print(f"  incremental:        {incremental_time * 1000 / changes:.3f} ms per change "
+              f"({engine.incremental_runs} incremental, {engine.full_runs - 1} full fallbacks)")
+
+
+if __name__ == "__main__":
+    main()
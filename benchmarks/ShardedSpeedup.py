@@ -0,0 +1,41 @@
+"""
+Convergence time of a large simulated network with the sharded manager, for
+an increasing number of worker processes.
+
+Usage: python benchmarks/ShardedSpeedup.py [nodes] [workers...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import Topologies
+from ShardedNetworkManager import ShardedNetworkManager
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = [int(count) for count in sys.argv[2:]] or [1, 2, 4, 8]
+    params = Topologies.random_graph(nodes)
+    print(f"{nodes} nodes, {sum(len(p['neighbors']) for p in params) // 2} links, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'converged s':>12} {'wall s':>8} {'speedup':>8} {'remote packets':>15}")
+
+    baseline = None
+    for count in workers:
+        manager = ShardedNetworkManager(params, workers=count, latency=0.001)
+        start = time.perf_counter()
+        results = manager.run(timeout=600)
+        wall = time.perf_counter() - start
+        converged = results["converged_seconds"]
+        # Timed from the moment every shard starts launching its clients, up to the shard poll interval late
+        if baseline is None:
+            baseline = converged
+        speedup = f"{baseline / converged:>8.2f}" if converged and baseline else f"{'n/a':>8}"
+        remote = sum(shard["remote_sent"] for shard in results["shards"])
+        print(f"{count:>8} {converged if converged is not None else float('nan'):>12.2f} {wall:>8.2f} {speedup} {remote:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Startup time of a whole network on the loopback transport: client
+construction, launch until every node is ready (neighbors probed, first link
+state sent), and until every node has a route to every other one.
+
+Usage: python benchmarks/StartupBench.py [topology] [sizes...]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.WARNING)
+
+import Topologies
+from Transport import LoopbackNetwork
+from NetworkManager import NetworkManager
+
+
+async def run(params, timeout=120.0):
+    start = time.perf_counter()
+    manager = NetworkManager(params, LoopbackNetwork(latency=0.001))
+    manager.initialize_clients()
+    constructed = time.perf_counter() - start
+    ready = await manager.connect_clients()
+    routed = await manager.wait_routes(timeout)
+    return constructed, ready, time.perf_counter() - start if routed else None
+
+
+def main():
+    topology = sys.argv[1] if len(sys.argv) > 1 else "random"
+    sizes = [int(size) for size in sys.argv[2:]] or [10, 100, 1000]
+    for size in sizes:
+        params = Topologies.build(topology, size)
+        constructed, ready, routed = asyncio.run(run(params))
+        ready = "timed out" if ready is None else f"{ready:.2f}s"
+        routed = "timed out" if routed is None else f"{routed:.2f}s"
+        print(f"{len(params):>5} nodes: constructed in {constructed:.2f}s, all ready {ready} after launch, "
+              f"all routes {routed} from the start")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Topologies for the benchmarks, as NetworkManager client parameter lists.
+"""
+import glob
+import random
+
+DOMAIN = "bench.local/routing"
+
+
+def node_jid(index):
+    return f"n{index}@{DOMAIN}"
+
+
+def _params(edges, count, mode):
+    neighbors = {node_jid(i): {} for i in range(count)}
+    for a, b, cost in edges:
+        neighbors[node_jid(a)][node_jid(b)] = cost
+        neighbors[node_jid(b)][node_jid(a)] = cost
+    return [
+        {"jid": jid, "password": "password", "neighbors": list(costs), "costs": costs, "mode": mode}
+        for jid, costs in neighbors.items()
+    ]
+
+
+def random_graph(count, degree=4, mode="lsr", seed=1, max_cost=5):
+    """
+    Connected random graph: a random spanning tree plus extra random links.
+    """
+    rng = random.Random(seed)
+    edges = [(i, rng.randrange(i), rng.randint(1, max_cost)) for i in range(1, count)]
+    for _ in range(count * max(degree - 2, 0) // 2):
+        a, b = rng.sample(range(count), 2)
+        edges.append((a, b, rng.randint(1, max_cost)))
+    return _params(edges, count, mode)
+
+
+def grid(side, mode="lsr", seed=1, max_cost=1):
+    """
+    side x side grid.
+    """
+    rng = random.Random(seed)
+    edges = []
+    for row in range(side):
+        for column in range(side):
+            node = row * side + column
+            if column + 1 < side:
+                edges.append((node, node + 1, rng.randint(1, max_cost)))
+            if row + 1 < side:
+                edges.append((node, node + side, rng.randint(1, max_cost)))
+    return _params(edges, side * side, mode)
+
+
+def scale_free(count, links=2, mode="lsr", seed=1, max_cost=5):
+    """
+    Barabasi-Albert preferential attachment graph.
+    """
+    rng = random.Random(seed)
+    edges = []
+    # Every endpoint appears once per link, so sampling it is sampling by degree
+    endpoints = []
+    for node in range(1, min(links + 1, count)):
+        edges.append((node, 0, rng.randint(1, max_cost)))
+        endpoints += [node, 0]
+    for node in range(links + 1, count):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(endpoints))
+        for target in targets:
+            edges.append((node, target, rng.randint(1, max_cost)))
+            endpoints += [node, target]
+    return _params(edges, count, mode)
+
+
+def from_yaml(pattern, mode=None):
+    """
+    Node config files like the ones in nodes/. Neighbors without a config file are left out.
+    """
+    import yaml
+    configs = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'r') as file:
+            configs.append(yaml.safe_load(file))
+    known = {config["jid"] for config in configs}
+    params = []
+    for config in configs:
+        neighbors = [neighbor for neighbor in config["neighbors"] if neighbor in known]
+        params.append({
+            "jid": config["jid"],
+            "password": config.get("password", ""),
+            "neighbors": neighbors,
+            "costs": {neighbor: config.get("costs", {}).get(neighbor, 1) for neighbor in neighbors},
+            "mode": mode or config.get("mode", "lsr"),
+        })
+    return params
+
+
+def build(kind, size, mode="lsr", seed=1):
+    """
+    Build a topology by name: random, grid (size is the side), scale-free, or a glob of YAML files.
+    """
+    if kind == "random":
+        return random_graph(size, mode=mode, seed=seed)
+    if kind == "grid":
+        return grid(size, mode=mode, seed=seed)
+    if kind == "scale-free":
+        return scale_free(size, mode=mode, seed=seed)
+    return from_yaml(kind, mode=mode)
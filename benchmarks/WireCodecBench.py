@@ -0,0 +1,60 @@
+"""
+Encode/decode time and body size of the JSON and binary wire formats for the
+packet types in use: echo, info and message.
+
+Usage: python benchmarks/WireCodecBench.py [iterations]
+"""
+import os
+import sys
+import json
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import WireCodec
+
+
+def jid(name):
+    return f"{name}j4tcha21881@alumchat.lol/algorithms"
+
+
+def sample_packets():
+    path = [{"via": jid(name)} for name in "aifdeg"]
+    return {
+        "echo": {
+            "type": "echo", "from": jid("a"), "to": jid("b"), "hops": 0, "headers": [],
+            "payload": str(time.time()), "id": "3f2b8c1e-8d4e-4a8e-9d4b-5b8f0c2d7e11",
+        },
+        "info": {
+            "type": "info", "from": jid("d"), "to": "all", "hops": 3, "headers": path[:3],
+            "payload": json.dumps({jid(name): cost for name, cost in zip("fice", (1, 6, 5, 1))}),
+            "id": f"ls_{jid('d')}_1729270000",
+        },
+        "message": {
+            "type": "message", "from": jid("a"), "to": jid("g"), "hops": 6, "headers": path,
+            "payload": "Test message from A to G", "id": "9a1d7c55-2f0e-4a43-8a8b-1f3c4e5d6a7b",
+        },
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'packet':<8} {'codec':<7} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for name, packet in sample_packets().items():
+        for codec in (WireCodec.JSON, WireCodec.BINARY):
+            body = WireCodec.encode(packet, codec)
+            decoded, detected = WireCodec.decode(body)
+            assert detected == codec
+            if name == "info":
+                assert WireCodec.decode(WireCodec.encode(decoded))[0]["payload"] == packet["payload"]
+            else:
+                assert decoded == packet
+            encode_time = timeit.timeit(lambda: WireCodec.encode(packet, codec), number=iterations)
+            decode_time = timeit.timeit(lambda: WireCodec.decode(body), number=iterations)
+            print(f"{name:<8} {codec:<7} {len(body.encode()):>6} "
+                  f"{encode_time * 1e6 / iterations:>10.2f} {decode_time * 1e6 / iterations:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
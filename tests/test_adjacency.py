@@ -0,0 +1,44 @@
+import json
+
+import WireCodec
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B, C, D = (f"{name}@alumchat.lol/algorithms" for name in "abcd")
+
+
+def client(**options):
+    network = LoopbackNetwork()
+    sent = []
+    network.deliver = lambda from_jid, to_jid, body: sent.append((to_jid, WireCodec.decode(body)[0]))
+    node = NetworkClient(A, "password", [B, C, D], {B: 1, C: 1, D: 1}, transport=network.transport(), **options)
+    return node, sent
+
+
+def test_presence_only_tracked_with_failure_detection():
+    # slixmpp registers handlers of its own for both events
+    plain, _ = client()
+    detecting, _ = client(hello_interval=1.0)
+    for event in ("presence_unavailable", "presence_available"):
+        assert detecting.event_handled(event) == plain.event_handled(event) + 1
+
+
+def test_neighbor_coming_back_gets_our_link_state():
+    node, sent = client(hello_interval=1.0)
+    node.handle_link_state({"type": "info", "from": C, "to": "all", "hops": 0, "headers": [],
+                            "payload": json.dumps({A: 1}), "id": f"ls_{C}_5"}, C)
+    sent.clear()
+    # B was never withdrawn, nothing changes locally but B still needs the whole database
+    node.adjacency_up(B)
+    advertisements = {message["from"]: message for to_jid, message in sent if to_jid == B}
+    assert set(advertisements) == {A, C}
+    assert json.loads(advertisements[A]["payload"]) == node.costs
+    assert advertisements[A]["id"] == f"ls_{A}_{node.sequence_number}"
+
+
+def test_floods_skip_neighbors_that_are_down():
+    node, sent = client(mode="flooding")
+    node.neighbor_down(C)
+    node.flood({"type": "message", "from": A, "to": "x@alumchat.lol/algorithms", "hops": 0, "headers": [],
+                "payload": "hi", "id": "flood_1"}, A)
+    assert sorted(to_jid for to_jid, _ in sent) == [B, D]
@@ -0,0 +1,51 @@
+import asyncio
+
+import WireCodec
+from NetworkClient import NetworkClient
+from OutboundQueue import OutboundQueues, OLDEST
+from Transport import LoopbackNetwork
+
+OWN = "a@alumchat.lol/algorithms"
+PEER = "b@alumchat.lol/algorithms"
+
+
+def packet(destination, payload):
+    return WireCodec.encode({"type": "message", "from": PEER, "to": destination, "hops": 1,
+                             "headers": [{"via": PEER}], "payload": payload, "id": payload})
+
+
+def test_batches_only_accepted_from_peers_that_announced_them():
+    client = NetworkClient(OWN, "password", [PEER], {PEER: 1}, transport=LoopbackNetwork().transport())
+    delivered = []
+    client.add_event_handler("routed_message", lambda message: delivered.append(message["payload"]))
+    batch = WireCodec.encode_batch([packet(OWN, "one"), packet(OWN, "two")])
+
+    client.receive(batch, PEER)
+    assert PEER not in client.peer_batching
+    assert client.metrics.counters[("packets_dropped", "invalid")] == 1
+
+    client.receive(WireCodec.encode({"type": "echo", "from": PEER, "to": OWN, "hops": 0, "headers": [],
+                                     "payload": "0", "id": "probe", "codecs": [WireCodec.BATCH]}), PEER)
+    client.receive(batch, PEER)
+    assert client.metrics.counters[("packets_received", WireCodec.BATCH)] == 1
+
+
+def test_queued_bytes_follow_the_queue():
+    sent = []
+
+    async def run():
+        queues = OutboundQueues(lambda to_jid, body, msg_type: sent.append(body), capacity=3, workers=1,
+                                policy=OLDEST, batch_window=10.0, batch_bytes=10, combine=WireCodec.encode_batch)
+        for body in ("aaa", "b", "cc", "dddd"):
+            queues.put(PEER, body, batchable=True)
+        # The full queue dropped its oldest packet
+        assert queues.queued_bytes[PEER] == 7 and not sent
+        # Reaching batch_bytes sends without waiting for the window
+        queues.put(PEER, "eeeee", batchable=True)
+        await asyncio.sleep(0.01)
+        queues.stop()
+        return queues
+
+    queues = asyncio.run(run())
+    assert sent == [WireCodec.encode_batch(["cc", "dddd"]), "eeeee"]
+    assert PEER not in queues.queued_bytes
@@ -0,0 +1,53 @@
+from DuplicateCache import DuplicateCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_duplicates_within_the_ttl():
+    clock = Clock()
+    cache = DuplicateCache(max_entries=10, ttl=5.0, clock=clock)
+    assert not cache.check_and_add("a")
+    clock.now += 4.9
+    assert "a" in cache
+    assert cache.check_and_add("a")
+    assert cache.metrics()["hits"] == 1 and cache.metrics()["misses"] == 1
+
+
+def test_ids_expire_after_the_ttl():
+    clock = Clock()
+    cache = DuplicateCache(max_entries=10, ttl=5.0, clock=clock)
+    cache.check_and_add("a")
+    clock.now += 2.0
+    cache.check_and_add("b")
+    clock.now += 3.0
+    # Expired for lookups right away, removed on the next insert
+    assert "a" not in cache and "b" in cache
+    assert len(cache) == 2
+    # A repeat does not renew the time an id was first seen
+    assert cache.check_and_add("b")
+    assert len(cache) == 1 and cache.expired == 1
+    assert not cache.check_and_add("a")
+    clock.now += 2.0
+    assert not cache.check_and_add("c")
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.expired == 2
+
+
+def test_oldest_ids_are_evicted_when_full():
+    clock = Clock()
+    cache = DuplicateCache(max_entries=3, ttl=60.0, clock=clock)
+    for message_id in "abcd":
+        clock.now += 1.0
+        cache.check_and_add(message_id)
+    assert list(cache.entries) == ["b", "c", "d"]
+    assert cache.evicted == 1 and cache.expired == 0
+    # An evicted id is new again
+    assert not cache.check_and_add("a")
+    assert list(cache.entries) == ["c", "d", "a"]
+    assert cache.metrics()["entries"] == 3 and cache.metrics()["evicted"] == 2
@@ -0,0 +1,53 @@
+from EventLog import EventLog
+
+
+def filled(count, capacity=5):
+    log = EventLog("node", level="INFO", capacity=capacity)
+    for index in range(count):
+        log.log("INFO", "event %s", index, index=index)
+    return log
+
+
+def indexes(entries):
+    return [entry.fields["index"] for entry in entries]
+
+
+def test_cursor_reads_only_new_entries():
+    log = filled(3)
+    entries, cursor = log.read()
+    assert indexes(entries) == [0, 1, 2] and cursor == 3
+    assert log.read(cursor) == ([], 3)
+    log.log("INFO", "event %s", 3, index=3)
+    entries, cursor = log.read(cursor)
+    assert indexes(entries) == [3] and cursor == 4
+
+
+def test_cursor_older_than_the_oldest_entry_skips_what_was_dropped():
+    log = filled(12)
+    # Entries 0 to 6 were pushed out of the buffer
+    entries, cursor = log.read(2)
+    assert indexes(entries) == [7, 8, 9, 10, 11] and cursor == 12
+    assert [entry.cursor for entry in entries] == [7, 8, 9, 10, 11]
+
+
+def test_reads_across_the_wrap_with_a_limit():
+    log = filled(8)
+    # The buffer holds 3 to 7, a consumer at 4 reads in small steps from either end of the deque
+    cursor = 4
+    seen = []
+    for limit in (1, 3, 2):
+        entries, cursor = log.read(cursor, limit)
+        seen += indexes(entries)
+    assert seen == [4, 5, 6, 7] and cursor == 8
+    entries, cursor = log.read(0, 4)
+    assert indexes(entries) == [3, 4, 5, 6] and cursor == 7
+
+
+def test_disabled_levels_are_not_recorded_or_formatted():
+    log = EventLog("node", level="IMPORTANT", capacity=5)
+    log.log("INFO", "%s", object())
+    log.log("INFO", "never formatted %d", "not a number")
+    log.log("IMPORTANT", "kept %s", 1, reason="test")
+    entries, cursor = log.read()
+    assert [entry.message for entry in entries] == ["kept 1"] and cursor == 1
+    assert entries[0].to_dict()["reason"] == "test"
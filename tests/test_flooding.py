@@ -0,0 +1,33 @@
+import asyncio
+
+import Topologies
+from NetworkManager import NetworkManager
+from Transport import LoopbackNetwork
+
+
+async def converge(params, timeout=10.0):
+    network = LoopbackNetwork(latency=0.001)
+    manager = NetworkManager(params, network)
+    manager.initialize_clients()
+    await manager.connect_clients()
+    routed = await manager.wait_routes(timeout)
+    return manager, network, routed
+
+
+def test_hop_limit_does_not_stop_link_state():
+    # Corners of a 5x5 grid are 8 hops apart, twice the limit
+    params = [dict(param, flood_hop_limit=4) for param in Topologies.grid(5)]
+
+    async def run():
+        manager, network, routed = await converge(params)
+        corner = manager.clients[0]
+        far = manager.clients[-1].boundjid.full
+        route = corner.routing_table.get(far)
+        for client in manager.clients:
+            client.disconnect()
+        await network.wait_idle(0.05)
+        return routed, route
+
+    routed, route = asyncio.run(run())
+    assert routed
+    assert route is not None and route[1] == 8
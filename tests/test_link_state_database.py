@@ -0,0 +1,81 @@
+import json
+import time
+
+import pytest
+
+import WireCodec
+from LinkStateDatabase import LinkStateDatabase
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B = "a@alumchat.lol/algorithms", "b@alumchat.lol/algorithms"
+
+
+def test_stale_duplicate_and_refreshed_advertisements():
+    start = int(time.time())
+    lsdb = LinkStateDatabase("a", {"b": 1})
+    assert lsdb.install("b", start + 2, json.dumps({"a": 1}))[0] == LinkStateDatabase.CHANGED
+    assert lsdb.install("b", start + 1, json.dumps({"a": 5}))[0] == LinkStateDatabase.STALE
+    assert lsdb.install("b", start + 2, json.dumps({"a": 1}))[0] == LinkStateDatabase.DUPLICATE
+    assert lsdb.install("b", start + 3, json.dumps({"a": 1}))[0] == LinkStateDatabase.REFRESH
+    # Same costs in another encoding
+    assert lsdb.install("b", start + 4, {"a": 1})[0] == LinkStateDatabase.REFRESH
+    assert lsdb.install("b", start + 5, {"a": 2}) == (LinkStateDatabase.CHANGED, {"a": 1}, {"a": 2})
+    assert lsdb.entries["b"].costs is lsdb.costs["b"]
+    assert lsdb.entries["b"].sequence == start + 5
+
+
+def test_reused_sequence_with_other_content_is_taken():
+    start = int(time.time())
+    lsdb = LinkStateDatabase("a", {"b": 1})
+    lsdb.install("b", start, {"a": 1})
+    assert lsdb.install("b", start, {"a": 3}) == (LinkStateDatabase.CHANGED, {"a": 1}, {"a": 3})
+
+
+def test_counting_origin_restarting_from_one():
+    lsdb = LinkStateDatabase("a", {"b": 1})
+    for sequence in range(1, 58):
+        lsdb.install("b", sequence, json.dumps({"a": 1}))
+    # Restarted with other links, its ids start again from ls_<jid>_1
+    assert lsdb.install("b", 1, json.dumps({"a": 1, "c": 2}))[0] == LinkStateDatabase.CHANGED
+    assert lsdb.install("b", 1, json.dumps({"a": 1, "c": 2}))[0] == LinkStateDatabase.DUPLICATE
+    assert lsdb.install("b", 2, json.dumps({"a": 1, "c": 2}))[0] == LinkStateDatabase.REFRESH
+    assert lsdb.costs["b"] == {"a": 1, "c": 2}
+
+
+def test_purge_returns_the_last_costs():
+    lsdb = LinkStateDatabase("a", {"b": 1})
+    lsdb.install("b", 1, {"a": 1, "c": 1})
+    assert lsdb.purge("b") == {"a": 1, "c": 1}
+    assert "b" not in lsdb.entries and "b" not in lsdb.costs
+    assert lsdb.purge("b") == {}
+
+
+def test_jids_are_shared_between_advertisements():
+    lsdb = LinkStateDatabase("a", {})
+    node = "".join(["node@alumchat.lol/", "algorithms"])
+    lsdb.install(node, 1, json.dumps({"b@alumchat.lol/algorithms": 1}))
+    lsdb.install("b", 1, json.dumps({"node@alumchat.lol/algorithms": 1}))
+    lsdb.install("c", 1, json.dumps({"node@alumchat.lol/algorithms": 2}))
+    first, = lsdb.costs["b"]
+    second, = lsdb.costs["c"]
+    assert first is second
+    assert next(origin for origin in lsdb.entries if origin == node) is first
+
+
+@pytest.mark.parametrize("payload", ["{broken", "[1, 2]", '{"c": "far"}'])
+def test_invalid_payloads_leave_the_database_unchanged(payload):
+    lsdb = LinkStateDatabase("a", {"b": 1})
+    lsdb.install("b", 1, {"a": 1})
+    with pytest.raises(WireCodec.DecodeError):
+        lsdb.install("b", 2, payload)
+    assert lsdb.costs["b"] == {"a": 1} and lsdb.entries["b"].sequence == 1
+
+
+def test_node_drops_invalid_link_state():
+    node = NetworkClient(A, "password", [B], {B: 1}, transport=LoopbackNetwork().transport())
+    for index, payload in enumerate(["{broken", "[1, 2]", "null"]):
+        node.receive(json.dumps({"type": "info", "from": B, "to": "all", "hops": 0, "headers": [],
+                                 "payload": payload, "id": f"ls_{B}_{index + 1}"}), B)
+    assert node.metrics.counters[("packets_dropped", "invalid")] == 3
+    assert B not in node.link_state_db
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from Metrics import Metrics
+
+
+async def fetch(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.decode()
+
+
+def test_exporter_serves_prometheus_text_until_closed():
+    metrics = Metrics('node@alumchat.lol/"quoted"')
+    metrics.count("packets_received", "info", 3)
+    metrics.observe("message", 0.002)
+    metrics.queue_wait.observe(0.02)
+    metrics.gauges.append(lambda: {"routes": 7, "queue_depths": {"a": 1}})
+
+    async def run():
+        server = await metrics.serve(0)
+        port = server.sockets[0].getsockname()[1]
+        response = await fetch(port)
+        metrics.close()
+        await server.wait_closed()
+        with pytest.raises(OSError):
+            await fetch(port)
+        return response
+
+    response = asyncio.run(run())
+    head, body = response.split("\r\n\r\n", 1)
+    assert head.startswith("HTTP/1.1 200 OK")
+    assert f"Content-Length: {len(body.encode())}" in head
+    node = 'node="node@alumchat.lol/\\"quoted\\""'
+    assert f'routing_packets_received_total{{{node},type="info"}} 3' in body
+    assert f'routing_handler_seconds_bucket{{{node},handler="message",le="0.0025"}} 1' in body
+    assert f'routing_handler_seconds_count{{{node},handler="message"}} 1' in body
+    assert f"routing_routes{{{node}}} 7" in body
+    assert "# TYPE routing_queue_wait_seconds histogram" in body
+    assert f"routing_queue_wait_seconds_count{{{node}}} 1" in body
+    assert 'handler="queue_wait"' not in body
+    # Only numeric gauges are exported
+    assert "queue_depths" not in body
+    assert metrics.server is None
@@ -0,0 +1,37 @@
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B, C, D = (f"{name}@alumchat.lol/algorithms" for name in "abcd")
+COSTS = {A: {B: 1, C: 1}, B: {A: 1, D: 1}, C: {A: 1, D: 1}, D: {B: 1, C: 1}}
+
+
+def client(**options):
+    node = NetworkClient(A, "password", list(COSTS[A]), COSTS[A], transport=LoopbackNetwork().transport(), **options)
+    node.link_state_db.update(COSTS)
+    node.compute_routing_table()
+    return node
+
+
+def test_multipath_is_opt_in():
+    node = client()
+    assert not node.multipath and not node.neighbor_distances
+    assert node.select_next_hop(D, {"type": "message", "from": A}) == node.get_next_hop(D)
+
+
+def test_neighbor_distances_are_computed_with_the_routing_table():
+    node = client(multipath=True)
+    runs = []
+    distances_from = node.distances_from
+    node.distances_from = lambda origin: runs.append(origin) or distances_from(origin)
+    assert set(node.neighbor_distances) == {B, C}
+    assert node.multipath_hops(D) == ([B, C], [])
+    assert not runs
+
+    # C loses its link to D, the routing update computes the new neighbor distances
+    old = node.link_state_db[C]
+    node.link_state_db[C] = {A: 1}
+    node.pending_lsas[C] = old
+    node.run_pending_spf()
+    assert sorted(runs) == [B, C]
+    assert node.multipath_hops(D) == ([B], [])
+    assert len(runs) == 2
@@ -0,0 +1,81 @@
+import pytest
+
+from NeighborMonitor import NeighborMonitor
+
+B, C = "b@alumchat.lol/algorithms", "c@alumchat.lol/algorithms"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def probe(monitor, clock, neighbor, rtt, probe_id):
+    monitor.probe_sent(neighbor, probe_id)
+    clock.now += rtt
+    return monitor.reply(neighbor, probe_id)
+
+
+def test_round_trip_time_and_loss_averages():
+    clock = Clock()
+    monitor = NeighborMonitor({B: 1}, alpha=0.5, probe_timeout=2.0, clock=clock)
+    assert probe(monitor, clock, B, 0.1, "p1") == pytest.approx(0.1)
+    probe(monitor, clock, B, 0.3, "p2")
+    state = monitor.state(B)
+    assert state.rtt == pytest.approx(0.2) and state.samples == 2
+
+    monitor.probe_sent(B, "lost")
+    clock.now += 2.5
+    monitor.expire()
+    assert state.loss == pytest.approx(0.5) and not state.probes
+    # A late reply to a probe counted as lost is ignored
+    assert monitor.reply(B, "lost") is None
+    probe(monitor, clock, B, 0.2, "p3")
+    assert state.loss == pytest.approx(0.25) and state.rtt == pytest.approx(0.2)
+
+
+def test_costs_move_only_past_the_hysteresis_and_hold_time():
+    clock = Clock()
+    monitor = NeighborMonitor({B: 10}, alpha=1.0, cost_unit=0.01, hysteresis=0.25, hold_time=5.0, min_samples=3,
+                              clock=clock)
+    for index in range(2):
+        probe(monitor, clock, B, 0.2, f"early{index}")
+    # Not enough samples yet to replace the configured cost
+    assert monitor.changed_costs() == {}
+    probe(monitor, clock, B, 0.2, "p3")
+    assert monitor.changed_costs() == {B: 20}
+
+    # 22 is within 25% of 20, 40 is not but the hold time has not passed
+    probe(monitor, clock, B, 0.22, "p4")
+    assert monitor.changed_costs() == {}
+    probe(monitor, clock, B, 0.4, "p5")
+    assert monitor.changed_costs() == {}
+    clock.now += 5.0
+    assert monitor.changed_costs() == {B: 40}
+    assert monitor.state(B).cost == 40
+
+
+def test_dead_neighbors_are_reported_once_until_heard_again():
+    clock = Clock()
+    monitor = NeighborMonitor({B: 1, C: 1}, dead_interval=4.0, clock=clock)
+    # Neighbors never heard from are not tracked until expected
+    clock.now += 10.0
+    assert monitor.dead() == []
+    monitor.expect([B, C])
+    assert monitor.heard(C) is False
+    clock.now += 3.0
+    monitor.heard(C)
+    clock.now += 1.5
+    assert monitor.dead() == [B]
+    assert monitor.dead() == []
+    clock.now += 3.0
+    assert monitor.dead() == [C]
+    # Coming back is reported once
+    assert monitor.heard(B) is True
+    assert monitor.heard(B) is False
+    assert monitor.heard("stranger@alumchat.lol/algorithms") is False
+    clock.now += 4.5
+    assert monitor.dead() == [B]
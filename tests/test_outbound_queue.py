@@ -0,0 +1,52 @@
+import asyncio
+
+from OutboundQueue import OutboundQueues, TAIL
+
+PEER = "b@alumchat.lol/algorithms"
+
+
+def test_priority_is_the_default_and_never_drops_link_state():
+    async def run():
+        queues = OutboundQueues(lambda to_jid, body, msg_type: None, capacity=2)
+        queues.ready = asyncio.Queue()
+        queues.put(PEER, "data 1", packet_type="message")
+        queues.put(PEER, "info 1", packet_type="info")
+        assert not queues.put(PEER, "data 2", packet_type="message")
+        assert queues.put(PEER, "info 2", packet_type="info")
+        assert queues.put(PEER, "info 3", packet_type="info")
+        return queues
+
+    queues = asyncio.run(run())
+    assert [packet.body for packet in queues.queues[PEER]] == ["info 1", "info 2", "info 3"]
+    assert dict(queues.dropped) == {"message": 2}
+
+
+def test_tail_policy_drops_the_new_packet():
+    async def run():
+        queues = OutboundQueues(lambda to_jid, body, msg_type: None, capacity=1, policy=TAIL)
+        queues.ready = asyncio.Queue()
+        queues.put(PEER, "data", packet_type="message")
+        return queues.put(PEER, "info", packet_type="info"), queues
+
+    accepted, queues = asyncio.run(run())
+    assert not accepted and dict(queues.dropped) == {"info": 1}
+
+
+def test_stop_cancels_workers_and_the_next_put_restarts_them():
+    sent = []
+
+    async def run():
+        queues = OutboundQueues(lambda to_jid, body, msg_type: sent.append(body), workers=2)
+        queues.put(PEER, "first")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        tasks = queues.tasks
+        queues.stop()
+        await asyncio.sleep(0)
+        assert all(task.cancelled() for task in tasks) and not queues.tasks
+        queues.put(PEER, "second")
+        await asyncio.sleep(0.01)
+        queues.stop()
+
+    asyncio.run(run())
+    assert sent == ["first", "second"]
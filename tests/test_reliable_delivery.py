@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from ReliableDelivery import DeliveryError, ReliableSender, RetransmissionTimer
+
+B = "b@alumchat.lol/algorithms"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LossyLink:
+    """
+    Records every transmission, none of them is acknowledged unless the test does it.
+    """
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, destination, message):
+        self.sent.append((destination, message["id"], message["attempt"]))
+
+
+def sender(**options):
+    clock = Clock()
+    link = LossyLink()
+    return ReliableSender(link, clock=clock, **options), link, clock
+
+
+def message(index):
+    return {"type": "message", "id": f"msg_{index}", "payload": "hi"}
+
+
+def delay(sender, message_id):
+    # Seconds until the retransmission, as scheduled on the event loop
+    return sender.in_flight[B][message_id].handle.when() - asyncio.get_running_loop().time()
+
+
+def expire(sender, message_id):
+    sender.in_flight[B][message_id].handle.cancel()
+    sender._expire(B, message_id)
+
+
+def test_rto_follows_rfc_6298():
+    timer = RetransmissionTimer(initial=1.0, min_rto=0.2, max_rto=2.0)
+    assert timer.rto == 1.0
+    # First sample: SRTT = R, RTTVAR = R / 2
+    timer.sample(0.1)
+    assert (timer.srtt, timer.rttvar) == pytest.approx((0.1, 0.05))
+    assert timer.rto == pytest.approx(0.3)
+    # Later ones: RTTVAR = 3/4 RTTVAR + 1/4 |SRTT - R|, then SRTT = 7/8 SRTT + 1/8 R
+    timer.sample(0.3)
+    assert timer.rttvar == pytest.approx(0.75 * 0.05 + 0.25 * 0.2)
+    assert timer.srtt == pytest.approx(0.875 * 0.1 + 0.125 * 0.3)
+    assert timer.rto == pytest.approx(timer.srtt + 4 * timer.rttvar)
+    # Backoff doubles per attempt up to the upper bound
+    assert [timer.timeout(attempt) for attempt in (1, 2, 4)] == pytest.approx([timer.rto, 2 * timer.rto, 2.0])
+
+
+def test_rto_is_never_below_the_lower_bound():
+    timer = RetransmissionTimer(min_rto=0.2)
+    timer.sample(0.01)
+    assert timer.rto == 0.2
+
+
+def test_window_limits_messages_in_flight():
+    reliable, link, _ = sender(window=2)
+
+    async def run():
+        futures = [reliable.submit(B, message(index)) for index in range(3)]
+        assert [message_id for _, message_id, _ in link.sent] == ["msg_0", "msg_1"]
+        assert reliable.metrics()["waiting"] == 1
+        # An acknowledgement frees a slot for the waiting message
+        assert reliable.acknowledge(B, "msg_0", 2)
+        assert [message_id for _, message_id, _ in link.sent] == ["msg_0", "msg_1", "msg_2"]
+        assert reliable.metrics()["in_flight"] == 2 and reliable.metrics()["waiting"] == 0
+        return futures[0].result()
+
+    report = asyncio.run(run())
+    assert (report.message_id, report.hops, report.attempts) == ("msg_0", 2, 1)
+
+
+def test_acknowledgement_samples_the_round_trip():
+    reliable, _, clock = sender(min_rto=0.2, initial_rto=1.0)
+
+    async def run():
+        future = reliable.submit(B, message(0))
+        assert delay(reliable, "msg_0") == pytest.approx(1.0, abs=0.05)
+        clock.now += 0.1
+        assert reliable.acknowledge(B, "msg_0", 1)
+        # A duplicate acknowledgement is ignored
+        assert not reliable.acknowledge(B, "msg_0", 1)
+        return future.result()
+
+    report = asyncio.run(run())
+    assert report.latency == pytest.approx(0.1)
+    assert reliable.timer(B).srtt == pytest.approx(0.1)
+    assert reliable.timer(B).rto == pytest.approx(0.3)
+
+
+def test_lost_messages_are_retransmitted_with_backoff():
+    reliable, link, clock = sender(initial_rto=1.0)
+
+    async def run():
+        future = reliable.submit(B, message(0))
+        clock.now += 1.0
+        expire(reliable, "msg_0")
+        assert link.sent == [(B, "msg_0", 1), (B, "msg_0", 2)]
+        assert delay(reliable, "msg_0") == pytest.approx(2.0, abs=0.05)
+        clock.now += 0.5
+        reliable.acknowledge(B, "msg_0", 1)
+        return future.result()
+
+    report = asyncio.run(run())
+    assert (report.attempts, report.latency) == (2, pytest.approx(1.5))
+    # Karn's rule, the acknowledgement may belong to either attempt
+    assert reliable.timer(B).srtt is None
+    assert reliable.retransmitted == 1
+
+
+def test_gives_up_after_the_last_attempt():
+    reliable, link, _ = sender(window=1, max_attempts=3)
+
+    async def run():
+        failing = reliable.submit(B, message(0))
+        reliable.submit(B, message(1))
+        for _ in range(3):
+            expire(reliable, "msg_0")
+        assert failing.done()
+        # The failed message leaves the window to the next one
+        assert link.sent[-1] == (B, "msg_1", 1)
+        return failing
+
+    failing = asyncio.run(run())
+    with pytest.raises(DeliveryError):
+        failing.result()
+    assert [attempt for _, message_id, attempt in link.sent if message_id == "msg_0"] == [1, 2, 3]
+    assert reliable.metrics()["failed"] == 1
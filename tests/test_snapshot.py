@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import LinkStateSnapshot
+import WireCodec
+from NetworkClient import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B, C = (f"{name}@alumchat.lol/algorithms" for name in "abc")
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "node.lsdb")
+    entries = {B: (7, 100.5, {A: 5, C: 1}), C: (None, 101.0, {A: 1, B: 1.5})}
+    LinkStateSnapshot.write(path, 42, entries)
+    snapshot = LinkStateSnapshot.load(path)
+    assert snapshot.sequence == 42
+    assert snapshot.entries == entries
+    assert LinkStateSnapshot.load(str(tmp_path / "missing.lsdb")) is None
+
+
+def test_routes_are_recomputed_from_the_restored_database(tmp_path):
+    path = str(tmp_path / "node.lsdb")
+    # Saved while A - C was down, C was reached through B
+    LinkStateSnapshot.write(path, 3, {B: (1, 0.0, {A: 5, C: 1}), C: (1, 0.0, {B: 1})})
+    node = NetworkClient(A, "password", [B, C], {B: 5, C: 1}, transport=LoopbackNetwork().transport(),
+                         snapshot_file=path)
+    assert node.sequence_number >= 3
+    assert node.provisional == {B, C}
+    assert node.routing_table[C] == (C, 1)
+    assert node.routing_table[B] == (C, 2)
+
+
+def restored(tmp_path, **options):
+    path = str(tmp_path / "node.lsdb")
+    LinkStateSnapshot.write(path, 3, {B: (1, 0.0, {A: 5, C: 1}), C: (1, 0.0, {A: 1, B: 1})})
+    network = LoopbackNetwork()
+    sent = []
+    network.deliver = lambda from_jid, to_jid, body: sent.append((to_jid, WireCodec.decode(body)[0]))
+    node = NetworkClient(A, "password", [B, C], {B: 5, C: 1}, transport=network.transport(), snapshot_file=path,
+                         **options)
+    return node, sent
+
+
+def test_origins_not_advertised_again_expire(tmp_path):
+    node, _ = restored(tmp_path, provisional_ttl=0.01)
+    node.handle_link_state({"type": "info", "from": C, "to": "all", "hops": 0, "headers": [],
+                            "payload": json.dumps({A: 1}), "id": f"ls_{C}_1"}, C)
+    assert node.provisional == {B}
+
+    asyncio.run(node.expire_provisional())
+    node.spf_scheduler.flush()
+    assert not node.provisional
+    assert B not in node.link_state_db
+    assert set(node.link_state_db) == {A, C}
+    assert node.routing_table[B] == (B, 5)
+
+
+def test_restarted_node_asks_neighbors_for_their_database(tmp_path):
+    node, sent = restored(tmp_path)
+    asyncio.run(node.send_echo(B))
+    assert sent[-1][1]["sync"] is True
+
+    neighbor = NetworkClient(B, "password", [A], {A: 5}, transport=LoopbackNetwork().transport())
+    replies = []
+    neighbor.route_message = lambda to_jid, message, msg_type='chat': replies.append((to_jid, message))
+    neighbor.handle_echo(sent[-1][1])
+    assert [message["type"] for to_jid, message in replies] == ["echo", "info"]
+    assert all(to_jid == A for to_jid, _ in replies)
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import SPFChurn
+from SPFEngine import SPFEngine
+
+
+@pytest.mark.parametrize("integer_costs", [False, True])
+def test_incremental_matches_full_under_churn(integer_costs):
+    # SPFChurn asserts after every change that the incremental table matches a full recomputation
+    _, _, engine = SPFChurn.run(300, 300, integer_costs, seed=7)
+    assert engine.incremental_runs > 0
+
+
+def test_update_removing_tree_edge_reroutes():
+    db = {"A": {"B": 1, "C": 4}, "B": {"A": 1, "C": 1}, "C": {"A": 4, "B": 1}}
+    engine = SPFEngine("A")
+    engine.load(db)
+    assert engine.routing_table["C"] == ("B", 2)
+    old = db["B"]
+    db["B"] = {"A": 1}
+    changes = engine.update("B", old, db["B"])
+    assert changes == {"C": ("C", 4)}
+    assert engine.routing_table == SPFChurn.full_routing_table("A", db)
+
+
+def test_unreachable_destination_is_reported():
+    rng = random.Random(1)
+    db, _ = SPFChurn.random_topology(50, 3, rng, integer_costs=False)
+    engine = SPFEngine("n0")
+    engine.load(db)
+    # Cut every link into n10 from both sides
+    for node in list(db["n10"]):
+        old = db[node]
+        db[node] = {neighbor: cost for neighbor, cost in old.items() if neighbor != "n10"}
+        engine.update(node, old, db[node])
+    assert "n10" not in engine.routing_table
+    assert engine.routing_table == SPFChurn.full_routing_table("n0", db)
+
+
+@pytest.mark.parametrize("integer_costs", [False, True])
+def test_compiled_full_run_matches_dictionary_run(integer_costs):
+    pytest.importorskip("numpy")
+    db, _ = SPFChurn.random_topology(200, 4, random.Random(3), integer_costs)
+    dictionary = SPFEngine("n0", compiled_threshold=10 ** 9)
+    compiled = SPFEngine("n0", compiled_threshold=1)
+    dictionary.load(db)
+    compiled.load(db)
+    distances = {node: distance for node, (_, distance) in compiled.routing_table.items()}
+    assert distances == {node: distance for node, (_, distance) in dictionary.routing_table.items()}
+    assert all(type(distance) is (int if integer_costs else float) for distance in distances.values())
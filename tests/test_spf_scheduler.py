@@ -0,0 +1,81 @@
+import asyncio
+
+from SPFScheduler import SPFScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def delay(scheduler):
+    # Seconds until the pending run, as scheduled on the event loop
+    return scheduler.handle.when() - asyncio.get_running_loop().time()
+
+
+def test_outside_an_event_loop_runs_right_away():
+    runs = []
+    scheduler = SPFScheduler(lambda: runs.append(1))
+    scheduler.schedule()
+    scheduler.schedule()
+    assert len(runs) == 2 and scheduler.avoided == 0 and not scheduler.dirty
+
+
+def test_hold_time_backs_off_and_resets_after_a_quiet_period():
+    clock = Clock()
+    runs = []
+    scheduler = SPFScheduler(lambda: runs.append(clock.now), initial_delay=0.05, hold_time=0.2, max_delay=1.0,
+                             clock=clock)
+
+    async def run():
+        delays = []
+        # First request after a quiet period waits the initial delay
+        scheduler.schedule()
+        delays.append(delay(scheduler))
+        # Requests while a run is pending are coalesced into it
+        scheduler.schedule()
+        scheduler.schedule()
+        assert scheduler.dirty and scheduler.avoided == 2
+        scheduler.flush()
+        assert not scheduler.dirty
+
+        # Right after a run the rest of the hold time applies, doubling up to max_delay
+        for _ in range(4):
+            clock.now += 0.01
+            scheduler.schedule()
+            delays.append(delay(scheduler))
+            clock.now += 0.01
+            scheduler.flush()
+
+        # After more than max_delay without a run the initial delay applies again
+        clock.now += 1.5
+        scheduler.schedule()
+        delays.append(delay(scheduler))
+        scheduler.flush()
+        clock.now += 0.05
+        scheduler.schedule()
+        delays.append(delay(scheduler))
+        scheduler.flush()
+        return delays
+
+    delays = asyncio.run(run())
+    expected = [0.05, 0.19, 0.39, 0.79, 0.99, 0.05, 0.15]
+    assert [round(value, 2) for value in delays] == expected
+    assert scheduler.runs == len(runs) == 7
+    assert scheduler.requests == 9 and scheduler.avoided == 2
+
+
+def test_coalesced_requests_fire_once_on_the_loop():
+    runs = []
+    scheduler = SPFScheduler(lambda: runs.append(1), initial_delay=0.01)
+
+    async def run():
+        for _ in range(5):
+            scheduler.schedule()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert runs == [1] and scheduler.avoided == 4
@@ -0,0 +1,22 @@
+import NetworkClient
+from Transport import LoopbackNetwork
+
+A, B = (f"{name}@alumchat.lol/algorithms" for name in "ab")
+
+
+def client():
+    return NetworkClient.NetworkClient(A, "password", [B], {B: 1}, transport=LoopbackNetwork().transport())
+
+
+def test_clients_share_one_context():
+    if NetworkClient.SSL_CONTEXT_ARGUMENT:
+        assert client().ssl_context is client().ssl_context is NetworkClient.shared_ssl_context()
+
+
+def test_client_settings_stay_out_of_the_shared_context():
+    plain, configured = client(), client()
+    configured.ciphers = "ECDHE+AESGCM"
+    assert configured.get_ssl_context() is not NetworkClient.shared_ssl_context()
+    assert plain.get_ssl_context() is plain.ssl_context
+    assert NetworkClient.shared_ssl_context().get_ciphers() == plain.get_ssl_context().get_ciphers()
+    assert configured.get_ssl_context().get_ciphers() != plain.get_ssl_context().get_ciphers()
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import WireCodec
+
+JID = "{}@alumchat.lol/algorithms"
+
+
+def packet(message_type, payload, **extra):
+    return dict({"type": message_type, "from": JID.format("a"), "to": JID.format("b"), "hops": 3,
+                 "headers": [{"via": JID.format("a")}, {"via": JID.format("c")}], "payload": payload,
+                 "id": "msg_1"}, **extra)
+
+
+@pytest.mark.parametrize("codec", [WireCodec.JSON, WireCodec.BINARY])
+@pytest.mark.parametrize("message", [
+    packet("echo", ""),
+    packet("message", "hello, world"),
+    packet("custom", "unknown types keep their name"),
+])
+def test_round_trip(codec, message):
+    body = WireCodec.encode(message, codec)
+    decoded, detected = WireCodec.decode(body)
+    assert detected == codec
+    assert decoded == message
+
+
+@pytest.mark.parametrize("codec", [WireCodec.JSON, WireCodec.BINARY])
+def test_info_costs_round_trip(codec):
+    costs = {JID.format("b"): 1, JID.format("c"): 7, "bare": 300}
+    decoded, _ = WireCodec.decode(WireCodec.encode(packet("info", json.dumps(costs)), codec))
+    payload = decoded["payload"]
+    # Binary info payloads decode to the cost map itself, JSON ones stay a string
+    assert (payload if codec == WireCodec.BINARY else json.loads(payload)) == costs
+
+
+def test_binary_is_smaller_for_link_state():
+    costs = {JID.format(f"n{index}"): index for index in range(20)}
+    message = packet("info", json.dumps(costs))
+    assert len(WireCodec.encode(message, WireCodec.BINARY)) < len(WireCodec.encode(message, WireCodec.JSON))
+
+
+@pytest.mark.parametrize("message", [
+    packet("message", "hi", attempt=2),
+    packet("message", {"nested": True}),
+    packet("message", "hi", headers=[{"via": JID.format("a"), "cost": 1}]),
+    packet("message", "hi", hops=-1),
+])
+def test_packets_binary_cannot_carry_fall_back_to_json(message):
+    decoded, detected = WireCodec.decode(WireCodec.encode(message, WireCodec.BINARY))
+    assert detected == WireCodec.JSON
+    assert decoded == message
+
+
+def test_batch_round_trip():
+    bodies = [WireCodec.encode(packet("message", f"part {index}"), codec)
+              for index, codec in enumerate([WireCodec.JSON, WireCodec.BINARY, WireCodec.JSON])]
+    batch = WireCodec.encode_batch(bodies)
+    assert WireCodec.split_batch(batch) == bodies
+    assert WireCodec.split_batch(bodies[0]) is None
+
+
+@pytest.mark.parametrize("body", ["not json", "~not base64!", "~" + "AAAA", "~AQ=="])
+def test_garbage_raises_decode_error(body):
+    with pytest.raises(WireCodec.DecodeError):
+        WireCodec.decode(body)
+
+
+@pytest.mark.parametrize("payload", ["not json", "[1, 2]", "7", '{"a": "1"}', '{"a": -1}', '{"a": true}', None])
+def test_invalid_cost_maps_raise_decode_error(payload):
+    with pytest.raises(WireCodec.DecodeError):
+        WireCodec.decode_costs(payload)
+
+
+def test_cost_maps_decode_from_text_or_dict():
+    assert WireCodec.decode_costs('{"a": 1, "b": 2.5}') == {"a": 1, "b": 2.5}
+    assert WireCodec.decode_costs({"a": 0}) == {"a": 0}
@@ -0,0 +1,43 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import Workload
+
+
+def test_phases_inherit_top_level_settings():
+    phases = Workload.phases_of({"name": "run", "rate": 50, "phases": [{"duration": 1}, {"pattern": "hotspot"}]})
+    assert [phase["name"] for phase in phases] == ["run_0", "run_1"]
+    assert all(phase["rate"] == 50 for phase in phases)
+    assert phases[0]["duration"] == 1 and phases[1]["pattern"] == "hotspot"
+
+
+@pytest.mark.parametrize("spec, message", [
+    ({"phases": [{"name": "ramp"}, {"name": "ramp"}]}, "Duplicate phase name"),
+    ({"phases": [{"name": "workload_1"}, {}]}, "Duplicate phase name"),
+    ({"phases": [{"name": "total"}]}, "reserved"),
+    ({"senders": []}, "Senders"),
+    ({"pattern": "ring"}, "Unknown traffic pattern"),
+    ({"pattern": "flows"}, "flows pattern"),
+    ({"rate": 0}, "Rate"),
+])
+def test_invalid_specs_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        Workload.phases_of(spec)
+
+
+def test_workload_needs_clients():
+    with pytest.raises(ValueError, match="at least two clients"):
+        Workload.Workload([], {})
+    node = SimpleNamespace(boundjid=SimpleNamespace(full="a@alumchat.lol/algorithms"))
+    with pytest.raises(ValueError, match="at least two clients"):
+        Workload.Workload([node], {})
+
+
+def test_uniform_destinations_are_every_other_node():
+    jids = [f"{name}@alumchat.lol/algorithms" for name in "abcd"]
+    workload = Workload.Workload([SimpleNamespace(boundjid=SimpleNamespace(full=jid)) for jid in jids], {})
+    rng = random.Random(0)
+    destinations = {workload.destination(workload.phases[0], jids[1], rng) for _ in range(200)}
+    assert destinations == {jids[0], jids[2], jids[3]}